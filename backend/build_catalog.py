@@ -0,0 +1,75 @@
+# /home/skillseek/app/backend/build_catalog.py
+# Пересборка unified_catalog (+ catalog_genres, unified_catalog_fts):
+#   python build_catalog.py          — только tmdb_id из catalog_dirty (или полностью, если без этого никак)
+#   python build_catalog.py --full   — полностью, через теневые таблицы и подмену (sql/build_unified_catalog.sql)
+import argparse, os, pathlib, sqlite3, time
+
+from common import DB_PATH, SQLITE_TIMEOUT, has_table
+
+SQL_PATH = pathlib.Path(__file__).with_name("sql") / "build_unified_catalog.sql"
+# если грязных тайтлов больше этой доли каталога — дешевле собрать всё заново
+FULL_REBUILD_RATIO = float(os.getenv("CATALOG_FULL_REBUILD_RATIO", "0.2"))
+
+def full_rebuild(con: sqlite3.Connection) -> None:
+    con.executescript(SQL_PATH.read_text(encoding="utf-8"))
+
+def incremental_rebuild(con: sqlite3.Connection) -> int:
+    # одна транзакция: удалить старые строки грязных тайтлов и вставить их заново из unified_catalog_src
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS catalog_batch (tmdb_id INTEGER PRIMARY KEY)")
+        con.execute("DELETE FROM temp.catalog_batch")
+        con.execute("INSERT INTO temp.catalog_batch SELECT tmdb_id FROM catalog_dirty")
+        n = con.execute("SELECT COUNT(*) FROM temp.catalog_batch").fetchone()[0]
+        if not n:
+            con.execute("ROLLBACK")
+            return 0
+        batch = "SELECT tmdb_id FROM temp.catalog_batch"
+        # contentless FTS: для удаления нужны прежние значения колонок
+        con.execute(f"""INSERT INTO unified_catalog_fts(unified_catalog_fts, rowid, title, director, actors)
+                        SELECT 'delete', tmdb_id, title, director, actors
+                        FROM unified_catalog WHERE tmdb_id IN ({batch})""")
+        con.execute(f"DELETE FROM unified_catalog WHERE tmdb_id IN ({batch})")
+        con.execute(f"DELETE FROM catalog_genres WHERE tmdb_id IN ({batch})")
+        con.execute(f"INSERT INTO unified_catalog SELECT * FROM unified_catalog_src WHERE tmdb_id IN ({batch})")
+        con.execute(f"""INSERT INTO unified_catalog_fts(rowid, title, director, actors)
+                        SELECT tmdb_id, title, director, actors
+                        FROM unified_catalog WHERE tmdb_id IN ({batch})""")
+        con.execute(f"""INSERT OR IGNORE INTO catalog_genres(genre_id, tmdb_id)
+                        SELECT mg.genre_id, mg.movie_id
+                        FROM tmdb_movie_genres mg
+                        JOIN tmdb_movies m ON m.id = mg.movie_id
+                        WHERE mg.movie_id IN ({batch})""")
+        con.execute(f"DELETE FROM catalog_dirty WHERE tmdb_id IN ({batch})")
+        con.execute("""INSERT INTO catalog_meta(key, value) VALUES('generation', 1)
+                       ON CONFLICT(key) DO UPDATE SET value = value + 1""")
+        con.execute("COMMIT")
+        return n
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+
+def build(full: bool = False) -> str:
+    con = sqlite3.connect(DB_PATH, timeout=SQLITE_TIMEOUT, isolation_level=None)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+        # последний добавленный триггер: база, собранная до него, один раз пересобирается полностью и получает все
+        ready = all(has_table(con, t) for t in
+                    ("unified_catalog", "catalog_genres", "unified_catalog_fts", "unified_catalog_src", "catalog_dirty",
+                     "trg_cd_genre_names_upd"))
+        if not full and ready:
+            dirty = con.execute("SELECT COUNT(*) FROM catalog_dirty").fetchone()[0]
+            size = con.execute("SELECT COUNT(*) FROM unified_catalog").fetchone()[0]
+            if dirty <= FULL_REBUILD_RATIO * max(size, 1):
+                return f"incremental: {incremental_rebuild(con)} titles"
+        full_rebuild(con)
+        return f"full: {con.execute('SELECT COUNT(*) FROM unified_catalog').fetchone()[0]} titles"
+    finally:
+        con.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rebuild unified_catalog")
+    ap.add_argument("--full", action="store_true", help="full rebuild via shadow tables")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    print(f"{build(args.full)} in {time.perf_counter() - t0:.1f}s, DB at {DB_PATH}")
@@ -0,0 +1,58 @@
+# /home/skillseek/app/backend/cache.py
+import threading, time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import metrics
+
+_MISSING = object()
+
+class TTLCache:
+    # маленький потокобезопасный LRU с TTL и счётчиками hit/miss (кэш на процесс-воркер);
+    # с name счётчики попадают ещё и в /metrics (cache_lookups_total{cache=name})
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self._hit_metric = metrics.CACHE_LOOKUPS.labels(name, "hit") if name else None
+        self._miss_metric = metrics.CACHE_LOOKUPS.labels(name, "miss") if name else None
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                if self._hit_metric is not None:
+                    self._hit_metric.inc()
+                return item[1]
+            if item is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            if self._miss_metric is not None:
+                self._miss_metric.inc()
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+        }
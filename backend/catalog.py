@@ -0,0 +1,169 @@
+# /home/skillseek/app/backend/catalog.py
+# Фильтры unified_catalog: модели /catalog/search и построение WHERE/ORDER BY
+# (общие для /catalog/search и колоды лобби /lobby/{code}/deck)
+import json, re
+from typing import Any, Iterable, List, Literal, Optional, Sequence, Tuple
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:   # без orjson тот же JSON собирает stdlib, только медленнее
+    orjson = None
+
+class CatalogFilters(BaseModel):
+    title: Optional[str] = None
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    tmdb_min: Optional[float] = None
+    imdb_min: Optional[float] = None
+    genres: Optional[List[str]] = None
+    genres_mode: Literal["any","all"] = "any"
+    director: Optional[str] = None
+    actor: Optional[str] = None
+    type: Optional[Literal["movie","tv"]] = None   # <--- новое
+    sort_by: Literal["imdb","tmdb","year","title"] = "imdb"
+    order: Literal["desc","asc"] = "desc"
+    page: int = 1
+    page_size: int = 20
+    cursor: Optional[str] = None   # keyset-пагинация: next_cursor из прошлого ответа, page тогда не используется
+    with_total: bool = True        # False -> total не считаем (null)
+
+class CatalogItem(BaseModel):
+    tmdb_id: int
+    imdb_id: Optional[str]
+    title: str
+    year: Optional[int]
+    tmdb_rating: Optional[float]
+    imdb_rating: Optional[float]
+    genres: Optional[str]
+    director: Optional[str]
+    actors: Optional[str]
+    poster_url: Optional[str]
+    type: Literal["movie","tv"]                 # <--- новое
+    duration_text: Optional[str]                # <--- новое
+    episodes: Optional[int] 
+
+class CatalogResponse(BaseModel):
+    total: Optional[int]
+    page: int
+    page_size: int
+    results: List[CatalogItem]
+    next_cursor: Optional[str] = None
+
+# колонки unified_catalog в порядке полей CatalogItem — строка SELECT {CATALOG_COLUMNS} и есть элемент ответа
+CATALOG_FIELDS = tuple(CatalogItem.model_fields)
+CATALOG_COLUMNS = ", ".join(CATALOG_FIELDS)
+
+def dumps(obj: Any) -> bytes:
+    # компактный UTF-8 JSON, как у pydantic model_dump_json
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def catalog_items_json(rows: Iterable[Sequence[Any]]) -> bytes:
+    # строки SELECT {CATALOG_COLUMNS} -> JSON-массив CatalogItem без модели на каждую строку
+    return dumps([dict(zip(CATALOG_FIELDS, r)) for r in rows])
+
+def catalog_response_json(total: Optional[int], page: int, page_size: int, results: bytes,
+                          next_cursor: Optional[str]) -> bytes:
+    # те же байты, что CatalogResponse(...).model_dump_json(); соответствие схеме проверяет
+    # tests/test_catalog_json.py, в рантайме ответ не валидируется
+    return b'{"total":%b,"page":%d,"page_size":%d,"results":%b,"next_cursor":%b}' % (
+        dumps(total), page, page_size, results, dumps(next_cursor))
+
+SORT_COLUMNS = {
+    "imdb": "imdb_rating",
+    "tmdb": "tmdb_rating",
+    "year": "year",
+    "title": "title"
+}
+
+# FTS5: текст запроса -> фраза с префиксом на последнем слове по колонке unified_catalog_fts
+_FTS_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def fts_match_expr(column: str, text: str) -> str | None:
+    # "Night S" -> title : ("Night" + "S"*): слова подряд и в том же порядке, последнее — префикс,
+    # как у LIKE '%night s%' для ввода с начала слова; в director/actors фраза не склеивает
+    # имя одного человека с фамилией другого ("John Smith" не найдёт "John Doe, Mary Smith")
+    tokens = _FTS_TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    return f"{column} : (" + " + ".join(f'"{t}"' for t in tokens) + "*)"
+
+def needs_like(text: str) -> bool:
+    # знаки и пробелы по краям ("dark-city", "O'Brien", "night ") токенизатор выбрасывает — FTS отбирает
+    # кандидатов, LIKE поверх оставляет ровно то, что нашёл бы LIKE '%x%'
+    return " ".join(_FTS_TOKEN_RE.findall(text)) != text
+
+def catalog_where(filters: CatalogFilters) -> Tuple[str, List[Any]]:
+    # WHERE по unified_catalog для фильтров (без пагинации и сортировки)
+    where = ["1=1"]
+    params: List[object] = []
+
+    # title/director/actor идут через FTS-индекс (префикс слова, без учёта регистра и диакритики);
+    # LIKE — для запросов без буквенно-цифровых токенов и поверх FTS для запросов со знаками/пробелами
+    fts: List[str] = []
+    for column, text in (("title", filters.title), ("director", filters.director), ("actors", filters.actor)):
+        if not text:
+            continue
+        expr = fts_match_expr(column, text)
+        if expr:
+            fts.append(expr)
+        if not expr or needs_like(text):
+            where.append(f"{column} LIKE ?")
+            params.append(f"%{text}%")
+    if fts:
+        where.append("tmdb_id IN (SELECT rowid FROM unified_catalog_fts WHERE unified_catalog_fts MATCH ?)")
+        params.append(" AND ".join(fts))
+
+    if filters.year_from is not None:
+        where.append("year >= ?")
+        params.append(filters.year_from)
+
+    if filters.year_to is not None:
+        where.append("year <= ?")
+        params.append(filters.year_to)
+
+    if filters.tmdb_min is not None:
+        where.append("tmdb_rating >= ?")
+        params.append(filters.tmdb_min)
+
+    if filters.imdb_min is not None:
+        where.append("imdb_rating >= ?")
+        params.append(filters.imdb_min)
+
+    if filters.type:
+        where.append("type = ?")
+        params.append(filters.type)
+
+    # жанры: индекс catalog_genres(genre_id, tmdb_id), имена сравниваются целиком без учёта регистра
+    names = list({g.strip().lower(): g.strip() for g in (filters.genres or []) if g.strip()}.values())
+    if names:
+        marks = ",".join("?" * len(names))
+        if filters.genres_mode == "all":
+            # все жанры должны быть у тайтла
+            where.append(f"""tmdb_id IN (
+                SELECT cg.tmdb_id FROM catalog_genres cg
+                JOIN tmdb_genres g ON g.id = cg.genre_id
+                WHERE g.name COLLATE NOCASE IN ({marks})
+                GROUP BY cg.tmdb_id
+                HAVING COUNT(DISTINCT lower(g.name)) = ?)""")
+            params.extend(names)
+            params.append(len(names))
+        else:
+            # хотя бы один из жанров
+            where.append(f"""tmdb_id IN (
+                SELECT cg.tmdb_id FROM catalog_genres cg
+                WHERE cg.genre_id IN (SELECT id FROM tmdb_genres WHERE name COLLATE NOCASE IN ({marks})))""")
+            params.extend(names)
+
+    return " AND ".join(where), params
+
+def order_keys(filters: CatalogFilters) -> List[Tuple[str, bool]]:
+    # порядок полный и стабильный: sort key, title, tmdb_id — по нему же строится курсор
+    order_by = SORT_COLUMNS[filters.sort_by]
+    desc = filters.order.lower() == "desc"
+    return [(order_by, desc)] + ([("title", False)] if order_by != "title" else []) + [("tmdb_id", False)]
+
+def order_sql(keys: List[Tuple[str, bool]]) -> str:
+    return ", ".join(f"{col} {'DESC' if d else 'ASC'}" for col, d in keys)
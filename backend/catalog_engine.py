@@ -0,0 +1,302 @@
+# /home/skillseek/app/backend/catalog_engine.py
+# In-memory колоночный движок для /catalog/search (CATALOG_ENGINE=memory).
+# unified_catalog целиком читается в numpy-колонки, фильтры/сортировка/пагинация — векторно, без SQL.
+# Перечитывается в фоне, когда меняется catalog_meta.generation; подмена снапшота — одна ссылка.
+import bisect, logging, os, sys, threading, time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from catalog import CATALOG_FIELDS, dumps, needs_like
+from common import conn, read_conn, catalog_generation, fold_tokens
+
+CATALOG_ENGINE = os.getenv("CATALOG_ENGINE", "sql")
+CATALOG_ENGINE_MAX_MB = float(os.getenv("CATALOG_ENGINE_MAX_MB", "256"))  # бюджет на ОДИН воркер
+CATALOG_ENGINE_CHECK_S = float(os.getenv("CATALOG_ENGINE_CHECK_S", "30"))
+
+log = logging.getLogger("catalog_engine")
+
+TEXT_COLUMNS = ("title", "director", "actors")
+SORT_COLUMNS = {"imdb": "imdb_rating", "tmdb": "tmdb_rating", "year": "year", "title": "title"}
+PAYLOAD_COLUMNS = CATALOG_FIELDS
+
+LOAD_CHUNK = 5_000
+# оценка размера до загрузки (калибровка по nbytes() на синтетических каталогах 20k и 1M): байт на тайтл сверх
+# текста — числовые колонки, 8 рангов, постинги, обёртки payload; пик загрузки — во столько раз больше итога
+# (у маленьких каталогов сверху ещё ~15 МБ на пачку строк, в бюджет по умолчанию это влезает)
+EST_BYTES_PER_TITLE = 450
+EST_PEAK_FACTOR = 1.6
+
+def estimate_bytes(n: int, text_bytes: int) -> int:
+    return n * EST_BYTES_PER_TITLE + text_bytes
+
+class CatalogSnapshot:
+    def __init__(self, generation: int, chunks: Iterable[List[Tuple]], genre_rows: List[Tuple],
+                 genre_names: List[Tuple], budget: Optional[int] = None):
+        # chunks — строки SELECT {PAYLOAD_COLUMNS} пачками, строго в порядке ORDER BY title: ранг title считается
+        # на ходу, а текст и сами строки целиком в памяти не держатся. budget — потолок в байтах: превышение
+        # обрывает загрузку (ValueError), не дожидаясь конца
+        self.generation = generation
+        ids, year, tmdb_rating, imdb_rating, is_tv, title_rank = [], [], [], [], [], []
+        vocab_id: Dict[str, int] = {}
+        tok_ids = {c: array("i") for c in TEXT_COLUMNS}
+        tok_rows = {c: array("i") for c in TEXT_COLUMNS}
+        text_pos = [PAYLOAD_COLUMNS.index(c) for c in TEXT_COLUMNS]
+        self.payload: List[bytes] = []   # готовые строки ответа: компактный JSON на тайтл, вклеиваются как есть
+        payload_bytes, n, rank, prev_title = 0, 0, -1, None
+        for rows in chunks:
+            cols = list(zip(*rows))
+            c = dict(zip(PAYLOAD_COLUMNS, cols))
+            ids.append(np.asarray(c["tmdb_id"], dtype=np.int64))
+            year.append(np.asarray([np.nan if v is None else v for v in c["year"]], dtype=np.float32))
+            # рейтинги — float64, как REAL в SQLite: у float32 фильтр на границе (imdb_min=7.1) расходился бы с SQL
+            tmdb_rating.append(np.asarray([np.nan if v is None else v for v in c["tmdb_rating"]], dtype=np.float64))
+            imdb_rating.append(np.asarray([np.nan if v is None else v for v in c["imdb_rating"]], dtype=np.float64))
+            is_tv.append(np.asarray([v == "tv" for v in c["type"]], dtype=bool))
+            # NULL в SQLite меньше любого значения: ORDER BY title отдаёт их первыми, ранг -1
+            ranks = array("i")
+            for t in c["title"]:
+                if t is not None and t != prev_title:
+                    rank, prev_title = rank + 1, t
+                ranks.append(-1 if t is None else rank)
+            title_rank.append(np.frombuffer(ranks, dtype=np.int32))
+            for column, pos in zip(TEXT_COLUMNS, text_pos):
+                t_ids, t_rows = tok_ids[column], tok_rows[column]
+                for i, text in enumerate(cols[pos], n):
+                    for tok in set(fold_tokens(text)):
+                        t_ids.append(vocab_id.setdefault(tok, len(vocab_id)))
+                        t_rows.append(i)
+            for r in rows:
+                # orjson отдаёт bytes с запасом под буфер (~1 КБ) — копия точного размера
+                b = memoryview(dumps(dict(zip(PAYLOAD_COLUMNS, r)))).tobytes()
+                payload_bytes += len(b)
+                self.payload.append(b)
+            n += len(rows)
+            if budget is not None:
+                # нижняя граница итогового nbytes(): payload + объекты bytes и список + колонки и ранги + постинги
+                used = payload_bytes + n * (33 + 8 + 33 + 48) + 4 * sum(len(a) for a in tok_ids.values())
+                if used > budget:
+                    raise ValueError(f"catalog snapshot exceeds {budget / 2**20:.0f} MB after {n} titles")
+
+        self.n = n
+        self.tmdb_id = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+        self.year = np.concatenate(year) if year else np.zeros(0, dtype=np.float32)
+        self.tmdb_rating = np.concatenate(tmdb_rating) if tmdb_rating else np.zeros(0, dtype=np.float64)
+        self.imdb_rating = np.concatenate(imdb_rating) if imdb_rating else np.zeros(0, dtype=np.float64)
+        self.is_tv = np.concatenate(is_tv) if is_tv else np.zeros(0, dtype=bool)
+        title_rank = (np.concatenate(title_rank) if title_rank else np.zeros(0, dtype=np.int32)).astype(np.int64)
+        del ids, year, tmdb_rating, imdb_rating, is_tv
+        self.row_by_id = np.argsort(self.tmdb_id)
+
+        # жанры: бит на genre_id, имя (без регистра) -> маска всех id с таким именем
+        bit_of: Dict[int, int] = {}
+        for gid, _ in genre_names:
+            bit_of.setdefault(gid, len(bit_of))
+        if len(bit_of) > 64:
+            raise ValueError(f"too many genres for uint64 mask: {len(bit_of)}")
+        self.genre_bits: Dict[str, int] = {}
+        for gid, name in genre_names:
+            key = (name or "").strip().lower()
+            self.genre_bits[key] = self.genre_bits.get(key, 0) | (1 << bit_of[gid])
+        self.genre_mask = np.zeros(n, dtype=np.uint64)
+        pos = self._positions([gid_tid[1] for gid_tid in genre_rows])
+        for (gid, _), p in zip(genre_rows, pos):
+            if p >= 0 and gid in bit_of:
+                self.genre_mask[p] |= np.uint64(1 << bit_of[gid])
+
+        # текст: общий отсортированный словарь токенов + по колонке постинги (indptr по словарю, номера строк)
+        self.vocab = sorted(vocab_id)
+        sorted_pos = np.empty(len(self.vocab), dtype=np.int32)
+        sorted_pos[np.fromiter((vocab_id[t] for t in self.vocab), dtype=np.int64, count=len(self.vocab))] = \
+            np.arange(len(self.vocab), dtype=np.int32)
+        del vocab_id
+        self.text_index: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for column in TEXT_COLUMNS:
+            tok = sorted_pos[np.frombuffer(tok_ids.pop(column), dtype=np.int32)]
+            rows_of = np.frombuffer(tok_rows.pop(column), dtype=np.int32)
+            order = np.lexsort((rows_of, tok))
+            indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(tok, minlength=len(self.vocab)), out=indptr[1:])
+            self.text_index[column] = (indptr, rows_of[order])
+            del tok, rows_of, order
+
+        # ранги полного порядка "sort key, title ASC, tmdb_id ASC" (как ORDER BY в SQL-пути);
+        # NULL в SQLite меньше любого значения: первый в ASC, последний в DESC
+        self.ranks: Dict[Tuple[str, bool], np.ndarray] = {}
+        for sort_by, col in SORT_COLUMNS.items():
+            for desc in (False, True):
+                if col == "title":
+                    keys = (self.tmdb_id, -title_rank if desc else title_rank)
+                else:
+                    v = getattr(self, col).astype(np.float64)
+                    v = np.where(np.isnan(v), np.inf, -v) if desc else np.where(np.isnan(v), -np.inf, v)
+                    keys = (self.tmdb_id, title_rank, v)
+                order = np.lexsort(keys)
+                rank = np.empty(n, dtype=np.int32)
+                rank[order] = np.arange(n, dtype=np.int32)
+                self.ranks[(sort_by, desc)] = rank
+
+    def _positions(self, ids: List[int]) -> np.ndarray:
+        # tmdb_id -> номер строки, -1 если такого нет
+        ids_arr = np.asarray(ids, dtype=np.int64)
+        if not self.n:
+            return np.full(ids_arr.size, -1, dtype=np.int64)
+        sorted_ids = self.tmdb_id[self.row_by_id]
+        pos = np.clip(np.searchsorted(sorted_ids, ids_arr), 0, self.n - 1)
+        return np.where(sorted_ids[pos] == ids_arr, self.row_by_id[pos], -1)
+
+    def nbytes(self) -> int:
+        arrays = [self.tmdb_id, self.year, self.tmdb_rating, self.imdb_rating, self.is_tv, self.row_by_id,
+                  self.genre_mask, *self.ranks.values()]
+        arrays += [a for pair in self.text_index.values() for a in pair]
+        total = sum(a.nbytes for a in arrays)
+        total += sum(sys.getsizeof(t) for t in self.vocab) + sys.getsizeof(self.vocab)
+        total += sum(sys.getsizeof(p) for p in self.payload) + sys.getsizeof(self.payload)
+        return total
+
+    def _text_mask(self, column: str, text: str) -> Optional[np.ndarray]:
+        # одно слово — префикс по словарю; фразы (нужны позиции слов) и знаки (LIKE) — только в SQL
+        tokens = fold_tokens(text)
+        if len(tokens) != 1 or needs_like(text):
+            return None
+        indptr, flat = self.text_index[column]
+        lo = bisect.bisect_left(self.vocab, tokens[0])
+        hi = bisect.bisect_left(self.vocab, tokens[0] + "\U0010ffff")
+        mask = np.zeros(self.n, dtype=bool)
+        mask[flat[indptr[lo]:indptr[hi]]] = True
+        return mask
+
+    def search(self, filters: Any, page: int, page_size: int,
+               after_id: Optional[int] = None) -> Optional[Tuple[int, List[bytes]]]:
+        # (total, JSON элементов страницы); None -> этот запрос движок не обслуживает, нужен SQL-путь
+        mask = np.ones(self.n, dtype=bool)
+        for column, text in (("title", filters.title), ("director", filters.director), ("actors", filters.actor)):
+            if not text:
+                continue
+            m = self._text_mask(column, text)
+            if m is None:
+                return None   # фразы и LIKE есть только в SQL
+            mask &= m
+        with np.errstate(invalid="ignore"):
+            if filters.year_from is not None:
+                mask &= self.year >= filters.year_from
+            if filters.year_to is not None:
+                mask &= self.year <= filters.year_to
+            if filters.tmdb_min is not None:
+                mask &= self.tmdb_rating >= filters.tmdb_min
+            if filters.imdb_min is not None:
+                mask &= self.imdb_rating >= filters.imdb_min
+        if filters.type:
+            mask &= self.is_tv if filters.type == "tv" else ~self.is_tv
+
+        names = {g.strip().lower() for g in (filters.genres or []) if g.strip()}
+        if names:
+            bits = [self.genre_bits.get(g, 0) for g in names]
+            if filters.genres_mode == "all":
+                for b in bits:
+                    mask &= (self.genre_mask & np.uint64(b)) != 0
+            else:
+                any_bits = 0
+                for b in bits:
+                    any_bits |= b
+                mask &= (self.genre_mask & np.uint64(any_bits)) != 0
+
+        rank = self.ranks[(filters.sort_by, filters.order.lower() == "desc")]
+        idx = np.flatnonzero(mask)
+        total = int(idx.size)
+        offset = (page - 1) * page_size
+        if after_id is not None:
+            pos = self._positions([after_id])[0]
+            if pos < 0:
+                return None
+            idx = idx[rank[idx] > rank[pos]]
+            offset = 0
+
+        k = offset + page_size
+        r = rank[idx]
+        if k < idx.size:
+            part = np.argpartition(r, k - 1)[:k]
+            idx, r = idx[part], r[part]
+        page_idx = idx[np.argsort(r, kind="stable")][offset:k]
+        return total, [self.payload[i] for i in page_idx]
+
+def estimate_catalog(con) -> int:
+    # байты снапшота по COUNT(*) и длине текста — до того, как что-то загружено
+    n, text_bytes = con.execute(
+        "SELECT COUNT(*), TOTAL(" + " + ".join(f"IFNULL(LENGTH(CAST({c} AS BLOB)), 0)" for c in PAYLOAD_COLUMNS)
+        + ") FROM unified_catalog").fetchone()
+    return estimate_bytes(n, int(text_bytes))
+
+def load_snapshot(budget: Optional[int] = None) -> CatalogSnapshot:
+    # budget — байты: не влезает по оценке — ValueError сразу, по факту — как только превысит при загрузке
+    con = conn()
+    try:
+        # одна читающая транзакция: generation и строки из одной и той же сборки
+        con.execute("BEGIN")
+        generation = catalog_generation(con)
+        if budget is not None:
+            est = estimate_catalog(con)
+            if est * EST_PEAK_FACTOR > budget:
+                raise ValueError(f"catalog snapshot estimated at {est / 2**20:.0f} MB "
+                                 f"(x{EST_PEAK_FACTOR} while loading) > {budget / 2**20:.0f} MB")
+        genre_rows = [tuple(r) for r in con.execute("SELECT genre_id, tmdb_id FROM catalog_genres")]
+        genre_names = [tuple(r) for r in con.execute("SELECT id, name FROM tmdb_genres ORDER BY id")]
+        cur = con.cursor()
+        cur.row_factory = None
+        cur.execute(f"SELECT {', '.join(PAYLOAD_COLUMNS)} FROM unified_catalog ORDER BY title")
+        snap = CatalogSnapshot(generation, iter(lambda: cur.fetchmany(LOAD_CHUNK), []), genre_rows, genre_names,
+                               budget=None if budget is None else int(budget / EST_PEAK_FACTOR))
+        con.execute("COMMIT")
+        return snap
+    finally:
+        con.close()
+
+_snapshot: Optional[CatalogSnapshot] = None
+_reload_lock = threading.Lock()
+
+def enabled() -> bool:
+    return CATALOG_ENGINE == "memory"
+
+def snapshot() -> Optional[CatalogSnapshot]:
+    return _snapshot
+
+def reload(force: bool = False) -> None:
+    global _snapshot
+    with _reload_lock:
+        with read_conn() as con:
+            generation = catalog_generation(con)
+            old = _snapshot
+            if not force and old is not None and old.generation == generation:
+                return
+            budget = CATALOG_ENGINE_MAX_MB * 2**20
+            if old is not None and old.nbytes() + estimate_catalog(con) * EST_PEAK_FACTOR > budget:
+                # два снапшота в бюджет не влезают: старый отпускаем, на время загрузки отвечает SQL-путь
+                log.info("catalog engine: dropping generation %s for the reload", old.generation)
+                _snapshot = old = None
+            elif old is not None:
+                budget -= old.nbytes()
+        t0 = time.perf_counter()
+        try:
+            snap = load_snapshot(budget)
+        except (ValueError, MemoryError) as e:
+            log.warning("catalog engine disabled, falling back to SQL (CATALOG_ENGINE_MAX_MB=%.0f): %s",
+                        CATALOG_ENGINE_MAX_MB, e)
+            _snapshot = None
+            return
+        _snapshot = snap   # атомарная подмена: читатели держат свою ссылку на старый снапшот
+        log.info("catalog engine: generation %s, %s titles, %.1f MB, loaded in %.2fs",
+                 snap.generation, snap.n, snap.nbytes() / 2**20, time.perf_counter() - t0)
+
+def _watch() -> None:
+    while True:
+        try:
+            reload()
+        except Exception:
+            log.exception("catalog engine reload failed")
+        time.sleep(CATALOG_ENGINE_CHECK_S)
+
+def start() -> None:
+    # первая загрузка и дальнейшие проверки generation — в фоне, до загрузки работает SQL-путь
+    if enabled():
+        threading.Thread(target=_watch, name="catalog-engine", daemon=True).start()
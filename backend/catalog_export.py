@@ -0,0 +1,108 @@
+# /home/skillseek/app/backend/catalog_export.py
+# POST /catalog/export — весь результат фильтра (те же CatalogFilters, что у /catalog/search, без пагинации)
+# одним потоком NDJSON или CSV, по желанию gzip (Content-Encoding: gzip).
+# Один SELECT на один курсор, fetchmany пачками по EXPORT_CHUNK в threadpool: цена линейна по числу строк,
+# память — одна пачка, а не весь результат. Весь экспорт — один снимок БД (одна читающая транзакция).
+# Клиент оборвал соединение — StreamingResponse отменяет поток, курсор закрывается, соединение возвращается в пул.
+import csv, io, os, zlib
+from typing import AsyncIterator, Callable, Iterator, Literal
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from catalog import CATALOG_COLUMNS, CATALOG_FIELDS, CatalogFilters, catalog_where, dumps, order_keys, order_sql
+from common import ConnectionPool
+
+router = APIRouter(tags=["catalog"])
+
+EXPORT_CHUNK = int(os.getenv("EXPORT_CHUNK", "2000"))                  # строк на fetchmany
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "2"))         # одновременных экспортов на воркер
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "3"))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# свой пул: долгий экспорт не занимает соединения read_pool, которые нужны /catalog/search
+export_pool = ConnectionPool(EXPORT_CONCURRENCY, readonly=True, label="export")
+_active = 0
+
+def encode_ndjson(rows) -> bytes:
+    return b"".join(dumps(dict(zip(CATALOG_FIELDS, r))) + b"\n" for r in rows)
+
+def encode_csv(rows) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+def export_rows(filters: CatalogFilters, fmt: str) -> Iterator[bytes]:
+    # синхронный генератор: каждый next() — в threadpool; close() на обрыве закрывает курсор
+    where_sql, params = catalog_where(filters)
+    sql = f"SELECT {CATALOG_COLUMNS} FROM unified_catalog WHERE {where_sql} ORDER BY {order_sql(order_keys(filters))}"
+    encode = encode_ndjson if fmt == "ndjson" else encode_csv
+    with export_pool.connection() as con:
+        cur = con.cursor()
+        cur.row_factory = None   # кортежи: sqlite3.Row здесь только лишняя работа
+        try:
+            cur.execute(sql, params)
+            if fmt == "csv":
+                yield encode_csv([CATALOG_FIELDS])
+            while rows := cur.fetchmany(EXPORT_CHUNK):
+                yield encode(rows)
+        finally:
+            cur.close()
+
+def gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)   # gzip-заголовок
+    try:
+        for chunk in chunks:
+            out = z.compress(chunk)
+            if out:
+                yield out
+        yield z.flush()
+    finally:
+        chunks.close()
+
+async def stream(chunks: Iterator[bytes], release: Callable[[], None]) -> AsyncIterator[bytes]:
+    try:
+        while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+            yield chunk
+    finally:
+        # отмена ждёт завершения текущего next() в потоке, так что генератор здесь не выполняется
+        chunks.close()
+        release()
+
+@router.post("/catalog/export", response_class=StreamingResponse,
+             responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}})
+async def catalog_export(filters: CatalogFilters, fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                         gzip: bool = False):
+    # page, page_size, cursor и with_total игнорируются: отдаются все строки в порядке sort_by/order
+    global _active
+    if _active >= EXPORT_CONCURRENCY:
+        raise HTTPException(status_code=429, detail="Too many exports, retry later")
+    # место занимаем сразу, освобождаем ровно один раз: в finally потока или фоновой задачей ответа,
+    # если клиент ушёл раньше, чем поток начался
+    _active += 1
+    released = False
+
+    def release() -> None:
+        global _active
+        nonlocal released
+        if not released:
+            released = True
+            _active -= 1
+
+    async def release_after() -> None:
+        # async: sync-функцию BackgroundTask вызвал бы в threadpool, а _active меняется только в event loop
+        release()
+
+    chunks = export_rows(filters, fmt)
+    headers = {"Content-Disposition": f'attachment; filename="catalog.{fmt}"', "X-Accel-Buffering": "no"}
+    if gzip:
+        chunks = gzipped(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(stream(chunks, release), media_type=MEDIA_TYPES[fmt], headers=headers,
+                             background=BackgroundTask(release_after))
+
+def close() -> None:
+    export_pool.close()
@@ -1,12 +1,24 @@
 # /home/skillseek/app/backend/common.py
-import os, sqlite3, time
+import os, queue, re, sqlite3, threading, time, unicodedata
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
 
-DB_PATH = "/home/skillseek/app/backend/imdb.db"  # твоя рабочая БД
+import metrics
+
+DB_PATH = os.getenv("DB_PATH", "/home/skillseek/app/backend/imdb.db")  # твоя рабочая БД
 JOIN_BASE_URL = os.getenv("JOIN_BASE_URL", "https://movie-vibe.online").rstrip("/")
 SQLITE_TIMEOUT = 30
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "16"))
+SQLITE_WRITE_POOL_SIZE = int(os.getenv("SQLITE_WRITE_POOL_SIZE", "2"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 2**20)))
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", str(64 * 1024)))
+SQLITE_CACHED_STATEMENTS = 256
 
 def conn() -> sqlite3.Connection:
-    con = sqlite3.connect(DB_PATH, timeout=SQLITE_TIMEOUT, check_same_thread=False)
+    # отдельное соединение (скрипты, долгие чтения); в запросах — read_conn()/write_conn()
+    con = sqlite3.connect(DB_PATH, timeout=SQLITE_TIMEOUT, check_same_thread=False,
+                          factory=metrics.CONNECTION_FACTORY)
+    con.pool_label = "script"
     con.row_factory = sqlite3.Row
     # лёгкие PRAGMA, чтобы меньше ловить "database is locked"
     con.execute("PRAGMA journal_mode=WAL;")
@@ -14,5 +26,130 @@ def conn() -> sqlite3.Connection:
     con.execute("PRAGMA foreign_keys=ON;")
     return con
 
+class ConnectionPool:
+    # долгоживущие соединения на воркер: PRAGMA один раз при открытии, prepared statements кэшируются
+    def __init__(self, size: int, readonly: bool, path: str = DB_PATH, label: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.readonly = readonly
+        self.label = label or ("read" if readonly else "write")   # метка в /metrics
+        self._in_use = metrics.POOL_IN_USE.labels(self.label)
+        self._wait = metrics.POOL_WAIT.labels(self.label)
+        metrics.POOL_SIZE.labels(self.label).inc(size)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, check_same_thread=False,
+                              cached_statements=SQLITE_CACHED_STATEMENTS, factory=metrics.CONNECTION_FACTORY)
+        con.pool_label = self.label
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute("PRAGMA synchronous=NORMAL;")
+        con.execute("PRAGMA foreign_keys=ON;")
+        con.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};")
+        con.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB};")
+        if self.readonly:
+            con.execute("PRAGMA query_only=ON;")
+        return con
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("connection pool is closed")
+            if len(self._all) < self.size:
+                con = self._open()
+                self._all.append(con)
+                return con
+        try:
+            return self._idle.get(timeout=SQLITE_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError("connection pool exhausted")
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        # commit при нормальном выходе, rollback при исключении; соединение возвращается в пул
+        t = time.perf_counter()
+        con = self._acquire()
+        self._wait.observe(time.perf_counter() - t)
+        self._in_use.inc()
+        try:
+            yield con
+            if con.in_transaction:
+                con.commit()
+        except BaseException:
+            if con.in_transaction:
+                con.rollback()
+            raise
+        finally:
+            self._in_use.dec()
+            if self._closed:
+                con.close()
+            else:
+                self._idle.put(con)
+
+    def close(self) -> None:
+        # свободные закрываем сразу, занятые — когда их вернут
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+read_pool = ConnectionPool(SQLITE_READ_POOL_SIZE, readonly=True)
+write_pool = ConnectionPool(SQLITE_WRITE_POOL_SIZE, readonly=False)
+
+def read_conn():
+    return read_pool.connection()
+
+def write_conn():
+    return write_pool.connection()
+
+def close_pools() -> None:
+    read_pool.close()
+    write_pool.close()
+
+def has_table(con: sqlite3.Connection, name: str) -> bool:
+    return con.execute("SELECT 1 FROM sqlite_master WHERE name=?", (name,)).fetchone() is not None
+
 def now_ms() -> int:
     return int(time.time() * 1000)
+
+def catalog_generation(con: sqlite3.Connection) -> int:
+    # номер сборки unified_catalog (см. sql/build_unified_catalog.sql), 0 если каталог ещё не собирали
+    try:
+        row = con.execute("SELECT value FROM catalog_meta WHERE key='generation'").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+CATALOG_GEN_CHECK_S = float(os.getenv("CATALOG_GEN_CHECK_S", "1"))
+_generation = (0, 0.0)   # (generation, monotonic время проверки)
+
+def current_catalog_generation() -> int:
+    # то же, что catalog_generation, но не чаще раза в CATALOG_GEN_CHECK_S на процесс
+    global _generation
+    gen, checked = _generation
+    if time.monotonic() - checked >= CATALOG_GEN_CHECK_S:
+        with read_conn() as con:
+            gen = catalog_generation(con)
+        _generation = (gen, time.monotonic())
+    return gen
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def fold_tokens(text: Optional[str]) -> List[str]:
+    # как unicode61 remove_diacritics в unified_catalog_fts: нижний регистр, без диакритики
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text)
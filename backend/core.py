@@ -1,15 +1,27 @@
 # /home/skillseek/app/backend/core.py
-import base64, io, secrets, string
+import base64, hashlib, io, os, secrets, string
+from functools import lru_cache
+from typing import Tuple
 import qrcode
 
 ALPHABET = "23456789abcdefghjkmnpqrstuvwxyz"  # без легко путаемых символов
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "1024"))  # ~1 КБ PNG на лобби
 
 def gen_lobby_code(length: int = 16) -> str:
     # читаемый код, lower-case
     return "".join(secrets.choice(ALPHABET) for _ in range(length))
 
-def make_qr_png_base64(payload: str) -> str:
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def render_qr(payload: str) -> Tuple[bytes, str]:
+    # PNG + ETag; create_lobby рендерит, следующий /lobby/{code}/qr берёт из кэша
     img = qrcode.make(payload)
     buf = io.BytesIO()
     img.save(buf, format="PNG")
-    return base64.b64encode(buf.getvalue()).decode("ascii")
+    png = buf.getvalue()
+    return png, '"' + hashlib.sha1(png).hexdigest()[:20] + '"'
+
+def make_qr_png(payload: str) -> bytes:
+    return render_qr(payload)[0]
+
+def make_qr_png_base64(payload: str) -> str:
+    return base64.b64encode(make_qr_png(payload)).decode("ascii")
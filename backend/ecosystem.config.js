@@ -3,14 +3,29 @@ module.exports = {
     {
       name: "movie-night-api",
       cwd: "/home/skillseek/app/backend",
-      // ВАЖНО: запускаем непосредственно python как "script"
-      script: "/home/skillseek/app/backend/.venv/bin/python",
-      // Аргументы: модуль uvicorn и параметры
-      args: "-m uvicorn server:app --host 0.0.0.0 --port 8000 --workers 2",
+      // ВАЖНО: python запускается через exec, так что сигналы pm2 получает сам uvicorn.
+      // Перед стартом мастера — чистый PROMETHEUS_MULTIPROC_DIR: файлы счётчиков/гистограмм воркеров
+      // прошлых запусков (по файлу на pid) иначе копятся и замедляют /metrics; сброс счётчиков
+      // при рестарте Prometheus понимает сам
+      script: "/bin/sh",
+      args: ["-c", "rm -rf -- \"$PROMETHEUS_MULTIPROC_DIR\" && exec /home/skillseek/app/backend/.venv/bin/python " +
+                   "-m uvicorn server:app --host 0.0.0.0 --port 8000 --workers 2"],
       // Критично: говорим PM2 НЕ использовать node как интерпретатор
       interpreter: "none",
       env: {
-        PYTHONPATH: "/home/skillseek/app/backend"
+        PYTHONPATH: "/home/skillseek/app/backend",
+        // CATALOG_ENGINE=memory: /catalog/search из numpy-колонок в памяти КАЖДОГО воркера (--workers 2 => x2)
+        // CATALOG_ENGINE_MAX_MB: бюджет на воркер с пиком загрузки (~0.6 МБ на 1000 тайтлов, x1.6 на время загрузки),
+        // не влезает по оценке или при загрузке — обычный SQL
+        CATALOG_ENGINE: "sql",
+        CATALOG_ENGINE_MAX_MB: "256",
+        // LOBBY_GROUP_COMMIT=1: свайпы пишет один поток пачками (group_commit.py), ответ — после COMMIT пачки;
+        // GROUP_COMMIT_SYNC=FULL — fsync на каждую пачку, NORMAL — быстрее, но последние пачки могут
+        // потеряться при падении ОС (не процесса)
+        LOBBY_GROUP_COMMIT: "0",
+        GROUP_COMMIT_SYNC: "FULL",
+        // /metrics: воркеры пишут метрики в mmap-файлы этого каталога, любой воркер отдаёт сумму
+        PROMETHEUS_MULTIPROC_DIR: "/home/skillseek/app/backend/.prom"
       },
       autorestart: true,
       watch: false,
@@ -27,6 +42,42 @@ module.exports = {
       autorestart: false,
       watch: false,
       time: true
+    },
+    {
+      // инкрементальная пересборка unified_catalog по catalog_dirty (полная — build_catalog.py --full)
+      name: "catalog-build",
+      cwd: "/home/skillseek/app/backend",
+      script: "/home/skillseek/app/backend/.venv/bin/python",
+      args: "build_catalog.py",
+      interpreter: "none",
+      cron_restart: "15 * * * *",
+      autorestart: false,
+      watch: false,
+      time: true
+    },
+    {
+      // лобби без активности > LOBBY_TTL_HOURS -> архив (lobby_archive.db), incremental_vacuum, WAL checkpoint
+      name: "lobby-sweeper",
+      cwd: "/home/skillseek/app/backend",
+      script: "/home/skillseek/app/backend/.venv/bin/python",
+      args: "sweeper.py",
+      interpreter: "none",
+      cron_restart: "*/10 * * * *",
+      autorestart: false,
+      watch: false,
+      time: true
+    },
+    {
+      // изменения TMDB с прошлой отметки -> enrichment_state -> перекачка только изменённых тайтлов
+      name: "tmdb-sync",
+      cwd: "/home/skillseek/app/backend",
+      script: "/home/skillseek/app/backend/.venv/bin/python",
+      args: "tools/sync_changes.py",
+      interpreter: "none",
+      cron_restart: "30 4 * * *",
+      autorestart: false,
+      watch: false,
+      time: true
     }
   ]
 }
@@ -0,0 +1,101 @@
+# /home/skillseek/app/backend/enrichment.py
+# Очередь дозагрузки деталей TMDB: строка на тайтл (kind = media_type) со статусом и next_due_ms.
+# Лоадеры ничего не делают специально — строки заводят/переносят/удаляют триггеры на tmdb_movies,
+# фетчеры (tools/tmdb_fetcher.py) отмечают результат в той же транзакции, что и данные.
+# Выбор следующей пачки — range scan по idx_enrichment_due, цена пропорциональна числу "созревших" тайтлов.
+import os, sqlite3
+from typing import Iterable, List, Tuple
+
+from common import now_ms
+
+ENRICH_MAX_ATTEMPTS = int(os.getenv("ENRICH_MAX_ATTEMPTS", "6"))
+ENRICH_RETRY_BASE_MS = 15 * 60 * 1000          # 15 мин, удваивается с каждой неудачей
+ENRICH_RETRY_MAX_MS = 7 * 24 * 3600 * 1000
+
+# status: pending — ждёт загрузки; done — загружен (next_due_ms NULL, пока кто-то не пометит заново);
+# failed — ретраи с backoff, после ENRICH_MAX_ATTEMPTS — NULL; gone — TMDB ответил 404
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrichment_state (
+    kind            TEXT NOT NULL,          -- 'movie' | 'tv'
+    tmdb_id         INTEGER NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    last_fetched_ms INTEGER,
+    next_due_ms     INTEGER,                -- NULL — делать нечего
+    PRIMARY KEY (kind, tmdb_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_enrichment_due ON enrichment_state(kind, next_due_ms);
+
+-- новый (или перезаписанный через INSERT OR REPLACE) тайтл — в очередь
+CREATE TRIGGER IF NOT EXISTS trg_es_movies_ins AFTER INSERT ON tmdb_movies BEGIN
+  INSERT INTO enrichment_state(kind, tmdb_id, status, next_due_ms)
+  VALUES (COALESCE(NEW.media_type, 'movie'), NEW.id, 'pending', 0)
+  ON CONFLICT(kind, tmdb_id) DO UPDATE SET status = 'pending', attempts = 0, next_due_ms = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_es_movies_kind AFTER UPDATE OF media_type ON tmdb_movies
+WHEN COALESCE(OLD.media_type, 'movie') IS NOT COALESCE(NEW.media_type, 'movie') BEGIN
+  DELETE FROM enrichment_state WHERE kind = COALESCE(OLD.media_type, 'movie') AND tmdb_id = OLD.id;
+  INSERT OR IGNORE INTO enrichment_state(kind, tmdb_id, status, next_due_ms)
+  VALUES (COALESCE(NEW.media_type, 'movie'), NEW.id, 'pending', 0);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_es_movies_del AFTER DELETE ON tmdb_movies BEGIN
+  DELETE FROM enrichment_state WHERE kind = COALESCE(OLD.media_type, 'movie') AND tmdb_id = OLD.id;
+END;
+"""
+
+# разовое заполнение при создании таблицы: незаполненные тайтлы — pending, остальные — done
+BACKFILL = """
+INSERT OR IGNORE INTO enrichment_state(kind, tmdb_id, status, next_due_ms)
+SELECT kind, id, CASE WHEN incomplete THEN 'pending' ELSE 'done' END, CASE WHEN incomplete THEN 0 END
+FROM (
+  SELECT COALESCE(m.media_type, 'movie') AS kind, m.id,
+    CASE WHEN COALESCE(m.media_type, 'movie') = 'tv'
+      THEN m.episodes_count IS NULL
+           OR NOT EXISTS (SELECT 1 FROM tmdb_movie_genres g WHERE g.movie_id = m.id)
+      ELSE m.imdb_id IS NULL OR m.runtime_minutes IS NULL
+           OR NOT EXISTS (SELECT 1 FROM tmdb_movie_genres g WHERE g.movie_id = m.id)
+           OR NOT EXISTS (SELECT 1 FROM tmdb_movie_cast c WHERE c.movie_id = m.id)
+           OR NOT EXISTS (SELECT 1 FROM tmdb_movie_crew w WHERE w.movie_id = m.id)
+    END AS incomplete
+  FROM tmdb_movies m)
+"""
+
+def ensure_schema(con: sqlite3.Connection) -> None:
+    # схема и backfill — одной транзакцией
+    fresh = not con.execute("SELECT 1 FROM sqlite_master WHERE name='enrichment_state'").fetchone()
+    con.executescript(f"BEGIN; {SCHEMA} {BACKFILL if fresh else ''}; COMMIT;")
+
+def due(con: sqlite3.Connection, kind: str, after: Tuple[int, int], limit: int, now: int) -> List[Tuple[int, int]]:
+    # keyset по (next_due_ms, tmdb_id): повторные вызовы в одном прогоне не выдают одно и то же дважды
+    return con.execute("""
+        SELECT next_due_ms, tmdb_id FROM enrichment_state
+        WHERE kind = ? AND next_due_ms <= ? AND (next_due_ms, tmdb_id) > (?, ?)
+        ORDER BY next_due_ms, tmdb_id LIMIT ?""", (kind, now, after[0], after[1], limit)).fetchall()
+
+def mark_done(con: sqlite3.Connection, kind: str, ids: Iterable[int]) -> None:
+    ts = now_ms()
+    con.executemany("""UPDATE enrichment_state SET status='done', attempts=0, last_fetched_ms=?, next_due_ms=NULL
+                       WHERE kind=? AND tmdb_id=?""", [(ts, kind, i) for i in ids])
+
+def mark_gone(con: sqlite3.Connection, kind: str, ids: Iterable[int]) -> None:
+    ts = now_ms()
+    con.executemany("""UPDATE enrichment_state SET status='gone', last_fetched_ms=?, next_due_ms=NULL
+                       WHERE kind=? AND tmdb_id=?""", [(ts, kind, i) for i in ids])
+
+def mark_failed(con: sqlite3.Connection, kind: str, ids: Iterable[int]) -> None:
+    ts = now_ms()
+    con.executemany("""UPDATE enrichment_state SET status='failed', attempts=attempts+1, last_fetched_ms=?,
+                         next_due_ms = CASE WHEN attempts + 1 >= ? THEN NULL
+                                            ELSE ? + MIN(?, ? << attempts) END
+                       WHERE kind=? AND tmdb_id=?""",
+                    [(ts, ENRICH_MAX_ATTEMPTS, ts, ENRICH_RETRY_MAX_MS, ENRICH_RETRY_BASE_MS, kind, i) for i in ids])
+
+def mark_due(con: sqlite3.Connection, kind: str, ids: Iterable[int]) -> int:
+    # поставить в очередь заново (например, тайтл поменялся в TMDB); неизвестные id пропускаются
+    cur = con.executemany("""UPDATE enrichment_state SET status='pending', attempts=0, next_due_ms=0
+                             WHERE kind=? AND tmdb_id=?""", [(kind, i) for i in ids])
+    return cur.rowcount
+
+def due_count(con: sqlite3.Connection, kind: str, now: int) -> int:
+    return con.execute("SELECT COUNT(*) FROM enrichment_state WHERE kind = ? AND next_due_ms <= ?",
+                       (kind, now)).fetchone()[0]
@@ -0,0 +1,143 @@
+# /home/skillseek/app/backend/group_commit.py
+# Group commit: запросы кладут операцию в ограниченную очередь, один поток-писатель применяет их пачками —
+# одна транзакция (и один fsync WAL) на пачку вместо одной на запрос, и воркеры меньше дерутся за write-lock.
+# Ответ уходит клиенту только после COMMIT пачки, в которую попала его операция.
+import logging, os, queue, sqlite3, threading, time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from common import ConnectionPool
+
+GROUP_COMMIT_MS = float(os.getenv("GROUP_COMMIT_MS", "2"))          # сколько ждём, чтобы добрать пачку
+GROUP_COMMIT_BATCH = int(os.getenv("GROUP_COMMIT_BATCH", "256"))
+GROUP_COMMIT_QUEUE = int(os.getenv("GROUP_COMMIT_QUEUE", "4096"))
+# FULL — fsync на каждый COMMIT пачки; NORMAL (как у остальных соединений) — в WAL без fsync до чекпойнта
+GROUP_COMMIT_SYNC = os.getenv("GROUP_COMMIT_SYNC", "FULL").upper()
+
+log = logging.getLogger("group_commit")
+
+class QueueFull(Exception):
+    pass
+
+class GroupCommitWriter:
+    def __init__(self, apply: Callable[[sqlite3.Cursor, Any], Any], name: str = "group-commit",
+                 max_wait_ms: float = GROUP_COMMIT_MS, batch: int = GROUP_COMMIT_BATCH,
+                 maxsize: int = GROUP_COMMIT_QUEUE, sync: str = GROUP_COMMIT_SYNC,
+                 on_commit: Optional[Callable[[], None]] = None):
+        # apply(cur, item) выполняется внутри транзакции пачки; исключение откатывает только эту операцию
+        self.apply = apply
+        self.name = name
+        self.max_wait = max_wait_ms / 1000
+        self.batch = batch
+        self.sync = sync if sync in ("OFF", "NORMAL", "FULL", "EXTRA") else "FULL"
+        self.on_commit = on_commit
+        self._q: "queue.Queue[Optional[Tuple[Any, Future]]]" = queue.Queue(maxsize)
+        self._pool = ConnectionPool(1, readonly=False, label=name)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item: Any, timeout: float = 1.0) -> Future:
+        self._ensure_thread()
+        fut: Future = Future()
+        try:
+            self._q.put((item, fut), timeout=timeout)
+        except queue.Full:
+            raise QueueFull(f"{self.name} queue is full")
+        return fut
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _collect(self, first: Tuple[Any, Future]) -> Tuple[List[Tuple[Any, Future]], bool]:
+        # всё, что уже в очереди, плюс то, что успеет прийти за max_wait
+        batch, stop = [first], False
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch:
+            try:
+                nxt = self._q.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if nxt is None:
+                stop = True
+                break
+            batch.append(nxt)
+        return batch, stop
+
+    def _flush(self, con: sqlite3.Connection, batch: List[Tuple[Any, Future]]) -> None:
+        results: List[Tuple[Future, bool, Any]] = []
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            for item, fut in batch:
+                if not fut.set_running_or_notify_cancel():
+                    continue   # запрос уже отменён (клиент ушёл) — операцию не применяем
+                cur.execute("SAVEPOINT op")
+                try:
+                    res = self.apply(cur, item)
+                except Exception as e:
+                    cur.execute("ROLLBACK TO op")
+                    cur.execute("RELEASE op")
+                    results.append((fut, False, e))
+                else:
+                    cur.execute("RELEASE op")
+                    results.append((fut, True, res))
+            cur.execute("COMMIT")
+        except Exception as e:
+            if con.in_transaction:
+                con.rollback()
+            for _, fut in batch:
+                if fut.running() or fut.set_running_or_notify_cancel():
+                    fut.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(batch)
+        # результаты — только после COMMIT: клиент не увидит ответа на незафиксированную операцию
+        for fut, ok, res in results:
+            if ok:
+                fut.set_result(res)
+            else:
+                fut.set_exception(res)
+        if self.on_commit is not None:
+            try:
+                self.on_commit()
+            except Exception:
+                log.exception("%s on_commit failed", self.name)
+
+    def _run(self) -> None:
+        with self._pool.connection() as con:
+            con.execute(f"PRAGMA synchronous={self.sync};")
+            while True:
+                first = self._q.get()
+                if first is None:
+                    return
+                batch, stop = self._collect(first)
+                try:
+                    self._flush(con, batch)
+                except Exception:
+                    log.exception("%s flush failed", self.name)
+                if stop:
+                    return
+
+    def close(self, timeout: float = 5.0) -> None:
+        # дописать то, что уже в очереди, и остановить писателя
+        if self._thread is not None:
+            self._q.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+        self._pool.close()
+
+    def stats(self) -> dict:
+        return {"queued": self._q.qsize(), "batches": self.batches, "items": self.items,
+                "avg_batch": round(self.items / self.batches, 2) if self.batches else None}
@@ -1,36 +1,177 @@
-import gzip, sqlite3, csv, os, pathlib, urllib.request
-DB_PATH = pathlib.Path(__file__).with_name('imdb.db')
+# /home/skillseek/app/backend/load_imdb.py
+# Импорт рейтингов IMDb (title.ratings.tsv.gz) в title_ratings и imdb_ratings:
+#   - файл качается только если изменился (ETag), и не импортируется, если sha256 тот же, что в прошлый раз;
+#   - TSV читается потоком в TEMP-таблицу (write-lock основной БД на это время не берётся);
+#   - в рабочие таблицы пишется только разница (новые/изменённые/исчезнувшие строки) короткими транзакциями,
+#     так что API продолжает читать, а триггеры catalog_dirty видят только реально изменённые тайтлы.
+#   python load_imdb.py                              # скачать и обновить обе таблицы
+#   python load_imdb.py --file title.ratings.tsv.gz  # локальный файл, без скачивания
+#   python load_imdb.py --tables imdb_ratings --force
+import argparse, csv, gzip, hashlib, itertools, json, pathlib, sqlite3, time, urllib.error, urllib.request
+from typing import Iterator, Optional, Sequence, Tuple
+
+from common import DB_PATH, SQLITE_TIMEOUT, now_ms
+
 DATA_URL = 'https://datasets.imdbws.com/title.ratings.tsv.gz'
+GZ_PATH = pathlib.Path(__file__).with_name('title.ratings.tsv.gz')
+TABLES = ('title_ratings', 'imdb_ratings')
+STAGE_BATCH = 50_000      # строк на executemany при заливке staging
+APPLY_BATCH = 20_000      # строк на транзакцию при применении разницы
+MIN_KEEP_RATIO = 0.5      # если в файле меньше половины строк таблицы — файл битый, удалять ничего не будем
 
 def ensure_db(conn: sqlite3.Connection):
-    cur = conn.cursor()
-    cur.execute('''CREATE TABLE IF NOT EXISTS title_ratings (
-        tconst TEXT PRIMARY KEY,
-        averageRating REAL,
-        numVotes INTEGER
+    for table in TABLES:
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+            tconst TEXT PRIMARY KEY,
+            averageRating REAL,
+            numVotes INTEGER
+        )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS import_state (
+        name        TEXT PRIMARY KEY,     -- что импортировали (таблица / источник)
+        sha256      TEXT,
+        etag        TEXT,
+        rows        INTEGER,
+        imported_ms INTEGER
     )''')
-    cur.execute('CREATE INDEX IF NOT EXISTS idx_tr_tconst ON title_ratings(tconst)')
+
+def get_state(conn: sqlite3.Connection, name: str) -> dict:
+    row = conn.execute('SELECT sha256, etag, rows, imported_ms FROM import_state WHERE name=?', (name,)).fetchone()
+    return dict(zip(('sha256', 'etag', 'rows', 'imported_ms'), row)) if row else {}
+
+def set_state(conn: sqlite3.Connection, name: str, **fields):
+    conn.execute('INSERT OR IGNORE INTO import_state(name) VALUES(?)', (name,))
+    for k, v in fields.items():
+        conn.execute(f'UPDATE import_state SET {k}=? WHERE name=?', (v, name))
+
+def download(conn: sqlite3.Connection) -> Tuple[pathlib.Path, bool]:
+    # условный GET: 304 -> файл на диске актуален
+    etag = get_state(conn, 'download').get('etag')
+    req = urllib.request.Request(DATA_URL)
+    if etag and GZ_PATH.exists():
+        req.add_header('If-None-Match', etag)
+    try:
+        with urllib.request.urlopen(req, timeout=120) as r, open(GZ_PATH.with_suffix('.part'), 'wb') as out:
+            while chunk := r.read(1 << 20):
+                out.write(chunk)
+            new_etag = r.headers.get('ETag')
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            print('Not modified:', DATA_URL)
+            return GZ_PATH, False
+        raise
+    GZ_PATH.with_suffix('.part').replace(GZ_PATH)
+    set_state(conn, 'download', etag=new_etag, imported_ms=now_ms())
     conn.commit()
+    print('Downloaded', DATA_URL)
+    return GZ_PATH, True
+
+def file_sha256(path: pathlib.Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+def read_tsv(path: pathlib.Path) -> Iterator[Tuple[str, Optional[float], int]]:
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+        header = next(reader)
+        i_id, i_rating, i_votes = (header.index(c) for c in ('tconst', 'averageRating', 'numVotes'))
+        for row in reader:
+            rating, votes = row[i_rating], row[i_votes]
+            yield (row[i_id],
+                   None if rating == '\\N' else float(rating),
+                   0 if votes == '\\N' else int(votes))
 
-def download():
-    gz_path = pathlib.Path('title.ratings.tsv.gz')
-    print('Downloading', DATA_URL)
-    urllib.request.urlretrieve(DATA_URL, gz_path)
-    return gz_path
-
-def import_tsv(gz_path, conn):
-    with gzip.open(gz_path, 'rt', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        rows = [(r['tconst'], float(r['averageRating']), int(r['numVotes'])) for r in reader]
-    cur = conn.cursor()
-    cur.execute('DELETE FROM title_ratings')
-    cur.executemany('INSERT OR REPLACE INTO title_ratings (tconst, averageRating, numVotes) VALUES (?,?,?)', rows)
+def stage(conn: sqlite3.Connection, path: pathlib.Path) -> int:
+    # TEMP-таблица живёт в отдельном временном файле соединения: основная БД не блокируется
+    conn.execute('DROP TABLE IF EXISTS temp.ratings_stage')
+    conn.execute('''CREATE TEMP TABLE ratings_stage (
+        tconst TEXT PRIMARY KEY, averageRating REAL, numVotes INTEGER) WITHOUT ROWID''')
+    rows = read_tsv(path)
+    n = 0
+    while batch := list(itertools.islice(rows, STAGE_BATCH)):
+        conn.executemany('INSERT OR REPLACE INTO temp.ratings_stage VALUES (?,?,?)', batch)
+        n += len(batch)
     conn.commit()
-    print(f'Imported {len(rows):,} ratings rows')
+    return n
+
+def apply_delta(conn: sqlite3.Connection, table: str, staged: int) -> dict:
+    # разница считается чтением (без write-lock), потом применяется пачками по APPLY_BATCH
+    conn.execute('DROP TABLE IF EXISTS temp.ratings_delta')
+    conn.execute(f'''CREATE TEMP TABLE ratings_delta AS
+        SELECT s.tconst, s.averageRating, s.numVotes FROM temp.ratings_stage s
+        LEFT JOIN {table} t ON t.tconst = s.tconst
+        WHERE t.tconst IS NULL OR t.averageRating IS NOT s.averageRating OR t.numVotes IS NOT s.numVotes''')
+    conn.execute('DROP TABLE IF EXISTS temp.ratings_gone')
+    conn.execute(f'''CREATE TEMP TABLE ratings_gone AS
+        SELECT t.tconst FROM {table} t
+        WHERE NOT EXISTS (SELECT 1 FROM temp.ratings_stage s WHERE s.tconst = t.tconst)''')
+    conn.commit()
+
+    current = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    changed = conn.execute('SELECT COUNT(*) FROM temp.ratings_delta').fetchone()[0]
+    gone = conn.execute('SELECT COUNT(*) FROM temp.ratings_gone').fetchone()[0]
+    if gone and staged < MIN_KEEP_RATIO * current:
+        print(f'{table}: file has {staged:,} rows vs {current:,} in table, not deleting {gone:,} rows')
+        gone = 0
+
+    # rowid temp-таблиц идут подряд с 1 — режем по диапазонам
+    for lo in range(0, changed, APPLY_BATCH):
+        conn.execute(f'''INSERT INTO {table}(tconst, averageRating, numVotes)
+            SELECT tconst, averageRating, numVotes FROM temp.ratings_delta WHERE rowid > ? AND rowid <= ?
+            ON CONFLICT(tconst) DO UPDATE SET averageRating=excluded.averageRating, numVotes=excluded.numVotes''',
+                     (lo, lo + APPLY_BATCH))
+        conn.commit()
+    for lo in range(0, gone, APPLY_BATCH):
+        conn.execute(f'''DELETE FROM {table} WHERE tconst IN (
+            SELECT tconst FROM temp.ratings_gone WHERE rowid > ? AND rowid <= ?)''', (lo, lo + APPLY_BATCH))
+        conn.commit()
+    return {'changed': changed, 'deleted': gone}
+
+def run(db_path: str = DB_PATH, path: Optional[pathlib.Path] = None, tables: Sequence[str] = TABLES,
+        force: bool = False) -> dict:
+    t0 = time.perf_counter()
+    conn = sqlite3.connect(db_path, timeout=SQLITE_TIMEOUT)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        ensure_db(conn)
+        conn.commit()
+        if path is None:
+            path, _ = download(conn)
+        sha = file_sha256(path)
+        todo = [t for t in tables if force or get_state(conn, t).get('sha256') != sha]
+        report = {'file': str(path), 'skipped': [t for t in tables if t not in todo]}
+        if not todo:
+            print('Unchanged input, nothing to do')
+            return report
+
+        t1 = time.perf_counter()
+        staged = stage(conn, path)
+        stage_s = time.perf_counter() - t1
+        report.update(rows=staged, stage_s=round(stage_s, 1), rows_per_s=int(staged / max(stage_s, 1e-9)))
+        for table in todo:
+            t2 = time.perf_counter()
+            res = apply_delta(conn, table, staged)
+            set_state(conn, table, sha256=sha, rows=staged, imported_ms=now_ms())
+            conn.commit()
+            report[table] = {**res, 'apply_s': round(time.perf_counter() - t2, 1)}
+        conn.execute('DROP TABLE IF EXISTS temp.ratings_stage')
+        report['total_s'] = round(time.perf_counter() - t0, 1)
+        return report
+    finally:
+        conn.close()
 
 if __name__ == '__main__':
-    conn = sqlite3.connect(DB_PATH)
-    ensure_db(conn)
-    gz = download()
-    import_tsv(gz, conn)
-    print('Done. DB at', DB_PATH)
+    ap = argparse.ArgumentParser(description='Import IMDb title.ratings.tsv.gz (streaming, delta only)')
+    ap.add_argument('--db', default=DB_PATH)
+    ap.add_argument('--file', type=pathlib.Path, help='local .tsv.gz, skip download')
+    ap.add_argument('--tables', default=','.join(TABLES), help='comma-separated: ' + ', '.join(TABLES))
+    ap.add_argument('--force', action='store_true', help='import even if the file did not change')
+    args = ap.parse_args()
+    tables = [t.strip() for t in args.tables.split(',') if t.strip()]
+    bad = [t for t in tables if t not in TABLES]
+    if bad:
+        ap.error(f'unknown tables: {bad}')
+    print(json.dumps(run(args.db, args.file, tables, args.force)))
@@ -1,5 +1,8 @@
-import gzip, sqlite3, os, csv, sys
+import json, os, pathlib, sys
 
+from load_imdb import run
+
+# Тонкая обёртка над load_imdb.py (потоковый импорт с дельтой) только для imdb_ratings.
 # База: можно передать 1-м аргументом или через env DB_PATH
 DB_PATH = sys.argv[1] if len(sys.argv) > 1 else os.getenv("DB_PATH", "imdb.db")
 DB_PATH = os.path.abspath(DB_PATH)
@@ -11,38 +14,4 @@ TSV_PATH = os.path.abspath(TSV_PATH)
 print(f"DB:  {DB_PATH}")
 print(f"TSV: {TSV_PATH}")
 
-con = sqlite3.connect(DB_PATH)
-cur = con.cursor()
-cur.execute("""
-CREATE TABLE IF NOT EXISTS imdb_ratings (
-  tconst TEXT PRIMARY KEY,
-  averageRating REAL,
-  numVotes INTEGER
-)""")
-cur.execute("PRAGMA synchronous=OFF")
-cur.execute("PRAGMA journal_mode=OFF")
-
-count=0
-with gzip.open(TSV_PATH, "rt", encoding="utf-8") as f:
-    reader = csv.DictReader(f, delimiter="\t")
-    batch=[]
-    for row in reader:
-        tconst = row["tconst"]
-        rating = None if row["averageRating"]=="\\N" else float(row["averageRating"])
-        votes  = 0    if row["numVotes"]=="\\N"       else int(row["numVotes"])
-        batch.append((tconst, rating, votes))
-        if len(batch) >= 5000:
-            cur.executemany(
-              "INSERT OR REPLACE INTO imdb_ratings(tconst,averageRating,numVotes) VALUES(?,?,?)",
-              batch
-            )
-            con.commit(); count += len(batch); batch.clear()
-    if batch:
-        cur.executemany(
-          "INSERT OR REPLACE INTO imdb_ratings(tconst,averageRating,numVotes) VALUES(?,?,?)",
-          batch
-        )
-        con.commit(); count += len(batch)
-
-con.close()
-print(f"Loaded {count} rows into imdb_ratings")
+print(json.dumps(run(DB_PATH, pathlib.Path(TSV_PATH), ("imdb_ratings",))))
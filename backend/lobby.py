@@ -1,19 +1,39 @@
 # /home/skillseek/app/backend/lobby.py
-from typing import Optional, Literal
-from fastapi import APIRouter, HTTPException, Response
+from typing import List, Optional, Literal
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import sqlite3
+from starlette.concurrency import run_in_threadpool
+import asyncio, os, sqlite3
 
-from common import conn, JOIN_BASE_URL, now_ms
-from core import gen_lobby_code, make_qr_png_base64
+from common import read_conn, write_conn, JOIN_BASE_URL, now_ms
+from catalog import CatalogFilters, CatalogItem, CATALOG_COLUMNS, catalog_where, order_keys, order_sql
+from core import gen_lobby_code, make_qr_png_base64, render_qr
+import lobby_events
+import metrics
+from group_commit import GroupCommitWriter, QueueFull
+from lobby_events import publish
 
 router = APIRouter(prefix="/lobby", tags=["lobby"])
 
+LOBBY_MATCH_LIKES = int(os.getenv("LOBBY_MATCH_LIKES", "2"))  # сколько лайков нужно для матча
+QR_MAX_AGE = 7 * 86400
+LOBBY_GROUP_COMMIT = os.getenv("LOBBY_GROUP_COMMIT", "0") == "1"
+LOBBY_DECK_SIZE = int(os.getenv("LOBBY_DECK_SIZE", "500"))   # сколько тайтлов заранее раскладываем в колоду
+
 def ensure_lobby_schema():
-    con = conn()
-    try:
+    # схема и досчёт счётчиков — одной транзакцией под write-lock (BEGIN IMMEDIATE): воркеры стартуют
+    # одновременно, и второй ждёт первого; досчёт ещё и INSERT OR IGNORE — повтор ничего не ломает
+    with write_conn() as con:
         cur = con.cursor()
+        had_likes = cur.execute("SELECT 1 FROM sqlite_master WHERE name='lobby_item_likes'").fetchone()
+        # первый запуск после появления счётчиков: досчитать по уже накопленным свайпам
+        backfill = "" if had_likes else """
+        INSERT OR IGNORE INTO lobby_item_likes(lobby_id, item_id, likes)
+        SELECT lobby_id, item_id, COUNT(*) FROM lobby_swipes
+         WHERE decision='like' GROUP BY lobby_id, item_id;"""
         cur.executescript("""
+        BEGIN IMMEDIATE;
         CREATE TABLE IF NOT EXISTS lobbies(
             id            TEXT PRIMARY KEY,         -- код = id
             created_at_ms INTEGER NOT NULL,
@@ -47,11 +67,26 @@ def ensure_lobby_schema():
             FOREIGN KEY(lobby_id) REFERENCES lobbies(id) ON DELETE CASCADE
         );
 
+        -- счётчик лайков на (лобби, тайтл): матч без COUNT(*) по lobby_swipes
+        CREATE TABLE IF NOT EXISTS lobby_item_likes(
+            lobby_id  TEXT NOT NULL,
+            item_id   INTEGER NOT NULL,
+            likes     INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(lobby_id, item_id),
+            FOREIGN KEY(lobby_id) REFERENCES lobbies(id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+
+        -- колода лобби: порядок кандидатов по фильтрам лобби, считается один раз при создании
+        CREATE TABLE IF NOT EXISTS lobby_deck(
+            lobby_id  TEXT NOT NULL,
+            pos       INTEGER NOT NULL,
+            item_id   INTEGER NOT NULL,             -- tmdb_id
+            PRIMARY KEY(lobby_id, pos),
+            FOREIGN KEY(lobby_id) REFERENCES lobbies(id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+
         CREATE INDEX IF NOT EXISTS idx_swipes_item ON lobby_swipes(lobby_id, item_id);
-        """)
-        con.commit()
-    finally:
-        con.close()
+        """ + lobby_events.SCHEMA + backfill + "\nCOMMIT;")
 
 ensure_lobby_schema()
 
@@ -59,6 +94,7 @@ ensure_lobby_schema()
 class CreateLobbyIn(BaseModel):
     user_id: str
     nickname: Optional[str] = None
+    filters: Optional[CatalogFilters] = None   # фильтры колоды (как в /catalog/search), page/cursor игнорируются
 
 class JoinLobbyIn(BaseModel):
     code: str
@@ -71,20 +107,73 @@ class SwipeIn(BaseModel):
     item_id: int
     decision: Literal["like","skip"]
 
+def apply_swipe(cur: sqlite3.Cursor, lobby_id: str, user_id: str, item_id: int, decision: str) -> bool:
+    # свайп + счётчик лайков в одной транзакции; True, если тайтл набрал LOBBY_MATCH_LIKES лайков
+    if not cur.connection.in_transaction:
+        cur.execute("BEGIN IMMEDIATE")   # прежнее решение читаем уже под write-lock
+    prev = cur.execute("SELECT decision FROM lobby_swipes WHERE lobby_id=? AND user_id=? AND item_id=?",
+                       (lobby_id, user_id, item_id)).fetchone()
+    prev = prev["decision"] if prev else None
+    cur.execute("""INSERT INTO lobby_swipes(lobby_id,user_id,item_id,decision,ts_ms)
+                   VALUES(?,?,?,?,?)
+                   ON CONFLICT(lobby_id,user_id,item_id) DO UPDATE SET
+                     decision=excluded.decision, ts_ms=excluded.ts_ms""",
+                (lobby_id, user_id, item_id, decision, now_ms()))
+
+    # like->skip: -1, skip/нет->like: +1, повторный свайп с тем же решением: 0
+    delta = (decision == "like") - (prev == "like")
+    if decision != "like":
+        if delta:
+            likes = cur.execute("""UPDATE lobby_item_likes SET likes = likes + ? WHERE lobby_id=? AND item_id=?
+                                   RETURNING likes""", (delta, lobby_id, item_id)).fetchone()
+            publish(cur, lobby_id, "swipe", {"user_id": user_id, "item_id": item_id, "decision": decision,
+                                             "likes": likes["likes"] if likes else 0})
+        return False
+
+    likes = cur.execute("""INSERT INTO lobby_item_likes(lobby_id, item_id, likes) VALUES(?,?,?)
+                           ON CONFLICT(lobby_id, item_id) DO UPDATE SET likes = likes + excluded.likes
+                           RETURNING likes""", (lobby_id, item_id, delta)).fetchone()["likes"]
+    if delta:
+        publish(cur, lobby_id, "swipe", {"user_id": user_id, "item_id": item_id, "decision": decision,
+                                         "likes": likes})
+    if likes >= LOBBY_MATCH_LIKES:
+        tnow = now_ms()
+        cur.execute("""INSERT OR IGNORE INTO lobby_matches(lobby_id,item_id,matched_ms)
+                       VALUES(?,?,?)""", (lobby_id, item_id, tnow))
+        if cur.rowcount:
+            publish(cur, lobby_id, "matched", {"item_id": item_id, "matched_ms": tnow, "likes": likes})
+        return True
+    return False
+
+def deck_ids(filters: CatalogFilters) -> List[int]:
+    # первые LOBBY_DECK_SIZE тайтлов по фильтрам и сортировке лобби; читается вне write-транзакции,
+    # чтобы тяжёлый запрос по каталогу не держал write-lock, которого ждут свайпы всех лобби
+    where_sql, params = catalog_where(filters)
+    keys = order_keys(filters)
+    try:
+        with read_conn() as con:
+            return [r[0] for r in con.execute(f"""SELECT tmdb_id FROM unified_catalog WHERE {where_sql}
+                                                  ORDER BY {order_sql(keys)} LIMIT ?""",
+                                              (*params, LOBBY_DECK_SIZE))]
+    except sqlite3.OperationalError as e:
+        # каталог ещё не собран — лобби работает и без колоды
+        if "no such table" not in str(e):
+            raise
+        return []
+
 # ----------- routes -----------
 @router.post("/create")
 def create_lobby(data: CreateLobbyIn):
     code = gen_lobby_code(16)
+    deck = deck_ids(data.filters or CatalogFilters())
     tnow = now_ms()
-    con = conn()
-    try:
+    with write_conn() as con:
         cur = con.cursor()
         cur.execute("INSERT INTO lobbies(id, created_at_ms, active) VALUES(?,?,1)", (code, tnow))
         cur.execute("""INSERT OR REPLACE INTO lobby_members(lobby_id, user_id, nickname, joined_ms)
                        VALUES(?,?,?,?)""", (code, data.user_id, data.nickname, tnow))
-        con.commit()
-    finally:
-        con.close()
+        cur.executemany("INSERT INTO lobby_deck(lobby_id, pos, item_id) VALUES(?,?,?)",
+                        [(code, pos, item_id) for pos, item_id in enumerate(deck, 1)])
 
     join_url = f"{JOIN_BASE_URL}/lobby/{code}/join"
     qr_b64 = make_qr_png_base64(join_url)
@@ -98,8 +187,7 @@ def create_lobby(data: CreateLobbyIn):
 @router.post("/join")
 def join_lobby(data: JoinLobbyIn):
     code = (data.code or "").lower()
-    con = conn()
-    try:
+    with write_conn() as con:
         cur = con.cursor()
         row = cur.execute("SELECT id, active FROM lobbies WHERE id=?", (code,)).fetchone()
         if not row:
@@ -107,17 +195,16 @@ def join_lobby(data: JoinLobbyIn):
         if row["active"] != 1:
             raise HTTPException(status_code=410, detail="Lobby inactive")
 
+        tnow = now_ms()
         cur.execute("""INSERT OR REPLACE INTO lobby_members(lobby_id, user_id, nickname, joined_ms)
-                       VALUES(?,?,?,?)""", (code, data.user_id, data.nickname, now_ms()))
-        con.commit()
-        return {"ok": True, "lobby_id": code}
-    finally:
-        con.close()
+                       VALUES(?,?,?,?)""", (code, data.user_id, data.nickname, tnow))
+        publish(cur, code, "member_joined", {"user_id": data.user_id, "nickname": data.nickname, "joined_ms": tnow})
+    lobby_events.hub.notify()
+    return {"ok": True, "lobby_id": code}
 
 @router.get("/{code}/info")
 def lobby_info(code: str):
-    con = conn()
-    try:
+    with read_conn() as con:
         cur = con.cursor()
         lob = cur.execute("SELECT id, created_at_ms, active FROM lobbies WHERE id=?", (code,)).fetchone()
         if not lob:
@@ -137,47 +224,93 @@ def lobby_info(code: str):
             "members": members,
             "matches": matches,
         }
-    finally:
-        con.close()
+
+@router.get("/{code}/deck")
+def lobby_deck(code: str, user_id: str, n: int = 10):
+    # следующие n карточек для участника: сначала то, что уже лайкнули другие (быстрее матч),
+    # потом колода по порядку; всё, что он уже свайпнул, отсекается по PK lobby_swipes
+    n = min(50, max(1, n))
+    not_swiped = """NOT EXISTS (SELECT 1 FROM lobby_swipes s
+                                WHERE s.lobby_id = ? AND s.user_id = ? AND s.item_id = {col})"""
+    with read_conn() as con:
+        m = con.execute("SELECT 1 FROM lobby_members WHERE lobby_id=? AND user_id=?", (code, user_id)).fetchone()
+        if not m:
+            raise HTTPException(status_code=403, detail="User is not in lobby")
+
+        liked = [r[0] for r in con.execute(f"""
+            SELECT l.item_id FROM lobby_item_likes l
+             WHERE l.lobby_id = ? AND l.likes > 0 AND {not_swiped.format(col="l.item_id")}
+             ORDER BY l.likes DESC, l.item_id
+             LIMIT ?""", (code, code, user_id, n))]
+        rest = [r[0] for r in con.execute(f"""
+            SELECT d.item_id FROM lobby_deck d
+             WHERE d.lobby_id = ? AND {not_swiped.format(col="d.item_id")}
+             ORDER BY d.pos
+             LIMIT ?""", (code, code, user_id, n + len(liked)))]
+        ids = list(dict.fromkeys(liked + rest))[:n]
+
+        rows = {}
+        if ids:
+            rows = {r["tmdb_id"]: r for r in con.execute(
+                f"SELECT {CATALOG_COLUMNS} FROM unified_catalog WHERE tmdb_id IN ({','.join('?' * len(ids))})", ids)}
+
+    items = [CatalogItem(**dict(rows[i])).model_dump() for i in ids if i in rows]
+    return {"lobby_id": code, "user_id": user_id, "items": items}
+
+@router.get("/{code}/events")
+async def lobby_events_stream(code: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    # SSE: member_joined / swipe / matched; при переподключении браузер сам шлёт Last-Event-ID
+    after = request.query_params.get("last_event_id") or last_event_id
+    if after is not None and not after.isdigit():
+        raise HTTPException(status_code=400, detail="Bad Last-Event-ID")
+    def exists():
+        with read_conn() as con:
+            return con.execute("SELECT 1 FROM lobbies WHERE id=?", (code,)).fetchone() is not None
+    if not await run_in_threadpool(exists):
+        raise HTTPException(status_code=404, detail="Lobby not found")
+    return StreamingResponse(
+        lobby_events.stream(code, int(after) if after is not None else None, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{code}/qr")
-def lobby_qr(code: str):
-    # отдаём PNG прямо байтами
+def lobby_qr(code: str, if_none_match: Optional[str] = Header(None)):
+    # отдаём PNG прямо байтами; картинка для кода не меняется -> долгий кэш у клиента/CDN
     join_url = f"{JOIN_BASE_URL}/lobby/{code}/join"
-    png_b64 = make_qr_png_base64(join_url)
-    import base64
-    png = base64.b64decode(png_b64)
-    return Response(content=png, media_type="image/png")
+    png, etag = render_qr(join_url)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={QR_MAX_AGE}, immutable"}
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type="image/png", headers=headers)
 
-@router.post("/swipe")
-def lobby_swipe(data: SwipeIn):
-    con = conn()
-    try:
-        cur = con.cursor()
-        # проверка членства
-        m = cur.execute("""SELECT 1 FROM lobby_members WHERE lobby_id=? AND user_id=?""",
-                        (data.lobby_id, data.user_id)).fetchone()
-        if not m:
-            raise HTTPException(status_code=403, detail="User is not in lobby")
+def swipe_in_txn(cur: sqlite3.Cursor, data: SwipeIn) -> bool:
+    # проверка членства
+    m = cur.execute("""SELECT 1 FROM lobby_members WHERE lobby_id=? AND user_id=?""",
+                    (data.lobby_id, data.user_id)).fetchone()
+    if not m:
+        raise HTTPException(status_code=403, detail="User is not in lobby")
+    return apply_swipe(cur, data.lobby_id, data.user_id, data.item_id, data.decision)
 
-        cur.execute("""INSERT OR REPLACE INTO lobby_swipes(lobby_id,user_id,item_id,decision,ts_ms)
-                       VALUES(?,?,?,?,?)""",
-                    (data.lobby_id, data.user_id, data.item_id, data.decision, now_ms()))
-
-        matched = False
-        # если лайк — проверить, лайкнул ли кто-то ещё
-        if data.decision == "like":
-            liked_count = cur.execute("""
-                SELECT COUNT(*) AS c FROM lobby_swipes
-                 WHERE lobby_id=? AND item_id=? AND decision='like'
-            """, (data.lobby_id, data.item_id)).fetchone()["c"]
-            # два и более лайков → матч фиксируем
-            if liked_count >= 2:
-                cur.execute("""INSERT OR IGNORE INTO lobby_matches(lobby_id,item_id,matched_ms)
-                               VALUES(?,?,?)""", (data.lobby_id, data.item_id, now_ms()))
-                matched = True
-
-        con.commit()
+# LOBBY_GROUP_COMMIT=1: свайпы пишет один поток пачками (group_commit.py), ответ — после COMMIT пачки
+swipe_writer = GroupCommitWriter(swipe_in_txn, name="swipe-writer", on_commit=lobby_events.hub.notify)
+
+def swipe_sync(data: SwipeIn) -> bool:
+    with write_conn() as con:
+        matched = swipe_in_txn(con.cursor(), data)
+    lobby_events.hub.notify()
+    return matched
+
+@router.post("/swipe")
+async def lobby_swipe(data: SwipeIn):
+    if not LOBBY_GROUP_COMMIT:
+        matched = await run_in_threadpool(swipe_sync, data)
+        metrics.swiped(data.decision, matched)
         return {"ok": True, "matched": matched}
-    finally:
-        con.close()
+    try:
+        fut = swipe_writer.submit(data, timeout=0)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Too many swipes, retry")
+    matched = await asyncio.wrap_future(fut)
+    metrics.swiped(data.decision, matched)
+    return {"ok": True, "matched": matched}
@@ -0,0 +1,155 @@
+# /home/skillseek/app/backend/lobby_events.py
+# События лобби для /lobby/{code}/events (SSE) вместо опроса /lobby/{code}/info.
+# Пишутся в lobby_events в той же транзакции, что join/swipe, поэтому id монотонный и общий для всех воркеров.
+# В каждом воркере один Hub: один запрос "id > последний" на воркер (по пинку из своего воркера — сразу,
+# события других воркеров — раз в LOBBY_EVENTS_POLL_MS), дальше раздача подписчикам через asyncio.Queue.
+import asyncio, json, logging, os, sqlite3
+from typing import Any, Dict, List, Optional, Set
+
+from common import read_conn, now_ms
+
+LOBBY_EVENTS_POLL_MS = int(os.getenv("LOBBY_EVENTS_POLL_MS", "250"))
+POLL_BATCH = 500
+REPLAY_BATCH = 500             # досылка пропущенного при переподключении — пачками
+LOBBY_EVENTS_QUEUE = 1000      # отставший подписчик отключается и переподключается с Last-Event-ID
+HEARTBEAT_S = 15
+
+log = logging.getLogger("lobby_events")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lobby_events(
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    lobby_id  TEXT NOT NULL,
+    kind      TEXT NOT NULL,               -- member_joined / swipe / matched
+    payload   TEXT NOT NULL,               -- JSON
+    ts_ms     INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lobby_events_lobby ON lobby_events(lobby_id, id);
+CREATE INDEX IF NOT EXISTS idx_lobby_events_ts ON lobby_events(ts_ms);   -- граница чистки в sweeper.py
+"""
+
+def publish(cur: sqlite3.Cursor, lobby_id: str, kind: str, payload: Dict[str, Any]) -> None:
+    # внутри транзакции вызывающего: событие видно ровно тогда, когда закоммичено само действие
+    cur.execute("INSERT INTO lobby_events(lobby_id, kind, payload, ts_ms) VALUES(?,?,?,?)",
+                (lobby_id, kind, json.dumps(payload, separators=(",", ":")), now_ms()))
+
+def last_event_id() -> int:
+    with read_conn() as con:
+        return con.execute("SELECT COALESCE(MAX(id), 0) FROM lobby_events").fetchone()[0]
+
+def events_since(after_id: int, lobby_id: Optional[str] = None, limit: int = POLL_BATCH) -> List[Dict[str, Any]]:
+    sql = "SELECT id, lobby_id, kind, payload FROM lobby_events WHERE id > ?"
+    args: List[Any] = [after_id]
+    if lobby_id is not None:
+        sql += " AND lobby_id = ?"
+        args.append(lobby_id)
+    sql += " ORDER BY id LIMIT ?"
+    args.append(limit)
+    with read_conn() as con:
+        return [dict(r) for r in con.execute(sql, args)]
+
+def format_sse(evt: Dict[str, Any]) -> bytes:
+    return f"id: {evt['id']}\nevent: {evt['kind']}\ndata: {evt['payload']}\n\n".encode("utf-8")
+
+class Subscription:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(LOBBY_EVENTS_QUEUE)
+        self.overflow = False
+
+class Hub:
+    def __init__(self):
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_id = 0
+
+    async def subscribe(self, lobby_id: str) -> Subscription:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._wake, self._task, self._subs = loop, asyncio.Event(), None, {}
+        sub = Subscription()
+        self._subs.setdefault(lobby_id, set()).add(sub)
+        if self._task is None:
+            last = await asyncio.to_thread(last_event_id)
+            if self._task is None:
+                self._last_id = last
+                self._task = asyncio.ensure_future(self._run())
+        return sub
+
+    def unsubscribe(self, lobby_id: str, sub: Subscription) -> None:
+        subs = self._subs.get(lobby_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subs[lobby_id]
+
+    def notify(self) -> None:
+        # из любого потока (обработчики join/swipe синхронные) — после коммита
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and self._subs:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass   # loop уже закрыт
+
+    async def _run(self) -> None:
+        try:
+            while self._subs:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), LOBBY_EVENTS_POLL_MS / 1000)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                try:
+                    rows = await asyncio.to_thread(events_since, self._last_id)
+                except Exception:
+                    log.exception("lobby events poll failed")
+                    continue
+                for evt in rows:
+                    self._last_id = evt["id"]
+                    for sub in list(self._subs.get(evt["lobby_id"], ())):
+                        try:
+                            sub.queue.put_nowait(evt)
+                        except asyncio.QueueFull:
+                            sub.overflow = True
+                            self.unsubscribe(evt["lobby_id"], sub)
+                if len(rows) == POLL_BATCH:
+                    self._wake.set()   # догоняем без паузы
+        finally:
+            self._task = None
+
+hub = Hub()
+
+async def stream(lobby_id: str, after_id: Optional[int], is_disconnected):
+    # SSE-генератор: подписка -> досылка пропущенного из БД -> живые события; дубли отсекаем по id
+    sub = await hub.subscribe(lobby_id)
+    try:
+        if after_id is None:
+            sent = await asyncio.to_thread(last_event_id)
+        else:
+            sent = after_id
+            while True:
+                rows = await asyncio.to_thread(events_since, sent, lobby_id, REPLAY_BATCH)
+                for evt in rows:
+                    yield format_sse(evt)
+                    sent = evt["id"]
+                if len(rows) < REPLAY_BATCH:
+                    break
+        yield f"retry: 2000\n: connected {sent}\n\n".encode()
+        while True:
+            if sub.overflow and sub.queue.empty():
+                return   # отстали: клиент переподключится с Last-Event-ID и доберёт из БД
+            try:
+                evt = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_S)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield b": ping\n\n"
+                continue
+            if evt["id"] <= sent:
+                continue
+            yield format_sse(evt)
+            sent = evt["id"]
+    finally:
+        hub.unsubscribe(lobby_id, sub)
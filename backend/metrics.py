@@ -0,0 +1,164 @@
+# /home/skillseek/app/backend/metrics.py
+# Prometheus-метрики: GET /metrics (server.py) в текстовом формате.
+# При uvicorn --workers N каждый воркер пишет значения в mmap-файлы PROMETHEUS_MULTIPROC_DIR
+# (multiprocess-режим prometheus_client), /metrics в любом воркере отдаёт сумму по всем воркерам.
+# Без PROMETHEUS_MULTIPROC_DIR — обычный реестр процесса (скрипты, один воркер).
+#   - http_request_duration_seconds{method,route,status}    — ASGI-middleware, route — шаблон пути
+#   - sqlite_query_duration_seconds{pool,op}                 — TimedConnection (common.py), op=begin — ожидание write-lock
+#   - sqlite_locked_total{pool}                             — "database is locked"/busy
+#   - sqlite_pool_in_use / sqlite_pool_size / sqlite_pool_acquire_seconds{pool} — насыщение пулов
+#   - tmdb_request_duration_seconds{endpoint,status}        — каждая попытка HTTP к TMDB
+#   - tmdb_cache_events_total{event}, cache_lookups_total{cache,result} — hit ratio кэшей
+#   - lobby_swipes_total{decision}, lobby_matches_total
+import glob, os, re, sqlite3, time
+from functools import lru_cache
+from typing import Any, Callable, Tuple
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+SQLITE_METRICS = os.getenv("SQLITE_METRICS", "1") != "0"   # ~6 мкс на запрос в multiprocess-режиме
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+SQL_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+HTTP_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency",
+                         ["method", "route", "status"], buckets=HTTP_BUCKETS)
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being served", multiprocess_mode="livesum")
+
+SQL_LATENCY = Histogram("sqlite_query_duration_seconds", "SQLite statement execution time",
+                        ["pool", "op"], buckets=SQL_BUCKETS)
+SQL_LOCKED = Counter("sqlite_locked_total", "SQLite 'database is locked' / busy errors", ["pool"])
+POOL_IN_USE = Gauge("sqlite_pool_in_use", "Connections checked out of the pool", ["pool"],
+                    multiprocess_mode="livesum")
+POOL_SIZE = Gauge("sqlite_pool_size", "Pool capacity", ["pool"], multiprocess_mode="livesum")
+POOL_WAIT = Histogram("sqlite_pool_acquire_seconds", "Time waiting for a pooled connection", ["pool"],
+                      buckets=SQL_BUCKETS)
+
+TMDB_LATENCY = Histogram("tmdb_request_duration_seconds", "TMDB HTTP attempt latency",
+                         ["endpoint", "status"], buckets=HTTP_BUCKETS)
+TMDB_CACHE = Counter("tmdb_cache_events_total", "TMDB response cache events", ["event"])
+CACHE_LOOKUPS = Counter("cache_lookups_total", "In-process cache lookups", ["cache", "result"])
+
+LOBBY_SWIPES = Counter("lobby_swipes_total", "Committed lobby swipes", ["decision"])
+LOBBY_MATCHES = Counter("lobby_matches_total", "Swipes that produced a match")
+
+SQL_OPS = {"select", "insert", "update", "delete", "replace", "with", "begin", "commit", "rollback",
+           "savepoint", "release", "pragma", "create", "drop"}
+
+@lru_cache(maxsize=4096)
+def _sql_op(sql: str) -> str:
+    op = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else "other"
+    return op if op in SQL_OPS else "other"
+
+@lru_cache(maxsize=None)
+def _sql_child(pool: str, op: str):
+    # labels() на каждый запрос заметно дороже самого observe
+    return SQL_LATENCY.labels(pool, op)
+
+def _timed(pool: str, sql: str, fn: Callable, *args) -> Any:
+    t = time.perf_counter()
+    try:
+        return fn(*args)
+    except sqlite3.OperationalError as e:
+        if "locked" in str(e) or "busy" in str(e):
+            SQL_LOCKED.labels(pool).inc()
+        raise
+    finally:
+        _sql_child(pool, _sql_op(sql)).observe(time.perf_counter() - t)
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return _timed(self.connection.pool_label, sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return _timed(self.connection.pool_label, sql, super().executemany, sql, seq_of_parameters)
+
+class LabeledConnection(sqlite3.Connection):
+    pool_label = "other"
+
+class TimedConnection(LabeledConnection):
+    # Connection.execute в CPython не зовёт self.cursor(), поэтому переопределяем и его
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# для sqlite3.connect(..., factory=...): SQLITE_METRICS=0 — без обёрток, но с той же меткой пула
+CONNECTION_FACTORY = TimedConnection if SQLITE_METRICS else LabeledConnection
+
+def swiped(decision: str, matched: bool) -> None:
+    LOBBY_SWIPES.labels(decision).inc()
+    if matched:
+        LOBBY_MATCHES.inc()
+
+@lru_cache(maxsize=256)
+def tmdb_endpoint(path: str) -> str:
+    # /movie/603/credits -> /movie/{id}/credits: метка не должна расти с числом тайтлов
+    return re.sub(r"/\d+(?=/|$)", "/{id}", path)
+
+def observe_tmdb(path: str, status: str, seconds: float) -> None:
+    TMDB_LATENCY.labels(tmdb_endpoint(path), status).observe(seconds)
+
+class MetricsMiddleware:
+    # чистый ASGI, без BaseHTTPMiddleware: не буферизует стриминговые ответы (SSE, экспорт)
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        t = time.perf_counter()
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_LATENCY.labels(scope["method"], route, str(status[0])).observe(time.perf_counter() - t)
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def cleanup_dead_workers() -> None:
+    # livesum-гейджи упавших воркеров (gauge_livesum_<pid>.db) иначе висят в сумме; файлы счётчиков
+    # и гистограмм не трогаем — иначе сумма уменьшится и rate() увидит ложный сброс
+    if not MULTIPROC_DIR:
+        return
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, "gauge_live*_*.db")):
+        pid = os.path.basename(path)[:-3].rsplit("_", 1)[-1]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            multiprocess.mark_process_dead(int(pid), MULTIPROC_DIR)
+
+def worker_exit() -> None:
+    # штатный выход воркера (shutdown в server.py); упавшие — cleanup_dead_workers() на старте следующего
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+def render() -> Tuple[bytes, str]:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
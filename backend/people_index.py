@@ -0,0 +1,147 @@
+# /home/skillseek/app/backend/people_index.py
+# Локальный индекс имён tmdb_people для DiscoverFilters.people: без TMDB /search/person на каждое имя.
+# Имена сворачиваются как в каталоге (регистр, диакритика), токены ищутся точно, потом по префиксу,
+# потом нечётко (difflib); из совпавших берём человека с наибольшим числом титров.
+import bisect, difflib, logging, os, threading, time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common import conn, read_conn, write_conn, fold_tokens
+
+PEOPLE_INDEX = os.getenv("PEOPLE_INDEX", "1") != "0"
+PEOPLE_INDEX_CHECK_S = float(os.getenv("PEOPLE_INDEX_CHECK_S", "600"))
+FUZZY_CUTOFF = 0.8
+FUZZY_MIN_LEN = 3
+
+log = logging.getLogger("people_index")
+
+class PeopleIndex:
+    def __init__(self, signature: Tuple, rows: List[Tuple[int, str, int]]):
+        self.signature = signature
+        self.n = len(rows)
+        self.ids = np.asarray([r[0] for r in rows], dtype=np.int64)
+        self.credits = np.asarray([r[2] for r in rows], dtype=np.int32)
+        post: Dict[str, List[int]] = {}
+        for i, (_, name, _) in enumerate(rows):
+            for tok in set(fold_tokens(name)):
+                post.setdefault(tok, []).append(i)
+        # словарь токенов + постинги (indptr, номера строк по возрастанию), как в catalog_engine
+        self.vocab = sorted(post)
+        lens = np.fromiter((len(post[t]) for t in self.vocab), dtype=np.int64, count=len(self.vocab))
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(lens, out=self.indptr[1:])
+        self.flat = np.fromiter((i for t in self.vocab for i in post[t]), dtype=np.int32, count=int(self.indptr[-1]))
+
+    def _rows(self, tok: str, prefix: bool) -> np.ndarray:
+        lo = bisect.bisect_left(self.vocab, tok)
+        if prefix:
+            hi = bisect.bisect_left(self.vocab, tok + "\U0010ffff")
+            return np.unique(self.flat[self.indptr[lo]:self.indptr[hi]])
+        if lo < len(self.vocab) and self.vocab[lo] == tok:
+            return self.flat[self.indptr[lo]:self.indptr[lo + 1]]
+        return self.flat[:0]
+
+    def _close_tokens(self, tok: str) -> List[str]:
+        # кандидаты — токены на ту же букву: опечатку в первой букве не ловим, зато не перебираем весь словарь
+        lo = bisect.bisect_left(self.vocab, tok[0])
+        hi = bisect.bisect_left(self.vocab, tok[0] + "\U0010ffff")
+        return difflib.get_close_matches(tok, self.vocab[lo:hi], n=3, cutoff=FUZZY_CUTOFF)
+
+    def _match(self, tokens: List[str], mode: str) -> np.ndarray:
+        rows: Optional[np.ndarray] = None
+        for tok in tokens:
+            if mode == "fuzzy":
+                alts = self._close_tokens(tok) if len(tok) >= FUZZY_MIN_LEN else []
+                r = np.unique(np.concatenate([self._rows(t, False) for t in alts] or [self.flat[:0]]))
+                if not r.size:
+                    r = self._rows(tok, True)
+            else:
+                r = self._rows(tok, mode == "prefix")
+            rows = r if rows is None else np.intersect1d(rows, r, assume_unique=True)
+            if not rows.size:
+                break
+        return rows if rows is not None else self.flat[:0]
+
+    def lookup(self, name: str, fuzzy: bool = False) -> Optional[int]:
+        tokens = fold_tokens(name)
+        if not tokens or not self.n:
+            return None
+        for mode in ("exact", "prefix", "fuzzy") if fuzzy else ("exact", "prefix"):
+            rows = self._match(tokens, mode)
+            if rows.size:
+                # больше титров, при равенстве — меньший id
+                best = rows[np.lexsort((self.ids[rows], -self.credits[rows]))[0]]
+                return int(self.ids[best])
+        return None
+
+def people_signature(con) -> Tuple:
+    return tuple(con.execute("SELECT COUNT(*), MAX(id) FROM tmdb_people").fetchone())
+
+def load_index() -> PeopleIndex:
+    con = conn()
+    try:
+        con.execute("BEGIN")
+        signature = people_signature(con)
+        rows = con.execute("""
+            SELECT p.id, p.name, COALESCE(c.n, 0)
+            FROM tmdb_people p
+            LEFT JOIN (
+              SELECT person_id, COUNT(*) AS n FROM (
+                SELECT person_id FROM tmdb_movie_cast
+                UNION ALL
+                SELECT person_id FROM tmdb_movie_crew)
+              GROUP BY person_id
+            ) c ON c.person_id = p.id
+            WHERE p.name IS NOT NULL AND p.name <> ''""").fetchall()
+        con.execute("COMMIT")
+    finally:
+        con.close()
+    return PeopleIndex(signature, [tuple(r) for r in rows])
+
+_index: Optional[PeopleIndex] = None
+_aliases: Dict[str, int] = {}   # свёрнутый запрос -> id из TMDB (промахи индекса до следующей перезагрузки)
+_reload_lock = threading.Lock()
+
+def lookup(name: str, fuzzy: bool = False) -> Optional[int]:
+    pid = _aliases.get(" ".join(fold_tokens(name)))
+    if pid is not None:
+        return pid
+    index = _index
+    return index.lookup(name, fuzzy) if index is not None else None
+
+def remember(query: str, person_id: int, name: Optional[str]) -> None:
+    # ответ TMDB на промах: запоминаем запрос и дописываем человека в tmdb_people
+    key = " ".join(fold_tokens(query))
+    if key:
+        _aliases[key] = person_id
+    if name:
+        with write_conn() as c:
+            c.execute("INSERT OR IGNORE INTO tmdb_people(id, name) VALUES(?,?)", (person_id, name))
+
+def reload(force: bool = False) -> None:
+    global _index
+    with _reload_lock:
+        with read_conn() as con:
+            signature = people_signature(con)
+        if not force and _index is not None and _index.signature == signature:
+            return
+        t0 = time.perf_counter()
+        index = load_index()
+        _index = index
+        _aliases.clear()
+        log.info("people index: %s people, %s tokens, loaded in %.2fs",
+                 index.n, len(index.vocab), time.perf_counter() - t0)
+
+def _watch() -> None:
+    while True:
+        try:
+            reload()
+        except Exception:
+            log.exception("people index reload failed")
+        time.sleep(PEOPLE_INDEX_CHECK_S)
+
+def start() -> None:
+    # до первой загрузки имена по-прежнему ищутся в TMDB
+    if PEOPLE_INDEX:
+        threading.Thread(target=_watch, name="people-index", daemon=True).start()
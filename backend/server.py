@@ -1,74 +1,64 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import os, sqlite3, json, time
-import requests
+import os, json, time, base64, asyncio
 from dotenv import load_dotenv
-from typing import List, Optional, Dict, Any, Literal
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Dict, Any, Tuple
+import lobby
 from lobby import router as lobby_router
-from common import JOIN_BASE_URL
+from cache import TTLCache
+from common import JOIN_BASE_URL, catalog_generation, current_catalog_generation, read_conn, write_conn, close_pools
+import catalog_engine
+import catalog_export
+from catalog import (CatalogFilters, CatalogResponse, CATALOG_COLUMNS, catalog_items_json, catalog_response_json,
+                     catalog_where, order_keys, order_sql)
+import metrics
+import people_index
+from tmdb import tmdb_get, close_client as close_tmdb_client
+from tmdb_cache import cache as tmdb_cache
 
 load_dotenv()
-TMDB_BEARER = os.getenv('TMDB_BEARER')
-TMDB_API_KEY = os.getenv('TMDB_API_KEY')
 PORT = int(os.getenv('PORT', '8000'))
 CORS_ORIGINS = [o.strip() for o in os.getenv('CORS_ORIGINS', '*').split(',') if o]
-DB_PATH = "/home/skillseek/app/backend/imdb.db" 
-TMDB_API = 'https://api.themoviedb.org/3'
+CATALOG_TOTAL_TTL = float(os.getenv('CATALOG_TOTAL_TTL', '300'))
+CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', '2048'))
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', '600'))
 
 app = FastAPI(title='Movie Night API — Enriched TMDB + IMDb')
 app.add_middleware(CORSMiddleware, allow_origins=CORS_ORIGINS or ['*'], allow_methods=['*'], allow_headers=['*'])
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(lobby_router)
+app.include_router(catalog_export.router)
 
-# --- SQLite helpers
-
-def conn() -> sqlite3.Connection:
-    c = sqlite3.connect(DB_PATH)
-    c.row_factory = sqlite3.Row
-    return c
+# --- SQLite helpers (соединения — из общего пула common.read_conn/write_conn)
 
 def ensure_schema():
-    c = conn(); cur = c.cursor()
-    cur.execute('''CREATE TABLE IF NOT EXISTS title_ratings (
-        tconst TEXT PRIMARY KEY,
-        averageRating REAL,
-        numVotes INTEGER
-    )''')
-    cur.execute('''CREATE TABLE IF NOT EXISTS movies_enriched (
-        tmdb_id INTEGER PRIMARY KEY,
-        imdb_id TEXT,
-        title TEXT,
-        release_date TEXT,
-        genre_ids TEXT,    -- JSON array of ints
-        tmdb_vote REAL,
-        imdb_rating REAL,
-        imdb_votes INTEGER,
-        poster_path TEXT,
-        overview TEXT,
-        updated_at INTEGER
-    )''')
-    cur.execute('CREATE INDEX IF NOT EXISTS idx_movies_imdb_id ON movies_enriched(imdb_id)')
-    c.commit(); c.close()
+    with write_conn() as c:
+        cur = c.cursor()
+        cur.execute('''CREATE TABLE IF NOT EXISTS title_ratings (
+            tconst TEXT PRIMARY KEY,
+            averageRating REAL,
+            numVotes INTEGER
+        )''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS movies_enriched (
+            tmdb_id INTEGER PRIMARY KEY,
+            imdb_id TEXT,
+            title TEXT,
+            release_date TEXT,
+            genre_ids TEXT,    -- JSON array of ints
+            tmdb_vote REAL,
+            imdb_rating REAL,
+            imdb_votes INTEGER,
+            poster_path TEXT,
+            overview TEXT,
+            updated_at INTEGER
+        )''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_movies_imdb_id ON movies_enriched(imdb_id)')
 
 ensure_schema()
 
-# --- TMDB client
-
-def tmdb_headers() -> Dict[str, str]:
-    if TMDB_BEARER:
-        return {'Authorization': f'Bearer {TMDB_BEARER}', 'Accept': 'application/json'}
-    return {}
-
-def tmdb_get(path: str, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
-    params = params or {}
-    if TMDB_API_KEY and 'api_key' not in params and not TMDB_BEARER:
-        params['api_key'] = TMDB_API_KEY
-    r = requests.get(TMDB_API + path, params=params, headers=tmdb_headers(), timeout=20)
-    if r.status_code != 200:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
-    return r.json()
-
 # --- Models
 class DiscoverFilters(BaseModel):
     year_from: Optional[int] = None
@@ -90,199 +80,298 @@ class MovieOut(BaseModel):
     imdb_votes: Optional[int] = None
     imdb_id: Optional[str] = None
 
-class CatalogFilters(BaseModel):
-    title: Optional[str] = None
-    year_from: Optional[int] = None
-    year_to: Optional[int] = None
-    tmdb_min: Optional[float] = None
-    imdb_min: Optional[float] = None
-    genres: Optional[List[str]] = None
-    genres_mode: Literal["any","all"] = "any"
-    director: Optional[str] = None
-    actor: Optional[str] = None
-    type: Optional[Literal["movie","tv"]] = None   # <--- новое
-    sort_by: Literal["imdb","tmdb","year","title"] = "imdb"
-    order: Literal["desc","asc"] = "desc"
-    page: int = 1
-    page_size: int = 20
-
-class CatalogItem(BaseModel):
-    tmdb_id: int
-    imdb_id: Optional[str]
-    title: str
-    year: Optional[int]
-    tmdb_rating: Optional[float]
-    imdb_rating: Optional[float]
-    genres: Optional[str]
-    director: Optional[str]
-    actors: Optional[str]
-    poster_url: Optional[str]
-    type: Literal["movie","tv"]                 # <--- новое
-    duration_text: Optional[str]                # <--- новое
-    episodes: Optional[int] 
-
-class CatalogResponse(BaseModel):
-    total: int
-    page: int
-    page_size: int
-    results: List[CatalogItem]
-
 # --- Utils
 
 def now_ms() -> int:
     return int(time.time()*1000)
 
-# IMDb lookup
-def imdb_lookup(imdb_id: str | None) -> Dict[str, Any] | None:
-    if not imdb_id:
-        return None
-    c = conn(); cur = c.cursor()
-    cur.execute('SELECT averageRating, numVotes FROM title_ratings WHERE tconst=?', (imdb_id,))
-    row = cur.fetchone(); c.close()
-    if row:
-        return {'imdb_rating': row['averageRating'], 'imdb_votes': row['numVotes']}
-    return None
-
-# Persist/Cache enriched movie row
-
-def upsert_movie_enriched(m: Dict[str, Any], imdb_id: str | None, imdb: Dict[str, Any] | None):
-    c = conn(); cur = c.cursor()
-    cur.execute('''INSERT INTO movies_enriched(
-        tmdb_id, imdb_id, title, release_date, genre_ids, tmdb_vote,
-        imdb_rating, imdb_votes, poster_path, overview, updated_at
-    ) VALUES(?,?,?,?,?,?,?,?,?,?,?)
-    ON CONFLICT(tmdb_id) DO UPDATE SET
-        imdb_id=excluded.imdb_id,
-        title=excluded.title,
-        release_date=excluded.release_date,
-        genre_ids=excluded.genre_ids,
-        tmdb_vote=excluded.tmdb_vote,
-        imdb_rating=excluded.imdb_rating,
-        imdb_votes=excluded.imdb_votes,
-        poster_path=excluded.poster_path,
-        overview=excluded.overview,
-        updated_at=excluded.updated_at''', (
-        m['id'], imdb_id, m.get('title') or m.get('original_title') or '',
-        m.get('release_date'), json.dumps(m.get('genre_ids') or []),
-        m.get('vote_average'),
-        (imdb or {}).get('imdb_rating'), (imdb or {}).get('imdb_votes'),
-        m.get('poster_path'), m.get('overview'), now_ms()
-    ))
-    c.commit(); c.close()
-
-# Try cache first
-
-def get_cached_enriched(tmdb_id: int) -> Dict[str, Any] | None:
-    c = conn(); cur = c.cursor()
-    cur.execute('SELECT * FROM movies_enriched WHERE tmdb_id=?', (tmdb_id,))
-    row = cur.fetchone(); c.close()
-    if not row:
-        return None
-    return dict(row)
+# IMDb lookup: один запрос на всю страницу
+def imdb_lookup_many(imdb_ids: List[str | None]) -> Dict[str, Dict[str, Any]]:
+    ids = sorted({i for i in imdb_ids if i})
+    if not ids:
+        return {}
+    with read_conn() as c:
+        rows = c.execute(f'SELECT tconst, averageRating, numVotes FROM title_ratings '
+                         f'WHERE tconst IN ({",".join("?" * len(ids))})', ids).fetchall()
+    return {r['tconst']: {'imdb_rating': r['averageRating'], 'imdb_votes': r['numVotes']} for r in rows}
+
+# Persist/Cache enriched movie rows: один executemany в одной транзакции
+
+def upsert_movies_enriched(items: List[tuple]):
+    # items: (m, imdb_id, imdb)
+    if not items:
+        return
+    ts = now_ms()
+    with write_conn() as c:
+        c.executemany('''INSERT INTO movies_enriched(
+            tmdb_id, imdb_id, title, release_date, genre_ids, tmdb_vote,
+            imdb_rating, imdb_votes, poster_path, overview, updated_at
+        ) VALUES(?,?,?,?,?,?,?,?,?,?,?)
+        ON CONFLICT(tmdb_id) DO UPDATE SET
+            imdb_id=excluded.imdb_id,
+            title=excluded.title,
+            release_date=excluded.release_date,
+            genre_ids=excluded.genre_ids,
+            tmdb_vote=excluded.tmdb_vote,
+            imdb_rating=excluded.imdb_rating,
+            imdb_votes=excluded.imdb_votes,
+            poster_path=excluded.poster_path,
+            overview=excluded.overview,
+            updated_at=excluded.updated_at''', [(
+            m['id'], imdb_id, m.get('title') or m.get('original_title') or '',
+            m.get('release_date'), json.dumps(m.get('genre_ids') or []),
+            m.get('vote_average'),
+            (imdb or {}).get('imdb_rating'), (imdb or {}).get('imdb_votes'),
+            m.get('poster_path'), m.get('overview'), ts
+        ) for m, imdb_id, imdb in items])
+
+# Try cache first: один IN-запрос на страницу
+
+def get_cached_enriched_many(tmdb_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    ids = sorted(set(tmdb_ids))
+    if not ids:
+        return {}
+    with read_conn() as c:
+        rows = c.execute(f'SELECT * FROM movies_enriched WHERE tmdb_id IN ({",".join("?" * len(ids))})',
+                         ids).fetchall()
+    return {r['tmdb_id']: dict(r) for r in rows}
+
+# --- Catalog pagination
+
+# total по одному и тому же фильтру (where + params) не пересчитываем на каждой странице
+catalog_totals = TTLCache(maxsize=2048, ttl=CATALOG_TOTAL_TTL, name='catalog_totals')
+
+# готовые ответы /catalog/search: ключ — (generation, нормализованные фильтры), значение — JSON bytes
+catalog_cache = TTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL, name='catalog')
+
+def catalog_cache_key(filters: CatalogFilters) -> str:
+    d = filters.model_dump()
+    d["genres"] = sorted({g.strip().lower() for g in (filters.genres or []) if g.strip()}) or None
+    for k in ("title", "director", "actor"):
+        d[k] = d[k].strip().lower() if d[k] else None
+    d["order"] = filters.order.lower()
+    d["page"] = max(1, filters.page)
+    d["page_size"] = min(100, max(1, filters.page_size))
+    return json.dumps(d, sort_keys=True, separators=(",", ":"))
+
+def encode_cursor(sort_by: str, order: str, values: List[Any]) -> str:
+    raw = json.dumps([sort_by, order, *values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort_by: str, order: str, n_keys: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(data, list) or len(data) != 2 + n_keys or data[:2] != [sort_by, order]:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort_by/order")
+    if any(isinstance(v, (list, dict)) for v in data[2:]):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return data[2:]
+
+def keyset_after(keys: List[Tuple[str, bool]], values: List[Any]) -> Tuple[str, List[Any]]:
+    # условие "строго после строки values" для ORDER BY keys [(колонка, desc)];
+    # в SQLite NULL меньше любого значения: в ASC он первый, в DESC последний
+    ors: List[str] = []
+    params: List[Any] = []
+    eqs: List[str] = []
+    eq_params: List[Any] = []
+    for (col, desc), v in zip(keys, values):
+        if v is None:
+            gt, gt_params, eq, v_params = (None if desc else f"{col} IS NOT NULL"), [], f"{col} IS NULL", []
+        else:
+            gt = f"({col} < ? OR {col} IS NULL)" if desc else f"{col} > ?"
+            gt_params, eq, v_params = [v], f"{col} = ?", [v]
+        if gt:
+            ors.append("(" + " AND ".join(eqs + [gt]) + ")")
+            params.extend(eq_params + gt_params)
+        eqs.append(eq)
+        eq_params.extend(v_params)
+    return ("(" + " OR ".join(ors) + ")" if ors else "0"), params
+
+def catalog_response(filters: CatalogFilters, keys: List[Tuple[str, bool]], page: int, page_size: int,
+                     total: Optional[int], results: bytes, count: int, last: Any) -> bytes:
+    # results — готовый JSON-массив элементов, last — последняя строка страницы (для курсора)
+    next_cursor = None
+    if count == page_size:
+        next_cursor = encode_cursor(filters.sort_by, filters.order, [last[col] for col, _ in keys])
+    return catalog_response_json(total, page, page_size, results, next_cursor)
 
 # --- Routes
 @app.post("/catalog/search", response_model=CatalogResponse)
 def catalog_search(filters: CatalogFilters):
-    where = ["1=1"]
-    params: List[object] = []
-
-    if filters.title:
-        where.append("title LIKE ?")
-        params.append(f"%{filters.title}%")
-
-    if filters.year_from is not None:
-        where.append("year >= ?")
-        params.append(filters.year_from)
-
-    if filters.year_to is not None:
-        where.append("year <= ?")
-        params.append(filters.year_to)
-
-    if filters.tmdb_min is not None:
-        where.append("tmdb_rating >= ?")
-        params.append(filters.tmdb_min)
-
-    if filters.imdb_min is not None:
-        where.append("imdb_rating >= ?")
-        params.append(filters.imdb_min)
-
-    if filters.director:
-        where.append("director LIKE ?")
-        params.append(f"%{filters.director}%")
-
-    if filters.actor:
-        where.append("actors LIKE ?")
-        params.append(f"%{filters.actor}%")
-
-    # жанры лежат строкой "Action, Comedy, ..."
-    if filters.genres:
-        if filters.genres_mode == "all":
-            # все жанры должны встречаться
-            for g in filters.genres:
-                where.append("genres LIKE ?")
-                params.append(f"%{g}%")
-        else:
-            # хотя бы один из жанров
-            ors = []
-            for g in filters.genres:
-                ors.append("genres LIKE ?")
-                params.append(f"%{g}%")
-            where.append("(" + " OR ".join(ors) + ")")
-
-    where_sql = " AND ".join(where)
-
-    sort_map = {
-        "imdb": "imdb_rating",
-        "tmdb": "tmdb_rating",
-        "year": "year",
-        "title": "title"
-    }
-    order_by = sort_map[filters.sort_by]
-    order_dir = "DESC" if filters.order.lower() == "desc" else "ASC"
+    # одинаковые фильтры от разных пользователей -> готовый JSON из кэша;
+    # пересборка каталога увеличивает generation, и старые ключи просто перестают совпадать.
+    # Кладём под generation тех данных, из которых собран ответ: снапшот движка может отставать
+    # от catalog_meta на CATALOG_ENGINE_CHECK_S, и его ответ не должен попасть под ключ новой сборки
+    fkey = catalog_cache_key(filters)
+    body = catalog_cache.get((current_catalog_generation(), fkey))
+    if body is None:
+        generation, body = search_catalog(filters)
+        catalog_cache.set((generation, fkey), body)
+    return Response(content=body, media_type="application/json")
+
+def search_catalog(filters: CatalogFilters) -> Tuple[int, bytes]:
+    # (generation, JSON CatalogResponse): generation — сборка, из которой прочитаны строки;
+    # response_model у роута остаётся только для OpenAPI
+    where_sql, params = catalog_where(filters)
+    keys = order_keys(filters)
 
     # пагинация
     page = max(1, filters.page)
     page_size = min(100, max(1, filters.page_size))
     offset = (page - 1) * page_size
 
-    # считаем total
-    count_sql = f"SELECT COUNT(*) AS cnt FROM unified_catalog WHERE {where_sql}"
-    con = conn()
-    try:
-        total = con.execute(count_sql, params).fetchone()["cnt"]
+    after = decode_cursor(filters.cursor, filters.sort_by, filters.order, len(keys)) if filters.cursor else None
+
+    # in-memory движок (CATALOG_ENGINE=memory), если снапшот загружен и запрос ему по силам
+    snap = catalog_engine.snapshot()
+    if snap is not None and (after is None or isinstance(after[-1], int)):
+        res = snap.search(filters, page, page_size, after_id=after[-1] if after else None)
+        if res is not None:
+            total, items = res
+            body = catalog_response(filters, keys, page, page_size, total if filters.with_total else None,
+                                    b"[" + b",".join(items) + b"]", len(items),
+                                    json.loads(items[-1]) if items else None)
+            return snap.generation, body
+
+    page_where, page_params = where_sql, list(params)
+    if after is not None:
+        after_sql, after_params = keyset_after(keys, after)
+        page_where = f"({where_sql}) AND {after_sql}"
+        page_params.extend(after_params)
+        offset = 0
+
+    with read_conn() as con:
+        # одна читающая транзакция: generation, total и страница из одной сборки каталога
+        con.execute("BEGIN")
+        generation = catalog_generation(con)
+        # считаем total (кэшируется по фильтру в пределах одной сборки каталога)
+        total = None
+        if filters.with_total:
+            total_key = (generation, where_sql, tuple(params))
+            total = catalog_totals.get(total_key)
+            if total is None:
+                count_sql = f"SELECT COUNT(*) AS cnt FROM unified_catalog WHERE {where_sql}"
+                total = con.execute(count_sql, params).fetchone()["cnt"]
+                catalog_totals.set(total_key, total)
 
         # основная выборка
         select_sql = f"""
-        SELECT tmdb_id, imdb_id, title, year, tmdb_rating, imdb_rating, genres, director, actors, poster_url
+        SELECT {CATALOG_COLUMNS}
         FROM unified_catalog
-        WHERE {where_sql}
-        ORDER BY {order_by} {order_dir}, title ASC
+        WHERE {page_where}
+        ORDER BY {order_sql(keys)}
         LIMIT ? OFFSET ?
         """
-        rows = con.execute(select_sql, (*params, page_size, offset)).fetchall()
-
-        results = [CatalogItem(**dict(r)) for r in rows]
-        return CatalogResponse(total=total, page=page, page_size=page_size, results=results)
-    finally:
-        con.close()
+        rows = con.execute(select_sql, (*page_params, page_size, offset)).fetchall()
+    body = catalog_response(filters, keys, page, page_size, total, catalog_items_json(rows), len(rows),
+                            rows[-1] if rows else None)
+    return generation, body
+
+@app.on_event('startup')
+def start_background_indexes():
+    metrics.cleanup_dead_workers()
+    catalog_engine.start()
+    people_index.start()
+
+@app.on_event('shutdown')
+async def close_resources():
+    await close_tmdb_client()
+    await run_in_threadpool(lobby.swipe_writer.close)
+    close_pools()
+    catalog_export.close()
+    metrics.worker_exit()
 
 @app.get('/health')
 def health():
     return {'ok': True}
 
+@app.get('/metrics', include_in_schema=False)
+def metrics_endpoint():
+    # Prometheus text format; при PROMETHEUS_MULTIPROC_DIR — сумма по всем воркерам
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get('/stats')
+def stats():
+    return {
+        'catalog_cache': catalog_cache.stats(),
+        'catalog_totals': catalog_totals.stats(),
+        'tmdb_cache': tmdb_cache.stats(),
+        'swipe_writer': lobby.swipe_writer.stats(),
+    }
+
 @app.get('/genres')
-def genres():
-    j = tmdb_get('/genre/movie/list', params={'language':'en-US'})
+async def genres():
+    j = await tmdb_get('/genre/movie/list', params={'language':'en-US'})
     return j.get('genres', [])
 
+async def resolve_person(name: str) -> int | None:
+    # сначала локальный индекс tmdb_people (точно/префикс в event loop, нечётко — в threadpool), потом TMDB
+    pid = people_index.lookup(name)
+    if pid is None:
+        pid = await run_in_threadpool(people_index.lookup, name, True)
+    if pid is not None:
+        return pid
+    j = await tmdb_get('/search/person', params={'query': name, 'include_adult': False, 'page': 1})
+    if j.get('results'):
+        p = j['results'][0]
+        await run_in_threadpool(people_index.remember, name, p['id'], p.get('name'))
+        return p['id']
+    return None
+
+def enrich_movies(movies: List[Dict[str, Any]], cached: Dict[int, Dict[str, Any]],
+                  imdb_ids: Dict[int, str | None]) -> List[Dict[str, Any]]:
+    # синхронная часть /discover (SQLite), вызывается из threadpool:
+    # один запрос к title_ratings и одна пишущая транзакция на страницу
+    ratings = imdb_lookup_many(list(imdb_ids.values()))
+    fresh: List[tuple] = []
+    out: List[Dict[str, Any]] = []
+    for m in movies:
+        c = cached.get(m['id'])
+        if c and c.get('imdb_id'):
+            out.append(MovieOut(
+                id=m['id'],
+                title=c['title'] or (m.get('title') or ''),
+                overview=c.get('overview') or m.get('overview'),
+                poster_path=c.get('poster_path') or m.get('poster_path'),
+                release_date=c.get('release_date') or m.get('release_date'),
+                genres=json.loads(c.get('genre_ids') or '[]'),
+                tmdb_vote=c.get('tmdb_vote') or m.get('vote_average'),
+                imdb_rating=c.get('imdb_rating'),
+                imdb_votes=c.get('imdb_votes'),
+                imdb_id=c.get('imdb_id')
+            ).model_dump())
+            continue
+
+        imdb_id = imdb_ids.get(m['id'])
+        imdb = ratings.get(imdb_id) if imdb_id else None
+        fresh.append((m, imdb_id, imdb))
+
+        out.append(MovieOut(
+            id=m['id'],
+            title=m.get('title') or m.get('original_title') or '',
+            overview=m.get('overview'),
+            poster_path=m.get('poster_path'),
+            release_date=m.get('release_date'),
+            genres=m.get('genre_ids'),
+            tmdb_vote=m.get('vote_average'),
+            imdb_rating=(imdb or {}).get('imdb_rating'),
+            imdb_votes=(imdb or {}).get('imdb_votes'),
+            imdb_id=imdb_id
+        ).model_dump())
+
+    # persist enriched rows for future cache
+    upsert_movies_enriched(fresh)
+    return out
+
 @app.post('/discover', response_model=Dict[str, Any])
-def discover(filters: DiscoverFilters):
-    # resolve people -> person ids
-    person_ids: List[int] = []
-    for name in (filters.people or []):
-        j = tmdb_get('/search/person', params={'query': name, 'include_adult': False, 'page': 1})
-        if j.get('results'):
-            person_ids.append(j['results'][0]['id'])
+async def discover(filters: DiscoverFilters):
+    # resolve people -> person ids (все имена одновременно)
+    resolved = await asyncio.gather(*(resolve_person(name) for name in (filters.people or [])))
+    person_ids = [pid for pid in resolved if pid is not None]
 
     params: Dict[str, Any] = {
         'page': max(1, filters.page),
@@ -300,48 +389,18 @@ def discover(filters: DiscoverFilters):
     if person_ids:
         params['with_people'] = ','.join(map(str, person_ids))
 
-    data = tmdb_get('/discover/movie', params=params)
-
-    out: List[MovieOut] = []
-    for m in data.get('results', []):
-        # check cache first
-        cached = get_cached_enriched(m['id'])
-        if cached and cached.get('imdb_id'):
-            out.append(MovieOut(
-                id=m['id'],
-                title=cached['title'] or (m.get('title') or ''),
-                overview=cached.get('overview') or m.get('overview'),
-                poster_path=cached.get('poster_path') or m.get('poster_path'),
-                release_date=cached.get('release_date') or m.get('release_date'),
-                genres=json.loads(cached.get('genre_ids') or '[]'),
-                tmdb_vote=cached.get('tmdb_vote') or m.get('vote_average'),
-                imdb_rating=cached.get('imdb_rating'),
-                imdb_votes=cached.get('imdb_votes'),
-                imdb_id=cached.get('imdb_id')
-            ).model_dump())
-            continue
-            
-        # fetch external_ids -> imdb_id
-        ext = tmdb_get(f"/movie/{m['id']}/external_ids")
-        imdb_id = ext.get('imdb_id')
-        imdb = imdb_lookup(imdb_id)
+    data = await tmdb_get('/discover/movie', params=params)
+    movies = data.get('results', [])
 
-        # persist enriched row for future cache & return
-        upsert_movie_enriched(m, imdb_id, imdb)
+    # check cache first
+    cached = await run_in_threadpool(get_cached_enriched_many, [m['id'] for m in movies])
+    missing = [m for m in movies if not (cached.get(m['id']) or {}).get('imdb_id')]
 
-        out.append(MovieOut(
-            id=m['id'],
-            title=m.get('title') or m.get('original_title') or '',
-            overview=m.get('overview'),
-            poster_path=m.get('poster_path'),
-            release_date=m.get('release_date'),
-            genres=m.get('genre_ids'),
-            tmdb_vote=m.get('vote_average'),
-            imdb_rating=(imdb or {}).get('imdb_rating'),
-            imdb_votes=(imdb or {}).get('imdb_votes'),
-            imdb_id=imdb_id
-        ).model_dump())
+    # fetch external_ids -> imdb_id, для всей страницы параллельно (не больше TMDB_MAX_CONCURRENCY)
+    exts = await asyncio.gather(*(tmdb_get(f"/movie/{m['id']}/external_ids") for m in missing))
+    imdb_ids = {m['id']: ext.get('imdb_id') for m, ext in zip(missing, exts)}
 
+    out = await run_in_threadpool(enrich_movies, movies, cached, imdb_ids)
     return {
         'page': data.get('page', 1),
         'total_pages': data.get('total_pages', 1),
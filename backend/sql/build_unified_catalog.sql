@@ -1,47 +1,82 @@
-DROP TABLE IF EXISTS unified_catalog;
+-- Полная пересборка unified_catalog (+ catalog_genres, unified_catalog_fts).
+-- Строим теневые *_new и подменяем их одной короткой транзакцией: читатели видят либо старый каталог,
+-- либо новый, но никогда не пустой/недостроенный. Инкрементально по catalog_dirty — build_catalog.py.
+
+BEGIN IMMEDIATE;
+
+-- поколение каталога: воркеры по нему сбрасывают кэши и перечитывают in-memory движок
+CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+
+-- tmdb_id, которые лоадеры поменяли с прошлой сборки (заполняется триггерами ниже)
+CREATE TABLE IF NOT EXISTS catalog_dirty (tmdb_id INTEGER PRIMARY KEY);
+
+CREATE TRIGGER IF NOT EXISTS trg_cd_movies_ins AFTER INSERT ON tmdb_movies BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) VALUES (NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cd_movies_upd AFTER UPDATE ON tmdb_movies BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) VALUES (NEW.id), (OLD.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cd_movies_del AFTER DELETE ON tmdb_movies BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) VALUES (OLD.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cd_genres_ins AFTER INSERT ON tmdb_movie_genres BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) VALUES (NEW.movie_id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cd_genres_del AFTER DELETE ON tmdb_movie_genres BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) VALUES (OLD.movie_id);
+END;
 
-CREATE TABLE unified_catalog AS
-WITH
-  genres_limited AS (
-    SELECT
-      mg.movie_id AS tmdb_id,
-      g.name      AS genre_name,
-      ROW_NUMBER() OVER (PARTITION BY mg.movie_id ORDER BY g.name) AS rn
-    FROM tmdb_movie_genres mg
-    JOIN tmdb_genres g ON g.id = mg.genre_id
-  ),
-  genres_agg AS (
-    SELECT tmdb_id, GROUP_CONCAT(genre_name, ', ') AS genres
-    FROM genres_limited
-    WHERE rn <= 5
-    GROUP BY tmdb_id
-  ),
-  directors AS (
-    SELECT
-      mc.movie_id AS tmdb_id,
-      GROUP_CONCAT(p.name, ', ') AS director
-    FROM tmdb_movie_crew mc
-    JOIN tmdb_people p ON p.id = mc.person_id
-    WHERE mc.job = 'Director'
-    GROUP BY mc.movie_id
-  ),
-  actors_limited AS (
-    SELECT
-      mc.movie_id AS tmdb_id,
-      p.name,
-      ROW_NUMBER() OVER (
-        PARTITION BY mc.movie_id
-        ORDER BY COALESCE(mc.cast_order, 999999)
-      ) AS rn
-    FROM tmdb_movie_cast mc
-    JOIN tmdb_people p ON p.id = mc.person_id
-  ),
-  actors_agg AS (
-    SELECT tmdb_id, GROUP_CONCAT(name, ', ') AS actors
-    FROM actors_limited
-    WHERE rn <= 5
-    GROUP BY tmdb_id
-  )
+CREATE TRIGGER IF NOT EXISTS trg_cd_cast_ins AFTER INSERT ON tmdb_movie_cast BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) VALUES (NEW.movie_id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cd_cast_del AFTER DELETE ON tmdb_movie_cast BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) VALUES (OLD.movie_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cd_crew_ins AFTER INSERT ON tmdb_movie_crew BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) VALUES (NEW.movie_id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cd_crew_del AFTER DELETE ON tmdb_movie_crew BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) VALUES (OLD.movie_id);
+END;
+
+-- имена денормализованы в director/actors/genres и FTS: переименование метит все тайтлы с этим человеком/жанром.
+-- Имена пишутся UPSERT'ом (tools/tmdb_fetcher.py), а его конфликт-политика перекрывает OR IGNORE внутри
+-- триггера — поэтому ON CONFLICT DO NOTHING
+CREATE TRIGGER IF NOT EXISTS trg_cd_people_upd AFTER UPDATE OF name ON tmdb_people
+WHEN OLD.name IS NOT NEW.name BEGIN
+  INSERT INTO catalog_dirty(tmdb_id) SELECT movie_id FROM tmdb_movie_cast WHERE person_id = NEW.id
+    ON CONFLICT DO NOTHING;
+  INSERT INTO catalog_dirty(tmdb_id)
+    SELECT movie_id FROM tmdb_movie_crew WHERE person_id = NEW.id AND job = 'Director'
+    ON CONFLICT DO NOTHING;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cd_genre_names_upd AFTER UPDATE OF name ON tmdb_genres
+WHEN OLD.name IS NOT NEW.name BEGIN
+  INSERT INTO catalog_dirty(tmdb_id) SELECT movie_id FROM tmdb_movie_genres WHERE genre_id = NEW.id
+    ON CONFLICT DO NOTHING;
+END;
+-- чтобы переименование не сканировало каст/команду целиком
+CREATE INDEX IF NOT EXISTS idx_tmdb_movie_cast_pid ON tmdb_movie_cast(person_id);
+CREATE INDEX IF NOT EXISTS idx_tmdb_movie_crew_pid ON tmdb_movie_crew(person_id);
+
+-- в каталоге используется только averageRating
+CREATE TRIGGER IF NOT EXISTS trg_cd_ratings_ins AFTER INSERT ON imdb_ratings BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) SELECT id FROM tmdb_movies WHERE imdb_id = NEW.tconst;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cd_ratings_upd AFTER UPDATE ON imdb_ratings
+WHEN OLD.averageRating IS NOT NEW.averageRating BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) SELECT id FROM tmdb_movies WHERE imdb_id = NEW.tconst;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cd_ratings_del AFTER DELETE ON imdb_ratings BEGIN
+  INSERT OR IGNORE INTO catalog_dirty(tmdb_id) SELECT id FROM tmdb_movies WHERE imdb_id = OLD.tconst;
+END;
+
+-- строка каталога на тайтл; подзапросы коррелированы по m.id, поэтому
+-- "... FROM unified_catalog_src WHERE tmdb_id IN (...)" считает только нужные тайтлы
+DROP VIEW IF EXISTS unified_catalog_src;
+CREATE VIEW unified_catalog_src AS
 SELECT
   m.id                       AS tmdb_id,
   m.imdb_id,
@@ -52,9 +87,22 @@ SELECT
   END                        AS year,
   ROUND(m.vote_average, 1)   AS tmdb_rating,
   ROUND(ir.averageRating, 1) AS imdb_rating,
-  g.genres,
-  d.director,
-  a.actors,
+  -- до 5 жанров по алфавиту
+  (SELECT GROUP_CONCAT(name, ', ') FROM (
+     SELECT g.name FROM tmdb_movie_genres mg
+     JOIN tmdb_genres g ON g.id = mg.genre_id
+     WHERE mg.movie_id = m.id
+     ORDER BY g.name LIMIT 5))  AS genres,
+  (SELECT GROUP_CONCAT(p.name, ', ')
+     FROM tmdb_movie_crew mc
+     JOIN tmdb_people p ON p.id = mc.person_id
+     WHERE mc.movie_id = m.id AND mc.job = 'Director') AS director,
+  -- первые 5 актёров по cast_order
+  (SELECT GROUP_CONCAT(name, ', ') FROM (
+     SELECT p.name FROM tmdb_movie_cast mc
+     JOIN tmdb_people p ON p.id = mc.person_id
+     WHERE mc.movie_id = m.id
+     ORDER BY COALESCE(mc.cast_order, 999999) LIMIT 5)) AS actors,
   CASE
     WHEN m.poster_path IS NOT NULL AND m.poster_path <> ''
     THEN 'https://image.tmdb.org/t/p/w500' || m.poster_path
@@ -71,13 +119,63 @@ SELECT
     WHEN COALESCE(m.media_type,'movie')='tv' THEN m.episodes_count
   END AS episodes
 FROM tmdb_movies m
-LEFT JOIN imdb_ratings ir ON ir.tconst = m.imdb_id
-LEFT JOIN genres_agg g    ON g.tmdb_id = m.id
-LEFT JOIN directors d     ON d.tmdb_id = m.id
-LEFT JOIN actors_agg a    ON a.tmdb_id = m.id;
+LEFT JOIN imdb_ratings ir ON ir.tconst = m.imdb_id;
+
+DROP TABLE IF EXISTS unified_catalog_new;
+DROP TABLE IF EXISTS catalog_genres_new;
+DROP TABLE IF EXISTS unified_catalog_fts_new;
+
+CREATE TABLE unified_catalog_new AS SELECT * FROM unified_catalog_src;
+
+-- нормализованные жанры: фильтр по жанрам идёт по индексу, а не LIKE по строке genres
+CREATE TABLE catalog_genres_new (
+  genre_id INTEGER NOT NULL,
+  tmdb_id  INTEGER NOT NULL,
+  PRIMARY KEY (genre_id, tmdb_id)
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO catalog_genres_new(genre_id, tmdb_id)
+SELECT mg.genre_id, mg.movie_id
+FROM tmdb_movie_genres mg
+JOIN tmdb_movies m ON m.id = mg.movie_id;
+
+-- полнотекстовый индекс для title/director/actors (typeahead в /catalog/search):
+-- contentless, rowid = tmdb_id; unicode61 + remove_diacritics -> регистр и диакритика не важны
+CREATE VIRTUAL TABLE unified_catalog_fts_new USING fts5(
+  title, director, actors,
+  content='',
+  prefix='2 3',
+  tokenize='unicode61 remove_diacritics 2'
+);
+
+INSERT INTO unified_catalog_fts_new(rowid, title, director, actors)
+SELECT tmdb_id, title, director, actors FROM unified_catalog_new;
+
+-- всё, что было помечено до этой транзакции, уже в *_new
+DELETE FROM catalog_dirty;
+
+COMMIT;
+
+-- подмена одной транзакцией
+BEGIN IMMEDIATE;
+
+DROP TABLE IF EXISTS unified_catalog_fts;
+DROP TABLE IF EXISTS catalog_genres;
+DROP TABLE IF EXISTS unified_catalog;
+
+ALTER TABLE unified_catalog_new     RENAME TO unified_catalog;
+ALTER TABLE catalog_genres_new      RENAME TO catalog_genres;
+ALTER TABLE unified_catalog_fts_new RENAME TO unified_catalog_fts;
 
 CREATE INDEX IF NOT EXISTS idx_uc_year    ON unified_catalog(year);
 CREATE INDEX IF NOT EXISTS idx_uc_title   ON unified_catalog(title);
 CREATE INDEX IF NOT EXISTS idx_uc_rt      ON unified_catalog(tmdb_rating);
 CREATE INDEX IF NOT EXISTS idx_uc_imdb    ON unified_catalog(imdb_rating);
 CREATE INDEX IF NOT EXISTS idx_uc_type    ON unified_catalog(type);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_uc_tmdb_id ON unified_catalog(tmdb_id);
+CREATE INDEX IF NOT EXISTS idx_cg_tmdb    ON catalog_genres(tmdb_id);
+
+INSERT INTO catalog_meta(key, value) VALUES('generation', 1)
+  ON CONFLICT(key) DO UPDATE SET value = value + 1;
+
+COMMIT;
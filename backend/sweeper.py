@@ -0,0 +1,196 @@
+# /home/skillseek/app/backend/sweeper.py
+# Обслуживание лобби (pm2 cron, см. ecosystem.config.js):
+#   - лобби без активности дольше LOBBY_TTL_HOURS -> active=0, свайпы/матчи переезжают в архивный файл
+#     LOBBY_ARCHIVE_DB, горячие таблицы (swipes/members/matches/likes/deck/events) чистятся;
+#   - старые lobby_events активных лобби удаляются (клиенты дольше LOBBY_EVENTS_TTL_HOURS не переподключаются);
+#   - PRAGMA incremental_vacuum небольшими порциями и wal_checkpoint(PASSIVE) — запросы не блокируются.
+# Каждая пачка — короткие транзакции, чтобы не держать write-lock. Итог печатается одной JSON-строкой.
+#   python sweeper.py
+#   python sweeper.py --enable-incremental-vacuum   # один раз: auto_vacuum=INCREMENTAL + полный VACUUM (долго!)
+import argparse, json, os, sqlite3, time
+
+from common import DB_PATH, SQLITE_TIMEOUT, has_table, now_ms
+
+LOBBY_TTL_HOURS = float(os.getenv("LOBBY_TTL_HOURS", "24"))
+LOBBY_EVENTS_TTL_HOURS = float(os.getenv("LOBBY_EVENTS_TTL_HOURS", "6"))
+LOBBY_ARCHIVE_DB = os.getenv("LOBBY_ARCHIVE_DB", os.path.join(os.path.dirname(DB_PATH), "lobby_archive.db"))
+SWEEP_BATCH = 200             # лобби на транзакцию
+EVENTS_BATCH = 10000          # lobby_events на транзакцию
+VACUUM_PAGES = int(os.getenv("SWEEPER_VACUUM_PAGES", "2000"))   # страниц за один incremental_vacuum
+VACUUM_BUDGET_S = 10.0
+
+HOT_TABLES = ("lobby_swipes", "lobby_members", "lobby_matches", "lobby_item_likes", "lobby_deck", "lobby_events")
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive.lobbies_archive(
+    id               TEXT PRIMARY KEY,
+    created_at_ms    INTEGER NOT NULL,
+    last_activity_ms INTEGER NOT NULL,
+    archived_ms      INTEGER NOT NULL,
+    members          INTEGER NOT NULL,
+    swipes           INTEGER NOT NULL,
+    matches          INTEGER NOT NULL
+);
+-- decision -> liked 0/1, без лишних индексов: архив только на аналитику
+CREATE TABLE IF NOT EXISTS archive.lobby_swipes_archive(
+    lobby_id TEXT NOT NULL,
+    user_id  TEXT NOT NULL,
+    item_id  INTEGER NOT NULL,
+    liked    INTEGER NOT NULL,
+    ts_ms    INTEGER NOT NULL,
+    PRIMARY KEY(lobby_id, user_id, item_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS archive.lobby_matches_archive(
+    lobby_id   TEXT NOT NULL,
+    item_id    INTEGER NOT NULL,
+    matched_ms INTEGER NOT NULL,
+    PRIMARY KEY(lobby_id, item_id)
+) WITHOUT ROWID;
+"""
+
+def connect() -> sqlite3.Connection:
+    con = sqlite3.connect(DB_PATH, timeout=SQLITE_TIMEOUT, isolation_level=None)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+IDLE_SCAN = """
+    INSERT INTO temp.sweep_batch(id, created_at_ms, last_ms)
+    SELECT id, created_at_ms, last_ms FROM (
+      SELECT l.id, l.created_at_ms, MAX(l.created_at_ms,
+        COALESCE((SELECT MAX(joined_ms) FROM lobby_members m WHERE m.lobby_id = l.id), 0),
+        COALESCE((SELECT MAX(ts_ms) FROM lobby_swipes s WHERE s.lobby_id = l.id), 0)) AS last_ms
+      FROM lobbies l
+      WHERE l.active = 1 AND l.created_at_ms < ?)
+    WHERE last_ms < ?
+    LIMIT ?"""
+
+def expire_lobbies(con: sqlite3.Connection, ttl_hours: float, report: dict) -> None:
+    # на пачку три шага, write-lock основной БД — только на последнем, коротком:
+    #   1) поиск простаивающих лобби (коррелированные MAX по участникам/свайпам) — без блокировок;
+    #   2) копия в архив, свой коммит: пишется только архивный файл. INSERT OR REPLACE — повтор после
+    #      падения или лобби, ожившее между шагами, просто перезаписывают копию;
+    #   3) BEGIN IMMEDIATE: кто успел ожить после поиска — выпадает из пачки, остальные чистятся.
+    # Коммит сразу в две БД в WAL не атомарен, поэтому архив всегда коммитится раньше удаления.
+    cut = now_ms() - int(ttl_hours * 3600 * 1000)
+    con.execute("ATTACH DATABASE ? AS archive", (LOBBY_ARCHIVE_DB,))
+    try:
+        con.executescript(ARCHIVE_SCHEMA)
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS sweep_batch (id TEXT PRIMARY KEY, created_at_ms INTEGER, last_ms INTEGER)")
+        hot = [t for t in HOT_TABLES if has_table(con, t)]
+        batch = "SELECT id FROM temp.sweep_batch"
+        while True:
+            # 1) поиск: пишется только temp
+            con.execute("DELETE FROM temp.sweep_batch")
+            if not con.execute(IDLE_SCAN, (cut, cut, SWEEP_BATCH)).rowcount:
+                break
+
+            # 2) архив: BEGIN (deferred) — основная БД только читается, блокируется лишь архивный файл
+            con.execute("BEGIN")
+            try:
+                con.execute("""
+                    INSERT OR REPLACE INTO archive.lobbies_archive
+                      (id, created_at_ms, last_activity_ms, archived_ms, members, swipes, matches)
+                    SELECT b.id, b.created_at_ms, b.last_ms, ?,
+                      (SELECT COUNT(*) FROM lobby_members m WHERE m.lobby_id = b.id),
+                      (SELECT COUNT(*) FROM lobby_swipes s WHERE s.lobby_id = b.id),
+                      (SELECT COUNT(*) FROM lobby_matches x WHERE x.lobby_id = b.id)
+                    FROM temp.sweep_batch b""", (now_ms(),))
+                con.execute(f"""INSERT OR REPLACE INTO archive.lobby_swipes_archive(lobby_id, user_id, item_id, liked, ts_ms)
+                                SELECT lobby_id, user_id, item_id, decision = 'like', ts_ms
+                                FROM lobby_swipes WHERE lobby_id IN ({batch})""")
+                con.execute(f"""INSERT OR REPLACE INTO archive.lobby_matches_archive(lobby_id, item_id, matched_ms)
+                                SELECT lobby_id, item_id, matched_ms FROM lobby_matches WHERE lobby_id IN ({batch})""")
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+
+            # 3) чистка под write-lock: перепроверка только по id пачки (индексы по lobby_id)
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                revived = con.execute("""
+                    DELETE FROM temp.sweep_batch WHERE id IN (
+                      SELECT b.id FROM temp.sweep_batch b
+                      WHERE EXISTS (SELECT 1 FROM lobby_members m WHERE m.lobby_id = b.id AND m.joined_ms >= ?)
+                         OR EXISTS (SELECT 1 FROM lobby_swipes s WHERE s.lobby_id = b.id AND s.ts_ms >= ?))""",
+                    (cut, cut)).rowcount
+                for t in hot:
+                    report["deleted"][t] = report["deleted"].get(t, 0) + \
+                        con.execute(f"DELETE FROM {t} WHERE lobby_id IN ({batch})").rowcount
+                n = con.execute(f"UPDATE lobbies SET active = 0 WHERE id IN ({batch})").rowcount
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            report["lobbies_expired"] += n
+            report["lobbies_revived"] += revived
+    finally:
+        con.execute("DETACH DATABASE archive")
+
+def prune_events(con: sqlite3.Connection, ttl_hours: float, report: dict) -> None:
+    # id монотонный по времени: удаляем диапазон id до первого "свежего" события, кусками
+    if not has_table(con, "lobby_events"):
+        return
+    cut = now_ms() - int(ttl_hours * 3600 * 1000)
+    # первое свежее событие — один поиск по idx_lobby_events_ts, а не проход по id от начала таблицы
+    bound = con.execute("""SELECT COALESCE((SELECT id FROM lobby_events WHERE ts_ms >= ? ORDER BY ts_ms LIMIT 1),
+                                           (SELECT MAX(id) + 1 FROM lobby_events), 0)""", (cut,)).fetchone()[0]
+    lo = con.execute("SELECT COALESCE(MIN(id), 0) FROM lobby_events").fetchone()[0]
+    while lo < bound:
+        hi = min(bound, lo + EVENTS_BATCH)
+        report["deleted"]["lobby_events"] = report["deleted"].get("lobby_events", 0) + \
+            con.execute("DELETE FROM lobby_events WHERE id < ?", (hi,)).rowcount
+        lo = hi
+
+def compact(con: sqlite3.Connection, report: dict) -> None:
+    page_size = con.execute("PRAGMA page_size").fetchone()[0]
+    free_before = con.execute("PRAGMA freelist_count").fetchone()[0]
+    if con.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        # INCREMENTAL: отдаём свободные страницы порциями, каждая — своя короткая транзакция
+        deadline = time.monotonic() + VACUUM_BUDGET_S
+        while con.execute("PRAGMA freelist_count").fetchone()[0] and time.monotonic() < deadline:
+            con.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+    else:
+        report["note"] = "auto_vacuum is not INCREMENTAL; run once with --enable-incremental-vacuum"
+    free_after = con.execute("PRAGMA freelist_count").fetchone()[0]
+    report["freed_mb"] = round((free_before - free_after) * page_size / 2**20, 2)
+    report["freelist_mb"] = round(free_after * page_size / 2**20, 2)
+    # PASSIVE: не ждёт читателей/писателей, переносит в БД то, что можно прямо сейчас
+    busy, log_frames, ckpt = con.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    report["wal"] = {"busy": busy, "frames": log_frames, "checkpointed": ckpt}
+
+def enable_incremental_vacuum(con: sqlite3.Connection) -> None:
+    # режим auto_vacuum меняется только полным VACUUM: блокирует БД, запускать в окно обслуживания
+    con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    con.execute("VACUUM")
+
+def sweep(ttl_hours: float = LOBBY_TTL_HOURS, events_ttl_hours: float = LOBBY_EVENTS_TTL_HOURS) -> dict:
+    report = {"lobbies_expired": 0, "lobbies_revived": 0, "deleted": {}}
+    con = connect()
+    try:
+        if has_table(con, "lobbies"):
+            expire_lobbies(con, ttl_hours, report)
+        prune_events(con, events_ttl_hours, report)
+        compact(con, report)
+    finally:
+        con.close()
+    return report
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Expire idle lobbies, archive them and compact the DB")
+    ap.add_argument("--ttl-hours", type=float, default=LOBBY_TTL_HOURS)
+    ap.add_argument("--events-ttl-hours", type=float, default=LOBBY_EVENTS_TTL_HOURS)
+    ap.add_argument("--enable-incremental-vacuum", action="store_true",
+                    help="switch the DB to auto_vacuum=INCREMENTAL (runs a full, blocking VACUUM)")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    if args.enable_incremental_vacuum:
+        c = connect()
+        try:
+            enable_incremental_vacuum(c)
+        finally:
+            c.close()
+    report = sweep(args.ttl_hours, args.events_ttl_hours)
+    report["seconds"] = round(time.perf_counter() - t0, 2)
+    print(json.dumps(report, ensure_ascii=False))
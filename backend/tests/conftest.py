@@ -0,0 +1,51 @@
+# Тесты идут против маленькой синтетической imdb.db (tools/gen_bench_db.py), собранной один раз на сессию.
+# DB_PATH и остальные пути читаются при импорте модулей backend, поэтому задаются здесь, до импортов в тестах.
+#   cd backend && python -m pytest
+import os, shutil, sqlite3, tempfile
+
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix="movie_vibe_tests_")
+DB_PATH = os.environ["DB_PATH"] = os.path.join(TEST_DIR, "imdb.db")
+os.environ["TMDB_CACHE_DB"] = os.path.join(TEST_DIR, "tmdb_cache.db")
+os.environ["LOBBY_ARCHIVE_DB"] = os.path.join(TEST_DIR, "lobby_archive.db")
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+from gen_bench_db import generate
+from tmdb_stub import serve
+
+TITLES = 3000
+generate(DB_PATH, TITLES, seed=42)
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def stub_server():
+    srv = serve(port=0)
+    yield srv
+    srv.shutdown()
+
+@pytest.fixture
+def tmdb_stub(stub_server):
+    # заглушка TMDB (tools/tmdb_stub.py) на свободном порту; счётчик запросов и сценарий ошибок — с нуля
+    # и до, и после теста: недоигранный сценарий упавшего теста не достаётся следующему
+    stub_server.reset()
+    yield stub_server, f"http://127.0.0.1:{stub_server.server_address[1]}/3"
+    stub_server.reset()
+
+@pytest.fixture
+def scratch_db(tmp_path, monkeypatch):
+    # копия тестовой базы для тестов, которые пишут (фетчер, синхронизация); очередь enrichment_state пуста
+    import common, enrichment
+    path = str(tmp_path / "imdb.db")
+    con = sqlite3.connect(path)
+    src = sqlite3.connect(DB_PATH)
+    src.backup(con)   # не shutil.copy: база в WAL, свежие записи могут быть ещё в -wal
+    src.close()
+    monkeypatch.setattr(common, "DB_PATH", path)
+    enrichment.ensure_schema(con)
+    con.execute("UPDATE enrichment_state SET status='done', next_due_ms=NULL")
+    con.commit()
+    yield con
+    con.close()
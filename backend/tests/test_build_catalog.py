@@ -0,0 +1,70 @@
+# Инкрементальная сборка каталога (build_catalog.py) на копии тестовой базы: триггеры метят тайтлы
+# в catalog_dirty, сборка переписывает только их — строки unified_catalog, FTS и catalog_genres.
+import pytest
+
+import build_catalog
+
+def fts(con, query):
+    return {r[0] for r in con.execute("SELECT rowid FROM unified_catalog_fts WHERE unified_catalog_fts MATCH ?",
+                                      (query,))}
+
+def generation(con):
+    return con.execute("SELECT value FROM catalog_meta WHERE key='generation'").fetchone()[0]
+
+@pytest.fixture
+def db(scratch_db, monkeypatch):
+    monkeypatch.setattr(build_catalog, "DB_PATH", scratch_db.execute("PRAGMA database_list").fetchone()[2])
+    assert scratch_db.execute("SELECT COUNT(*) FROM catalog_dirty").fetchone()[0] == 0
+    return scratch_db
+
+def test_movie_update_is_incremental(db):
+    mid = db.execute("SELECT tmdb_id FROM unified_catalog ORDER BY tmdb_id LIMIT 1").fetchone()[0]
+    gen = generation(db)
+    with db:
+        db.execute("UPDATE tmdb_movies SET title='Quuxbridge Nocturne' WHERE id=?", (mid,))
+    assert build_catalog.build() == "incremental: 1 titles"
+    assert db.execute("SELECT title FROM unified_catalog WHERE tmdb_id=?", (mid,)).fetchone()[0] == "Quuxbridge Nocturne"
+    assert fts(db, 'title : "quuxbridge"') == {mid}
+    assert generation(db) == gen + 1
+    assert build_catalog.build() == "incremental: 0 titles"
+
+def test_person_rename_marks_titles(db):
+    pid, = db.execute("""SELECT person_id FROM tmdb_movie_crew WHERE job='Director'
+                         GROUP BY person_id ORDER BY COUNT(*) DESC LIMIT 1""").fetchone()
+    old_name = db.execute("SELECT name FROM tmdb_people WHERE id=?", (pid,)).fetchone()[0]
+    directed = {r[0] for r in db.execute("SELECT movie_id FROM tmdb_movie_crew WHERE person_id=? AND job='Director'",
+                                         (pid,))}
+    acted = {r[0] for r in db.execute("SELECT movie_id FROM tmdb_movie_cast WHERE person_id=?", (pid,))}
+    with db:
+        db.execute("UPDATE tmdb_people SET name=name WHERE id=?", (pid,))   # то же имя — не метит
+    assert db.execute("SELECT COUNT(*) FROM catalog_dirty").fetchone()[0] == 0
+    with db:
+        db.execute("UPDATE tmdb_people SET name='Zorblax Quintavius' WHERE id=?", (pid,))
+    assert {r[0] for r in db.execute("SELECT tmdb_id FROM catalog_dirty")} == directed | acted
+    assert build_catalog.build().startswith("incremental")
+    for mid, director in db.execute(f"SELECT tmdb_id, director FROM unified_catalog WHERE tmdb_id IN "
+                                    f"({','.join('?' * len(directed))})", list(directed)):
+        assert "Zorblax Quintavius" in director and old_name not in director.split(", ")
+    assert fts(db, 'director : "zorblax quintavius"') == directed
+    # старое имя из FTS этих тайтлов ушло
+    assert not fts(db, f'director : "{old_name}"') & directed
+
+def test_genre_rename_marks_titles(db, monkeypatch):
+    monkeypatch.setattr(build_catalog, "FULL_REBUILD_RATIO", 1.0)   # у жанра большая доля каталога
+    gid, = db.execute("SELECT genre_id FROM tmdb_movie_genres GROUP BY genre_id ORDER BY COUNT(*) LIMIT 1").fetchone()
+    tagged = {r[0] for r in db.execute("SELECT DISTINCT movie_id FROM tmdb_movie_genres WHERE genre_id=?", (gid,))}
+    with db:
+        db.execute("UPDATE tmdb_genres SET name='Aaa Noir' WHERE id=?", (gid,))   # первый по алфавиту — в строке
+    assert {r[0] for r in db.execute("SELECT tmdb_id FROM catalog_dirty")} == tagged
+    assert build_catalog.build() == f"incremental: {len(tagged)} titles"
+    renamed = {r[0] for r in db.execute("SELECT tmdb_id FROM unified_catalog WHERE genres LIKE 'Aaa Noir%'")}
+    assert renamed == tagged
+
+def test_db_without_new_triggers_gets_full_rebuild(db):
+    with db:
+        db.execute("DROP TRIGGER trg_cd_people_upd")
+        db.execute("DROP TRIGGER trg_cd_genre_names_upd")
+    assert build_catalog.build().startswith("full")
+    triggers = {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type='trigger'")}
+    assert {"trg_cd_people_upd", "trg_cd_genre_names_upd"} <= triggers
+    assert build_catalog.build() == "incremental: 0 titles"
@@ -0,0 +1,48 @@
+# Кэш /catalog/search: ответ лежит под generation тех данных, из которых собран, а не под текущим
+# catalog_meta.generation — снапшот движка после пересборки каталога ещё до CATALOG_ENGINE_CHECK_S старый.
+import sqlite3
+
+import pytest
+
+import catalog_engine
+import common
+import server
+from catalog import CatalogFilters
+from common import DB_PATH
+
+FILTERS = CatalogFilters(title="night", page_size=5)
+
+def set_generation(generation: int) -> None:
+    con = sqlite3.connect(DB_PATH)
+    with con:
+        con.execute("UPDATE catalog_meta SET value = ? WHERE key = 'generation'", (generation,))
+    con.close()
+    common._generation = (0, 0.0)   # без ожидания CATALOG_GEN_CHECK_S
+
+@pytest.fixture
+def rebuilt():
+    # снапшот загружен из текущей сборки, потом каталог "пересобрали"
+    snap = catalog_engine.load_snapshot()
+    catalog_engine._snapshot = snap
+    server.catalog_cache.clear()
+    set_generation(snap.generation + 1)
+    yield snap
+    set_generation(snap.generation)
+    catalog_engine._snapshot = None
+    server.catalog_cache.clear()
+
+def test_search_reports_sql_generation():
+    generation, _ = server.search_catalog(FILTERS)
+    assert generation == common.current_catalog_generation()
+
+def test_stale_snapshot_not_cached_under_new_generation(rebuilt):
+    key = server.catalog_cache_key(FILTERS)
+    server.catalog_search(FILTERS)
+    assert server.catalog_cache.get((rebuilt.generation, key)) is not None
+    assert server.catalog_cache.get((rebuilt.generation + 1, key)) is None
+
+def test_sql_path_cached_under_new_generation(rebuilt):
+    catalog_engine._snapshot = None
+    key = server.catalog_cache_key(FILTERS)
+    server.catalog_search(FILTERS)
+    assert server.catalog_cache.get((rebuilt.generation + 1, key)) is not None
@@ -0,0 +1,88 @@
+# POST /catalog/export (catalog_export.py): те же строки и порядок, что у /catalog/search по всем страницам,
+# gzip — те же байты, не больше EXPORT_CONCURRENCY экспортов, место освобождается и после обрыва.
+import asyncio, gzip, json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import catalog_export
+import server
+from catalog import CatalogFilters
+
+FILTERS = [
+    {"year_from": 1990, "year_to": 2005, "sort_by": "imdb", "order": "desc"},
+    {"genres": ["Drama", "Comedy"], "genres_mode": "all", "sort_by": "title", "order": "asc"},
+    {"title": "night", "sort_by": "year", "order": "asc"},
+]
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(server.app)
+
+def search_all(body: dict) -> list:
+    # все страницы /catalog/search по курсору
+    out, cursor = [], None
+    while True:
+        resp = json.loads(server.search_catalog(CatalogFilters(**body, page_size=50, cursor=cursor))[1])
+        out += resp["results"]
+        if not (cursor := resp["next_cursor"]):
+            return out
+
+@pytest.mark.parametrize("body", FILTERS)
+def test_ndjson_matches_search_pages(client, body):
+    r = client.post("/catalog/export", json=body)
+    assert r.status_code == 200 and r.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in r.content.splitlines()]
+    assert rows and rows == search_all(body)
+
+def test_gzip_is_same_bytes(client):
+    plain = client.post("/catalog/export", json=FILTERS[0]).content
+    with client.stream("POST", "/catalog/export", params={"gzip": "true"}, json=FILTERS[0]) as r:
+        assert r.headers["content-encoding"] == "gzip"
+        raw = b"".join(r.iter_raw())
+    assert raw != plain and gzip.decompress(raw) == plain
+
+def test_csv_header_and_rows(client):
+    r = client.post("/catalog/export", params={"format": "csv"}, json=FILTERS[0])
+    lines = r.text.splitlines()
+    assert lines[0] == ",".join(catalog_export.CATALOG_FIELDS)
+    assert len(lines) - 1 == len(search_all(FILTERS[0]))
+
+def test_concurrency_cap_returns_429(client, monkeypatch):
+    monkeypatch.setattr(catalog_export, "_active", catalog_export.EXPORT_CONCURRENCY)
+    r = client.post("/catalog/export", json=FILTERS[0])
+    assert r.status_code == 429
+
+def test_slot_released_after_finish_abort_and_no_start(monkeypatch):
+    monkeypatch.setattr(catalog_export, "EXPORT_CHUNK", 10)   # несколько пачек — есть что обрывать
+    filters = CatalogFilters(**FILTERS[0])
+
+    async def scenario():
+        assert catalog_export._active == 0
+        first = await catalog_export.catalog_export(filters, "ndjson", False)
+        second = await catalog_export.catalog_export(filters, "ndjson", True)
+        with pytest.raises(HTTPException) as e:
+            await catalog_export.catalog_export(filters, "ndjson", False)
+        assert e.value.status_code == 429
+        # до конца: место освобождает сам поток, фоновая задача ответа второй раз не освобождает
+        assert b"".join([c async for c in first.body_iterator])
+        assert catalog_export._active == 1
+        await first.background()
+        assert catalog_export._active == 1
+        # оборван после первой пачки: место и соединение экспорта возвращаются
+        await second.body_iterator.__anext__()
+        await second.body_iterator.aclose()
+        assert catalog_export._active == 0
+        await second.background()
+        assert catalog_export._active == 0
+        assert catalog_export.export_pool._idle.qsize() == len(catalog_export.export_pool._all)
+        # клиент ушёл до начала потока: освобождает фоновая задача
+        third = await catalog_export.catalog_export(filters, "csv", False)
+        assert catalog_export._active == 1
+        await third.background()
+        assert catalog_export._active == 0
+        await third.body_iterator.aclose()
+
+    monkeypatch.setattr(catalog_export, "EXPORT_CONCURRENCY", 2)
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+# Текстовые фильтры /catalog/search через unified_catalog_fts дают те же строки, что прежний LIKE '%x%',
+# для ввода с начала слова (typeahead); регистр и диакритика не важны. Ввод с середины слова ("ight")
+# индекс по префиксам не находит — такие запросы дают подмножество LIKE.
+import sqlite3
+
+import pytest
+
+from catalog import CatalogFilters, catalog_where
+from common import DB_PATH
+
+TITLE_QUERIES = ["night", "Night", "Night S", "night summer", "Dark City", "dark c", "king bl", "Golden Sto",
+                 "sto", "dark-city", "night ", " night", "Night  S", "secret lost", "o'brien", "!!"]
+PEOPLE_QUERIES = ["Anna", "anna nolan", "Anna Smith", "Greta Smith 13", "Hugo Reeves 1", "Smith", "Nolan 12",
+                  "Anna-Nolan", "Ōta"]
+
+@pytest.fixture(scope="module")
+def con():
+    con = sqlite3.connect(DB_PATH)
+    yield con
+    con.close()
+
+def ids_fts(con, **kw):
+    where, params = catalog_where(CatalogFilters(**kw))
+    return {r[0] for r in con.execute(f"SELECT tmdb_id FROM unified_catalog WHERE {where}", params)}
+
+def ids_like(con, column, text):
+    return {r[0] for r in con.execute(f"SELECT tmdb_id FROM unified_catalog WHERE {column} LIKE ?", (f"%{text}%",))}
+
+@pytest.mark.parametrize("text", TITLE_QUERIES)
+def test_title_matches_like(con, text):
+    assert ids_fts(con, title=text) == ids_like(con, "title", text)
+
+@pytest.mark.parametrize("text", PEOPLE_QUERIES)
+def test_people_match_like(con, text):
+    assert ids_fts(con, actor=text) == ids_like(con, "actors", text)
+    assert ids_fts(con, director=text) == ids_like(con, "director", text)
+
+@pytest.mark.parametrize("text", ["st", "ight", "ark cit", "mith"])
+def test_mid_word_input_is_subset_of_like(con, text):
+    assert ids_fts(con, title=text) <= ids_like(con, "title", text)
+    assert ids_fts(con, actor=text) <= ids_like(con, "actors", text)
+
+def test_fixture_is_not_trivial(con):
+    # запросы выше должны что-то находить, иначе равенство ничего не доказывает
+    assert len(ids_like(con, "title", "Night S")) > 5
+    assert len(ids_like(con, "actors", "anna nolan")) > 5
+
+def test_phrase_does_not_join_different_people(con):
+    # "Anna Smith" не должен находить "Anna Nolan 1, Greta Smith 2": слова от разных людей
+    row = con.execute("SELECT tmdb_id, actors FROM unified_catalog WHERE actors LIKE 'Anna %' AND actors NOT LIKE '%Anna Smith%' "
+                      "AND actors LIKE '%, % Smith %' LIMIT 1").fetchone()
+    assert row is not None
+    assert row[0] not in ids_fts(con, actor="Anna Smith")
+
+def test_diacritics_and_case_are_ignored(con):
+    accented = ids_like(con, "actors", "Chloé")
+    assert accented
+    assert accented <= ids_fts(con, actor="chloe")
+    assert accented <= ids_fts(con, actor="CHLOÉ")
@@ -0,0 +1,98 @@
+# Быстрый путь /catalog/search собирает JSON из строк SQLite без pydantic (catalog.py), поэтому соответствие
+# схеме проверяется здесь, а не в рантайме: ответы SQL-пути и in-memory движка проходят CatalogResponse
+# в strict-режиме и совпадают байт-в-байт с model_dump_json() и между собой; каждая строка каталога
+# проходит CatalogItem; в OpenAPI /catalog/search по-прежнему описан как CatalogResponse.
+import random
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+import catalog_engine
+import server
+from bench_suite import catalog_body
+from catalog import CATALOG_COLUMNS, CatalogFilters, CatalogItem, CatalogResponse, catalog_items_json
+from common import conn
+
+QUERIES = 200
+ITEMS = TypeAdapter(List[CatalogItem])
+
+@pytest.fixture(scope="module")
+def bodies():
+    rnd = random.Random(7)
+    return [catalog_body(rnd) for _ in range(QUERIES)]
+
+def search(body: dict) -> bytes:
+    return server.search_catalog(CatalogFilters(**body))[1]
+
+def check(body: bytes) -> CatalogResponse:
+    resp = CatalogResponse.model_validate_json(body, strict=True)
+    assert resp.model_dump_json().encode("utf-8") == body
+    return resp
+
+def responses(bodies: List[dict]) -> List[bytes]:
+    # первая страница и, если есть, следующая по курсору
+    out = []
+    for b in bodies:
+        first = search(b)
+        out.append(first)
+        resp = check(first)
+        if resp.next_cursor:
+            out.append(search({**b, "cursor": resp.next_cursor}))
+    return out
+
+@pytest.fixture(scope="module")
+def sql_responses(bodies):
+    assert catalog_engine.snapshot() is None
+    return responses(bodies)
+
+def test_sql_path_matches_schema(sql_responses):
+    for body in sql_responses:
+        check(body)
+    assert any(check(b).results for b in sql_responses)
+
+def test_engine_path_matches_sql(bodies, sql_responses):
+    catalog_engine._snapshot = catalog_engine.load_snapshot()
+    try:
+        mem = responses(bodies)
+    finally:
+        catalog_engine._snapshot = None
+    for body in mem:
+        check(body)
+    assert mem == sql_responses
+
+def test_every_row_validates():
+    con = conn()
+    try:
+        cur = con.execute(f"SELECT {CATALOG_COLUMNS} FROM unified_catalog")
+        n = 0
+        while rows := cur.fetchmany(1000):
+            ITEMS.validate_json(catalog_items_json(rows), strict=True)
+            n += len(rows)
+    finally:
+        con.close()
+    assert n > 0
+
+def test_openapi_describes_catalog_response():
+    op = server.app.openapi()["paths"]["/catalog/search"]["post"]
+    ref = op["responses"]["200"]["content"]["application/json"]["schema"].get("$ref")
+    assert ref == "#/components/schemas/CatalogResponse"
+
+def test_rating_boundaries_match_sql():
+    # imdb_min/tmdb_min ровно на значении рейтинга и на волосок выше/ниже: движок сравнивает так же, как SQLite
+    # (REAL — float64), без округления до float32
+    con = conn()
+    try:
+        ratings = [r[0] for r in con.execute("SELECT DISTINCT imdb_rating FROM unified_catalog "
+                                             "WHERE imdb_rating IS NOT NULL ORDER BY 1 LIMIT 40")]
+    finally:
+        con.close()
+    bodies = [{key: v + d, "sort_by": "imdb", "page_size": 50, "with_total": True}
+              for key in ("imdb_min", "tmdb_min") for r in ratings[::4] for v, d in ((r, 0), (r, 1e-9), (r, -1e-9))]
+    sql = [search(b) for b in bodies]
+    catalog_engine._snapshot = catalog_engine.load_snapshot()
+    try:
+        mem = [search(b) for b in bodies]
+    finally:
+        catalog_engine._snapshot = None
+    assert mem == sql
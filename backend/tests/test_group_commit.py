@@ -0,0 +1,88 @@
+# Group commit свайпов (group_commit.py, LOBBY_GROUP_COMMIT=1): отказ одной операции откатывает только
+# её SAVEPOINT, ответ — после COMMIT пачки, переполненная очередь — 503, close() дописывает очередь.
+import threading
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import lobby
+import server
+from common import read_conn
+from group_commit import GroupCommitWriter
+from lobby import CreateLobbyIn, JoinLobbyIn, SwipeIn
+
+@pytest.fixture
+def lid():
+    code = lobby.create_lobby(CreateLobbyIn(user_id="u1"))["lobby_id"]
+    lobby.join_lobby(JoinLobbyIn(code=code, user_id="u2"))
+    return code
+
+@pytest.fixture
+def writers():
+    made = []
+
+    def make(apply=lobby.swipe_in_txn, **kw):
+        w = GroupCommitWriter(apply, name="test-writer", **kw)
+        made.append(w)
+        return w
+    yield make
+    for w in made:
+        w.close()
+
+def swipe(lid, user, item, decision="like"):
+    return SwipeIn(lobby_id=lid, user_id=user, item_id=item, decision=decision)
+
+def committed(lid):
+    with read_conn() as con:
+        return {tuple(r) for r in con.execute("SELECT user_id, item_id FROM lobby_swipes WHERE lobby_id=?", (lid,))}
+
+def test_rejected_op_rolls_back_only_itself(lid, writers):
+    w = writers(max_wait_ms=200)
+    futs = [w.submit(swipe(lid, "u1", 1)), w.submit(swipe(lid, "stranger", 2)), w.submit(swipe(lid, "u2", 1))]
+    assert futs[0].result(5) is False and futs[2].result(5) is True     # второй лайк — матч (порог 2)
+    with pytest.raises(HTTPException) as e:
+        futs[1].result(5)
+    assert e.value.status_code == 403
+    assert w.batches == 1 and w.items == 3
+    assert committed(lid) == {("u1", 1), ("u2", 1)}
+
+def test_result_only_after_commit(lid, writers):
+    w = writers(max_wait_ms=50)
+    seen = []
+
+    def check(fut):
+        # колбэк Future — в потоке писателя в момент set_result: другое соединение уже видит свайп
+        seen.append((fut.result(), committed(lid)))
+    for user in ("u1", "u2"):
+        w.submit(swipe(lid, user, 7)).add_done_callback(check)
+    w.close()
+    assert sorted(seen) == [(False, {("u1", 7), ("u2", 7)}), (True, {("u1", 7), ("u2", 7)})]
+
+def test_full_queue_returns_503(lid, writers, monkeypatch):
+    entered, release = threading.Event(), threading.Event()
+
+    def blocking(cur, item):
+        entered.set()
+        release.wait(5)
+        return lobby.swipe_in_txn(cur, item)
+
+    w = writers(blocking, max_wait_ms=0, maxsize=1)
+    first = w.submit(swipe(lid, "u1", 1))
+    assert entered.wait(5)                  # писатель занят первой операцией
+    second = w.submit(swipe(lid, "u2", 1))  # и очередь (maxsize=1) заполнена
+    monkeypatch.setattr(lobby, "LOBBY_GROUP_COMMIT", True)
+    monkeypatch.setattr(lobby, "swipe_writer", w)
+    r = TestClient(server.app).post("/lobby/swipe", json={"lobby_id": lid, "user_id": "u1", "item_id": 2,
+                                                          "decision": "like"})
+    assert r.status_code == 503
+    release.set()
+    assert first.result(5) is False and second.result(5) is True
+
+def test_close_drains_queue(lid, writers):
+    # как на shutdown сервера: всё, что уже в очереди, коммитится до остановки писателя
+    w = writers(max_wait_ms=50, batch=4)
+    futs = [w.submit(swipe(lid, "u1" if i % 2 else "u2", i)) for i in range(10)]
+    w.close()
+    assert all(f.done() and f.exception() is None for f in futs)
+    assert len(committed(lid)) == 10
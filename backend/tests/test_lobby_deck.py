@@ -0,0 +1,65 @@
+# Колода лобби (lobby.deck_ids, GET /lobby/{code}/deck): порядок — сортировка CatalogFilters лобби,
+# свайпнутое участником отсекается, лайкнутое другими идёт первым по числу лайков.
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from catalog import CatalogFilters
+
+FILTERS = {"year_from": 1995, "sort_by": "year", "order": "asc"}
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(server.app)
+
+@pytest.fixture
+def lid(client):
+    code = client.post("/lobby/create", json={"user_id": "u1", "filters": FILTERS}).json()["lobby_id"]
+    for user in ("u2", "u3"):
+        assert client.post("/lobby/join", json={"code": code, "user_id": user}).status_code == 200
+    return code
+
+def search_ids(n: int) -> list:
+    # первые n тайтлов /catalog/search с теми же фильтрами
+    body = json.loads(server.search_catalog(CatalogFilters(**FILTERS, page_size=n))[1])
+    return [r["tmdb_id"] for r in body["results"]]
+
+def deck(client, lid, user, n=10):
+    r = client.get(f"/lobby/{lid}/deck", params={"user_id": user, "n": n})
+    assert r.status_code == 200
+    return [item["tmdb_id"] for item in r.json()["items"]]
+
+def swipe(client, lid, user, item, decision="like"):
+    r = client.post("/lobby/swipe", json={"lobby_id": lid, "user_id": user, "item_id": item, "decision": decision})
+    assert r.status_code == 200
+
+def test_deck_follows_lobby_sort(client, lid):
+    expected = search_ids(50)
+    assert deck(client, lid, "u1", 50) == expected
+    years = [r["year"] for r in client.get(f"/lobby/{lid}/deck", params={"user_id": "u1", "n": 50}).json()["items"]]
+    assert years == sorted(years) and min(years) >= 1995
+
+def test_swiped_titles_excluded(client, lid):
+    ids = search_ids(20)
+    swipe(client, lid, "u1", ids[15], "like")
+    for i in (0, 1, 3):
+        swipe(client, lid, "u1", ids[i], "skip")
+    assert deck(client, lid, "u1") == [ids[2]] + ids[4:13]
+    # у остальных колода прежняя, только лайк u1 — впереди
+    assert deck(client, lid, "u2") == [ids[15]] + ids[:9]
+
+def test_liked_by_others_first(client, lid):
+    ids = search_ids(40)
+    swipe(client, lid, "u3", ids[20])
+    swipe(client, lid, "u2", ids[30])
+    swipe(client, lid, "u3", ids[30])
+    swipe(client, lid, "u2", ids[5], "skip")    # skip не поднимает
+    # два лайка, потом один, потом колода по порядку
+    assert deck(client, lid, "u1") == [ids[30], ids[20]] + ids[:8]
+    # свой лайк u3 не видит, лайк u2 на ids[30] он уже свайпнул
+    assert deck(client, lid, "u3", 5) == ids[:5]
+
+def test_non_member_forbidden(client, lid):
+    assert client.get(f"/lobby/{lid}/deck", params={"user_id": "stranger"}).status_code == 403
@@ -0,0 +1,88 @@
+# События лобби (lobby_events.py) в процессе, без HTTP: свайп даёт события swipe и matched,
+# Last-Event-ID досылает только id больше данного, переполнивший очередь подписчик отключается.
+import asyncio
+
+import pytest
+
+import lobby
+import lobby_events
+from lobby import CreateLobbyIn, JoinLobbyIn, SwipeIn
+
+@pytest.fixture
+def lid():
+    code = lobby.create_lobby(CreateLobbyIn(user_id="u1"))["lobby_id"]
+    lobby.join_lobby(JoinLobbyIn(code=code, user_id="u2"))
+    return code
+
+async def never_disconnected():
+    return False
+
+def parse(chunk: bytes) -> dict:
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().split("\n"))
+    return {"id": int(fields["id"]), "kind": fields["event"], "data": fields["data"]}
+
+async def next_chunk(gen, timeout=5):
+    return await asyncio.wait_for(gen.__anext__(), timeout)
+
+async def swipe(lid, user, item, decision="like"):
+    # как обработчик /lobby/swipe: синхронно в потоке, после коммита — пинок хабу
+    return await asyncio.to_thread(lobby.swipe_sync, SwipeIn(lobby_id=lid, user_id=user, item_id=item,
+                                                             decision=decision))
+
+def test_swipe_and_match_events(lid):
+    async def main():
+        gen = lobby_events.stream(lid, None, never_disconnected)
+        try:
+            assert (await next_chunk(gen)).startswith(b"retry: 2000\n: connected ")
+            await swipe(lid, "u1", 7)
+            await swipe(lid, "u2", 7)
+            return [parse(await next_chunk(gen)) for _ in range(3)]
+        finally:
+            await gen.aclose()
+
+    events = asyncio.run(main())
+    assert [e["kind"] for e in events] == ["swipe", "swipe", "matched"]
+    assert [e["id"] for e in events] == sorted(e["id"] for e in events)
+    assert '"item_id":7' in events[2]["data"]
+
+def test_last_event_id_replays_newer_only(lid):
+    async def main():
+        for item in (1, 2, 3):
+            await swipe(lid, "u1", item)
+        ids = [e["id"] for e in lobby_events.events_since(0, lid) if e["kind"] == "swipe"]   # без member_joined
+        gen = lobby_events.stream(lid, ids[0], never_disconnected)
+        try:
+            replay = [parse(await next_chunk(gen)) for _ in range(2)]
+            assert (await next_chunk(gen)).startswith(f"retry: 2000\n: connected {ids[2]}".encode())
+            return ids, replay
+        finally:
+            await gen.aclose()
+
+    ids, replay = asyncio.run(main())
+    assert [e["id"] for e in replay] == ids[1:]
+    assert all(e["kind"] == "swipe" for e in replay)
+
+def test_slow_subscriber_disconnected(lid, monkeypatch):
+    monkeypatch.setattr(lobby_events, "LOBBY_EVENTS_QUEUE", 2)
+
+    async def main():
+        gen = lobby_events.stream(lid, None, never_disconnected)
+        try:
+            await next_chunk(gen)
+            for item in range(1, 6):        # 5 событий при очереди на 2 — подписчик не читает
+                await swipe(lid, "u1", item)
+            for _ in range(100):
+                if lid not in lobby_events.hub._subs:
+                    break
+                await asyncio.sleep(0.05)
+            assert lid not in lobby_events.hub._subs
+            # что успело в очередь — дочитывается, дальше поток закрывается: клиент придёт с Last-Event-ID
+            got = [parse(await next_chunk(gen)) for _ in range(2)]
+            with pytest.raises(StopAsyncIteration):
+                await next_chunk(gen)
+            return got
+        finally:
+            await gen.aclose()
+
+    got = asyncio.run(main())
+    assert [e["kind"] for e in got] == ["swipe", "swipe"]
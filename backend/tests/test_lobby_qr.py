@@ -0,0 +1,36 @@
+# GET /lobby/{code}/qr (core.render_qr): PNG с ETag и долгим кэшем, повтор с If-None-Match — 304 без тела.
+import pytest
+from fastapi.testclient import TestClient
+
+import core
+import server
+from common import JOIN_BASE_URL
+
+CODE = "abcdefgh23456789"
+CACHE_CONTROL = "public, max-age=604800, immutable"
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(server.app)
+
+def test_png_with_etag_and_cache_headers(client):
+    r = client.get(f"/lobby/{CODE}/qr")
+    assert r.status_code == 200 and r.headers["content-type"] == "image/png"
+    assert r.content.startswith(b"\x89PNG\r\n\x1a\n")
+    assert r.headers["cache-control"] == CACHE_CONTROL
+    etag = r.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    # тот же PNG, что в create_lobby (qr_png_base64), — из того же кэша
+    assert (r.content, etag) == core.render_qr(f"{JOIN_BASE_URL}/lobby/{CODE}/join")
+
+def test_if_none_match_gives_304(client):
+    etag = client.get(f"/lobby/{CODE}/qr").headers["etag"]
+    for header in (etag, f'"other", {etag}'):
+        r = client.get(f"/lobby/{CODE}/qr", headers={"If-None-Match": header})
+        assert r.status_code == 304 and r.content == b""
+        assert r.headers["etag"] == etag and r.headers["cache-control"] == CACHE_CONTROL
+
+def test_stale_etag_gets_png(client):
+    r = client.get(f"/lobby/{CODE}/qr", headers={"If-None-Match": '"stale"'})
+    assert r.status_code == 200 and r.content.startswith(b"\x89PNG")
+    assert client.get("/lobby/otherlobbycode2345/qr").headers["etag"] != r.headers["etag"]
@@ -0,0 +1,118 @@
+# Свайпы лобби (lobby.apply_swipe): счётчик lobby_item_likes вместо COUNT(*) по lobby_swipes —
+# +1 за новый лайк, -1 за like->skip, 0 за повтор; матч по порогу LOBBY_MATCH_LIKES; досчёт счётчиков
+# по уже накопленным свайпам при первом запуске (ensure_lobby_schema).
+import sqlite3, threading
+
+import pytest
+from fastapi import HTTPException
+
+import lobby
+from common import ConnectionPool, read_conn
+from lobby import CreateLobbyIn, JoinLobbyIn, SwipeIn
+
+ITEM = 550
+
+@pytest.fixture
+def lid(monkeypatch):
+    # лобби на троих, матч — с трёх лайков (не порог по умолчанию)
+    monkeypatch.setattr(lobby, "LOBBY_MATCH_LIKES", 3)
+    code = lobby.create_lobby(CreateLobbyIn(user_id="u1"))["lobby_id"]
+    for user in ("u2", "u3"):
+        lobby.join_lobby(JoinLobbyIn(code=code, user_id=user))
+    return code
+
+def swipe(lid: str, user: str, decision: str, item: int = ITEM) -> bool:
+    return lobby.swipe_sync(SwipeIn(lobby_id=lid, user_id=user, item_id=item, decision=decision))
+
+def state(lid: str, item: int = ITEM):
+    # (счётчик, есть ли матч); счётчик всегда равен числу лайков в lobby_swipes
+    with read_conn() as con:
+        likes = con.execute("SELECT likes FROM lobby_item_likes WHERE lobby_id=? AND item_id=?",
+                            (lid, item)).fetchone()
+        counted = con.execute("SELECT COUNT(*) FROM lobby_swipes WHERE lobby_id=? AND item_id=? AND decision='like'",
+                              (lid, item)).fetchone()[0]
+        matched = con.execute("SELECT 1 FROM lobby_matches WHERE lobby_id=? AND item_id=?", (lid, item)).fetchone()
+    likes = likes[0] if likes else 0
+    assert likes == counted
+    return likes, matched is not None
+
+def test_like_duplicate_skip_like(lid):
+    assert swipe(lid, "u1", "like") is False and state(lid) == (1, False)
+    assert swipe(lid, "u1", "like") is False and state(lid) == (1, False)    # повтор: 0
+    assert swipe(lid, "u1", "skip") is False and state(lid) == (0, False)    # like->skip: -1
+    assert swipe(lid, "u1", "skip") is False and state(lid) == (0, False)
+    assert swipe(lid, "u1", "like") is False and state(lid) == (1, False)    # skip->like: +1
+
+def test_match_at_threshold(lid):
+    assert swipe(lid, "u1", "like") is False
+    assert swipe(lid, "u2", "like") is False and state(lid) == (2, False)    # 2 < LOBBY_MATCH_LIKES=3
+    assert swipe(lid, "u3", "like") is True and state(lid) == (3, True)
+    assert swipe(lid, "u3", "like") is True and state(lid) == (3, True)      # повтор не считается дважды
+    # матч не отзывается, но счётчик честный
+    assert swipe(lid, "u2", "skip") is False and state(lid) == (2, True)
+
+def test_skip_without_like_creates_no_counter(lid):
+    assert swipe(lid, "u1", "skip", item=551) is False
+    with read_conn() as con:
+        assert con.execute("SELECT 1 FROM lobby_item_likes WHERE lobby_id=? AND item_id=551", (lid,)).fetchone() is None
+
+def test_non_member_rejected(lid):
+    with pytest.raises(HTTPException) as e:
+        swipe(lid, "stranger", "like")
+    assert e.value.status_code == 403 and state(lid) == (0, False)
+
+def old_db(path: str) -> None:
+    # база до появления lobby_item_likes: свайпы есть, счётчиков нет
+    con = sqlite3.connect(path)
+    con.executescript("""
+        CREATE TABLE lobbies(id TEXT PRIMARY KEY, created_at_ms INTEGER NOT NULL, active INTEGER NOT NULL DEFAULT 1);
+        CREATE TABLE lobby_swipes(lobby_id TEXT NOT NULL, user_id TEXT NOT NULL, item_id INTEGER NOT NULL,
+                                  decision TEXT NOT NULL, ts_ms INTEGER NOT NULL,
+                                  PRIMARY KEY(lobby_id, user_id, item_id));
+        INSERT INTO lobbies VALUES('a', 0, 1), ('b', 0, 1);
+        INSERT INTO lobby_swipes VALUES('a','u1',1,'like',0), ('a','u2',1,'like',0), ('a','u3',1,'skip',0),
+                                       ('a','u1',2,'skip',0), ('b','u1',1,'like',0);
+    """)
+    con.close()
+
+def test_backfill_from_swipes_without_counters(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    old_db(path)
+    pool = ConnectionPool(1, readonly=False, path=path, label="test")
+    monkeypatch.setattr(lobby, "write_conn", pool.connection)
+    try:
+        lobby.ensure_lobby_schema()
+        lobby.ensure_lobby_schema()   # повторный запуск (второй воркер) счётчики не удваивает
+        with pool.connection() as con:
+            likes = con.execute("SELECT lobby_id, item_id, likes FROM lobby_item_likes ORDER BY 1, 2").fetchall()
+    finally:
+        pool.close()
+    assert [tuple(r) for r in likes] == [("a", 1, 2), ("b", 1, 1)]
+
+def test_concurrent_migration(tmp_path, monkeypatch):
+    # два воркера стартуют одновременно на старой базе: второй ждёт write-lock первого и досчёт не повторяет
+    path = str(tmp_path / "old.db")
+    old_db(path)
+    pool = ConnectionPool(2, readonly=False, path=path, label="test")
+    monkeypatch.setattr(lobby, "write_conn", pool.connection)
+    start, errors = threading.Barrier(2), []
+
+    def worker():
+        start.wait()
+        try:
+            lobby.ensure_lobby_schema()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        with pool.connection() as con:
+            likes = con.execute("SELECT lobby_id, item_id, likes FROM lobby_item_likes ORDER BY 1, 2").fetchall()
+    finally:
+        pool.close()
+    assert errors == []
+    assert [tuple(r) for r in likes] == [("a", 1, 2), ("b", 1, 1)]
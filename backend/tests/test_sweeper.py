@@ -0,0 +1,85 @@
+# Обслуживание лобби (sweeper.py) на копии тестовой базы: простаивающие лобби уезжают в архив и чистятся,
+# ожившее между архивом и чисткой — остаётся активным; старые lobby_events удаляются.
+import sqlite3
+
+import pytest
+
+import lobby  # noqa: F401  — схема лобби в тестовой базе
+import sweeper
+from common import now_ms
+
+HOUR = 3600 * 1000
+
+@pytest.fixture
+def db(scratch_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(sweeper, "DB_PATH", scratch_db.execute("PRAGMA database_list").fetchone()[2])
+    monkeypatch.setattr(sweeper, "LOBBY_ARCHIVE_DB", str(tmp_path / "lobby_archive.db"))
+    now = now_ms()
+    lobbies = [("idle", now - 48 * HOUR, now - 30 * HOUR), ("revives", now - 48 * HOUR, now - 30 * HOUR),
+               ("fresh", now - HOUR, now - HOUR), ("busy", now - 48 * HOUR, now)]
+    with scratch_db:
+        # лобби, созданные другими тестами в общей базе, в копии не нужны
+        for table in ("lobby_events", "lobby_matches", "lobby_swipes", "lobby_item_likes", "lobby_deck",
+                      "lobby_members", "lobbies"):
+            scratch_db.execute(f"DELETE FROM {table}")
+        for lid, created, last in lobbies:   # по времени последней активности: id событий растёт вместе с ts
+            scratch_db.execute("INSERT INTO lobbies(id, created_at_ms, active) VALUES(?,?,1)", (lid, created))
+            scratch_db.execute("INSERT INTO lobby_members VALUES(?,?,?,?)", (lid, "u1", None, created))
+            scratch_db.execute("INSERT INTO lobby_swipes VALUES(?,?,?,?,?)", (lid, "u1", 1, "like", last))
+            scratch_db.execute("INSERT INTO lobby_matches VALUES(?,?,?)", (lid, 1, last))
+            scratch_db.execute("INSERT INTO lobby_events(lobby_id, kind, payload, ts_ms) VALUES(?,?,?,?)",
+                               (lid, "swipe", "{}", last))
+    return scratch_db
+
+def archive(path, sql):
+    con = sqlite3.connect(path)
+    try:
+        return con.execute(sql).fetchall()
+    finally:
+        con.close()
+
+def test_sweep_archives_idle_lobbies(db):
+    report = sweeper.sweep(ttl_hours=24, events_ttl_hours=6)
+    active = dict(db.execute("SELECT id, active FROM lobbies"))
+    assert active == {"idle": 0, "busy": 1, "fresh": 1, "revives": 0}
+    assert report["lobbies_expired"] == 2 and report["lobbies_revived"] == 0
+    assert {r[0] for r in db.execute("SELECT DISTINCT lobby_id FROM lobby_swipes")} == {"busy", "fresh"}
+    assert archive(sweeper.LOBBY_ARCHIVE_DB, "SELECT id, members, swipes, matches FROM lobbies_archive ORDER BY id") == \
+        [("idle", 1, 1, 1), ("revives", 1, 1, 1)]
+    assert len(archive(sweeper.LOBBY_ARCHIVE_DB, "SELECT * FROM lobby_swipes_archive")) == 2
+    # события: старше 6 ч — удалены вместе с лобби или по TTL
+    assert {r[0] for r in db.execute("SELECT lobby_id FROM lobby_events")} == {"busy", "fresh"}
+
+class RacingConnection(sqlite3.Connection):
+    # перед чисткой (BEGIN IMMEDIATE) в лобби "revives" приходит свайп из другого соединения
+    def execute(self, sql, *args):
+        if sql == "BEGIN IMMEDIATE" and not getattr(self, "raced", False):
+            self.raced = True
+            other = sqlite3.connect(sweeper.DB_PATH)
+            with other:
+                other.execute("INSERT INTO lobby_swipes VALUES('revives','u1',2,'like',?)", (now_ms(),))
+            other.close()
+        return super().execute(sql, *args)
+
+def test_lobby_revived_after_archive_is_kept(db, monkeypatch):
+    connect = sweeper.connect
+
+    def racing_connect():
+        con = connect()
+        con.close()
+        con = sqlite3.connect(sweeper.DB_PATH, timeout=sweeper.SQLITE_TIMEOUT, isolation_level=None,
+                              factory=RacingConnection)
+        return con
+
+    monkeypatch.setattr(sweeper, "connect", racing_connect)
+    report = sweeper.sweep(ttl_hours=24, events_ttl_hours=6)
+    assert report["lobbies_expired"] == 1 and report["lobbies_revived"] == 1
+    assert dict(db.execute("SELECT id, active FROM lobbies"))["revives"] == 1
+    assert db.execute("SELECT COUNT(*) FROM lobby_swipes WHERE lobby_id='revives'").fetchone()[0] == 2
+    # копия в архиве осталась; следующий архив лобби её перезапишет
+    assert ("revives",) in archive(sweeper.LOBBY_ARCHIVE_DB, "SELECT id FROM lobbies_archive")
+
+def test_prune_events_uses_ts_index(db):
+    plan = " ".join(r[3] for r in db.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM lobby_events WHERE ts_ms >= ? ORDER BY ts_ms LIMIT 1", (0,)))
+    assert "idx_lobby_events_ts" in plan
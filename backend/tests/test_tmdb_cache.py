@@ -0,0 +1,117 @@
+# Кэш ответов TMDB (tmdb_cache.py) против заглушки: TTL по эндпоинтам, L2 между процессами,
+# stale-while-revalidate, stale-if-error и single-flight. Часы кэша (now_ms) подменяются.
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import tmdb_cache
+from tmdb import TmdbClient
+from tmdb_cache import DAY, TmdbCache
+
+PATH = "/movie/42"
+
+class Clock:
+    def __init__(self):
+        self.ms = 1_700_000_000_000
+
+    def __call__(self) -> int:
+        return self.ms
+
+    def advance(self, seconds: float) -> None:
+        self.ms += int(seconds * 1000)
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(tmdb_cache, "now_ms", c)
+    return c
+
+@pytest.fixture
+def cache(tmp_path):
+    c = TmdbCache(path=str(tmp_path / "tmdb_cache.db"))
+    yield c
+    c.close()
+
+def run(cache, base_url, *calls):
+    # calls — (path, params); все запросы конкурентно, одним клиентом без ретраев
+    async def main():
+        client = TmdbClient(base_url, retries=0)
+        try:
+            return await asyncio.gather(*(cache.get(p, q, lambda p=p, q=q: client.get(p, q)) for p, q in calls))
+        finally:
+            # фоновые ревалидации должны успеть до закрытия клиента
+            while cache._inflight:
+                await asyncio.gather(*cache._inflight.values(), return_exceptions=True)
+            await client.aclose()
+    return asyncio.run(main())
+
+def test_fresh_hit_does_not_call_tmdb(tmdb_stub, cache, clock):
+    stub, url = tmdb_stub
+    first, = run(cache, url, (PATH, None))
+    clock.advance(DAY - 1)
+    second, = run(cache, url, (PATH, None))
+    assert first == second and first["id"] == 42
+    assert stub.requests == 1
+    assert cache.counters["misses"] == 1 and cache.counters["l1_hits"] == 1
+
+def test_l2_shared_between_instances(tmdb_stub, cache, clock, tmp_path):
+    stub, url = tmdb_stub
+    run(cache, url, (PATH, {"language": "en-US", "api_key": "x"}))
+    other = TmdbCache(path=str(tmp_path / "tmdb_cache.db"))
+    try:
+        # api_key в ключ не входит, порядок параметров не важен
+        run(other, url, (PATH, {"api_key": "y", "language": "en-US"}))
+        assert other.counters["l2_hits"] == 1
+    finally:
+        other.close()
+    assert stub.requests == 1
+
+def test_stale_served_and_revalidated_in_background(tmdb_stub, cache, clock):
+    stub, url = tmdb_stub
+    run(cache, url, (PATH, None))
+    clock.advance(DAY + 1)                 # fresh прошёл, stale (7 дней) — нет
+    body, = run(cache, url, (PATH, None))
+    assert body["id"] == 42
+    assert cache.counters["stale_hits"] == 1 and cache.counters["revalidations"] == 1
+    assert stub.requests == 2
+    # после ревалидации ответ снова свежий
+    run(cache, url, (PATH, None))
+    assert cache.counters["l1_hits"] == 1 and stub.requests == 2
+
+def test_expired_entry_waits_for_tmdb(tmdb_stub, cache, clock):
+    stub, url = tmdb_stub
+    run(cache, url, (PATH, None))
+    clock.advance(7 * DAY + 1)
+    run(cache, url, (PATH, None))
+    assert cache.counters["misses"] == 2 and cache.counters["stale_hits"] == 0
+    assert stub.requests == 2
+
+def test_stale_if_error(tmdb_stub, cache, clock):
+    stub, url = tmdb_stub
+    first, = run(cache, url, (PATH, None))
+    clock.advance(7 * DAY + 1)
+    stub.script = [(503, {})]
+    body, = run(cache, url, (PATH, None))
+    assert body == first
+    assert cache.counters["stale_on_error"] == 1
+
+def test_error_without_entry_is_raised(tmdb_stub, cache, clock):
+    stub, url = tmdb_stub
+    stub.script = [(503, {})]
+    with pytest.raises(HTTPException) as e:
+        run(cache, url, (PATH, None))
+    assert e.value.status_code == 503
+
+def test_single_flight(tmdb_stub, cache, clock):
+    stub, url = tmdb_stub
+    stub.latency = 0.2
+    bodies = run(cache, url, *[(PATH, {"language": "en-US"})] * 10)
+    assert all(b == bodies[0] for b in bodies)
+    assert stub.requests == 1
+    assert cache.counters["misses"] == 10 and cache.counters["coalesced"] == 9
+
+def test_changes_bypass_cache(tmdb_stub, cache, clock):
+    stub, url = tmdb_stub
+    run(cache, url, ("/movie/changes", None), ("/movie/changes", None))
+    assert stub.requests == 2 and cache.counters["bypass"] == 2
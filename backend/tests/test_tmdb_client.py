@@ -0,0 +1,119 @@
+# Клиент TMDB (tmdb.py) и фетчер деталей (tools/tmdb_fetcher.py) против заглушки:
+# ретраи 429/5xx с backoff, Retry-After, token bucket; фетчер пишет тайтлы и статус очереди одной пачкой.
+import asyncio, sqlite3, time
+
+import pytest
+from fastapi import HTTPException
+
+import enrichment
+import tmdb
+import tmdb_fetcher
+from tmdb import TmdbClient, TokenBucket
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # паузы клиента записываются, а не спятся; множитель джиттера — ровно 1
+    real_sleep, delays = asyncio.sleep, []
+
+    async def sleep(delay, *args, **kwargs):
+        if delay > 0:
+            delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    monkeypatch.setattr(tmdb.random, "random", lambda: 0.5)
+    return delays
+
+def get(url, path, retries=3, **kw):
+    async def main():
+        client = TmdbClient(url, retries=retries, **kw)
+        try:
+            return await client.get(path)
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+def test_retries_5xx_with_exponential_backoff(tmdb_stub, sleeps):
+    stub, url = tmdb_stub
+    stub.script = [(503, {}), (502, {}), (500, {})]
+    assert get(url, "/movie/7")["id"] == 7
+    assert stub.requests == 4
+    assert sleeps == [tmdb.TMDB_BACKOFF, tmdb.TMDB_BACKOFF * 2, tmdb.TMDB_BACKOFF * 4]
+
+def test_429_honours_retry_after(tmdb_stub, sleeps):
+    stub, url = tmdb_stub
+    stub.script = [(429, {"Retry-After": "2"}), (429, {"Retry-After": "60"}), (429, {})]
+    assert get(url, "/movie/7")["id"] == 7
+    # Retry-After вместо backoff, но не дольше 5 с; без заголовка — обычный backoff
+    assert sleeps == [2.0, 5.0, tmdb.TMDB_BACKOFF * 4]
+
+def test_gives_up_after_retries(tmdb_stub, sleeps):
+    stub, url = tmdb_stub
+    stub.script = [(503, {})] * 3
+    with pytest.raises(HTTPException) as e:
+        get(url, "/movie/7", retries=1)
+    assert e.value.status_code == 503 and stub.requests == 2
+
+def test_client_errors_not_retried(tmdb_stub, sleeps):
+    stub, url = tmdb_stub
+    with pytest.raises(HTTPException) as e:
+        get(url, "/no/such/path")
+    assert e.value.status_code == 404 and stub.requests == 1 and sleeps == []
+
+def test_token_bucket_limits_rate(tmdb_stub):
+    stub, url = tmdb_stub
+
+    async def main():
+        client = TmdbClient(url, limiter=TokenBucket(20, burst=2))
+        try:
+            t = time.perf_counter()
+            await asyncio.gather(*(client.get(f"/movie/{i}") for i in range(8)))
+            return time.perf_counter() - t
+        finally:
+            await client.aclose()
+
+    # 2 сразу, остальные 6 — по 1/20 с
+    assert asyncio.run(main()) >= 6 / 20 * 0.9
+    assert stub.requests == 8
+
+def test_fetcher_writes_titles_and_queue_state(tmdb_stub, scratch_db, monkeypatch):
+    db = scratch_db
+    stub, url = tmdb_stub
+    monkeypatch.setenv("TMDB_API", url)
+    monkeypatch.setattr(tmdb, "TMDB_BACKOFF", 0.01)
+    ids = [r[0] for r in db.execute("SELECT id FROM tmdb_movies WHERE COALESCE(media_type, 'movie')='movie' "
+                                    "ORDER BY id LIMIT 30")]
+    with db:
+        enrichment.mark_due(db, "movie", ids)
+    stub.script = [(503, {}), (404, {})]   # первый тайтл: 503, ретрай, 404 — gone
+    stats = asyncio.run(tmdb_fetcher.run(tmdb_fetcher.JOBS["movie"], concurrency=1, rps=1000))
+    assert stats["titles"] == 29 and stats["gone"] == 1 and stats["failed"] == 0
+    gone = ids[0]
+    status = dict(db.execute("SELECT tmdb_id, status FROM enrichment_state WHERE kind='movie' AND status != 'done'"))
+    assert status == {gone: "gone"}
+    titles = dict(db.execute(f"SELECT id, title FROM tmdb_movies WHERE id IN ({','.join('?' * len(ids))})", ids))
+    assert all(titles[i] == f"Movie {i}" for i in ids if i != gone)
+    cast = db.execute("SELECT COUNT(DISTINCT movie_id) FROM tmdb_movie_cast WHERE movie_id IN "
+                      f"({','.join('?' * len(ids))})", ids).fetchone()[0]
+    assert cast >= 29
+    # повторный прогон: очередь пуста
+    assert asyncio.run(tmdb_fetcher.run(tmdb_fetcher.JOBS["movie"], rps=1000))["titles"] == 0
+
+def test_fetcher_stops_when_queue_read_fails(tmdb_stub, scratch_db, monkeypatch):
+    stub, url = tmdb_stub
+    monkeypatch.setenv("TMDB_API", url)
+    ids = [r[0] for r in scratch_db.execute("SELECT id FROM tmdb_movies ORDER BY id LIMIT 5")]
+    with scratch_db:
+        enrichment.mark_due(scratch_db, "movie", ids)
+    due = enrichment.due
+
+    def locked(con, kind, after, limit, now):
+        if after != (-1, 0):
+            raise sqlite3.OperationalError("database is locked")
+        return due(con, kind, after, limit, now)
+
+    # первая страница читается, вторая падает: прогон завершается ошибкой, а не висит
+    monkeypatch.setattr(tmdb_fetcher, "SELECT_PAGE", 2)
+    monkeypatch.setattr(enrichment, "due", locked)
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        asyncio.run(asyncio.wait_for(tmdb_fetcher.run(tmdb_fetcher.JOBS["movie"], concurrency=4, rps=1000), 10))
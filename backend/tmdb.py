@@ -0,0 +1,118 @@
+# /home/skillseek/app/backend/tmdb.py
+# Асинхронный клиент TMDB для API: общий keep-alive пул, ограничение параллелизма, таймауты, ретраи с backoff.
+import asyncio, os, random, time
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+import metrics
+from tmdb_cache import cache as response_cache
+
+TMDB_MAX_CONCURRENCY = int(os.getenv("TMDB_MAX_CONCURRENCY", "16"))
+TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT", "5"))
+TMDB_RETRIES = int(os.getenv("TMDB_RETRIES", "3"))
+TMDB_BACKOFF = 0.25   # сек, удваивается с каждой попыткой
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    # не больше rate запросов/с в среднем, пачкой до burst; ретраи тоже платят токен
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._ts = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+                self._ts = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class TmdbClient:
+    def __init__(self, base_url: str, bearer: Optional[str] = None, api_key: Optional[str] = None,
+                 max_concurrency: int = TMDB_MAX_CONCURRENCY, timeout: float = TMDB_TIMEOUT,
+                 retries: int = TMDB_RETRIES, limiter: Optional[TokenBucket] = None):
+        headers = {"Accept": "application/json"}
+        if bearer:
+            headers["Authorization"] = f"Bearer {bearer}"
+        self.api_key = None if bearer else api_key
+        self.retries = retries
+        self.limiter = limiter
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 3.0)),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+
+    async def get(self, path: str, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        params = dict(params or {})
+        if self.api_key and "api_key" not in params:
+            params["api_key"] = self.api_key
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            t = time.perf_counter()
+            try:
+                if self.limiter is not None:
+                    await self.limiter.acquire()
+                async with self._sem:
+                    t = time.perf_counter()
+                    r = await self._http.get(path, params=params)
+            except httpx.TimeoutException:
+                metrics.observe_tmdb(path, "timeout", time.perf_counter() - t)
+                if last:
+                    raise HTTPException(status_code=504, detail=f"TMDB timeout: {path}")
+            except httpx.TransportError as e:
+                metrics.observe_tmdb(path, "error", time.perf_counter() - t)
+                if last:
+                    raise HTTPException(status_code=502, detail=f"TMDB unavailable: {e}")
+            else:
+                metrics.observe_tmdb(path, str(r.status_code), time.perf_counter() - t)
+                if r.status_code == 200:
+                    return r.json()
+                if r.status_code not in RETRY_STATUS or last:
+                    raise HTTPException(status_code=r.status_code, detail=r.text)
+                retry_after = r.headers.get("Retry-After")
+                if r.status_code == 429 and retry_after and retry_after.isdigit():
+                    await asyncio.sleep(min(float(retry_after), 5.0))
+                    continue
+            await asyncio.sleep(TMDB_BACKOFF * 2 ** attempt * (0.5 + random.random()))
+        raise AssertionError("unreachable")
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+_client: Optional[TmdbClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def client() -> TmdbClient:
+    # один клиент на event loop воркера; env читаем лениво (server.py зовёт load_dotenv после импортов)
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = TmdbClient(os.getenv("TMDB_API", "https://api.themoviedb.org/3"),
+                             bearer=os.getenv("TMDB_BEARER"), api_key=os.getenv("TMDB_API_KEY"))
+        _client_loop = loop
+    return _client
+
+async def tmdb_get(path: str, params: Dict[str, Any] | None = None, cached: bool = True) -> Dict[str, Any]:
+    # через кэш ответов (tmdb_cache.py); cached=False — всегда свежий ответ из TMDB
+    c = client()
+    if not cached:
+        return await c.get(path, params)
+    return await response_cache.get(path, params, lambda: c.get(path, params))
+
+async def close_client() -> None:
+    global _client
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    response_cache.close()
@@ -0,0 +1,184 @@
+# /home/skillseek/app/backend/tmdb_cache.py
+# Двухуровневый кэш ответов TMDB: L1 — LRU в процессе воркера, L2 — отдельный SQLite-файл, общий для воркеров
+# (отдельный файл, чтобы запись кэша не конкурировала за write-lock основной БД).
+# TTL по эндпоинтам, stale-while-revalidate и single-flight: одинаковые запросы в полёте идут в TMDB один раз.
+import asyncio, json, logging, os, re, threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import HTTPException
+
+import metrics
+from cache import TTLCache
+from common import DB_PATH, ConnectionPool, now_ms
+
+TMDB_CACHE = os.getenv("TMDB_CACHE", "1") != "0"
+TMDB_CACHE_DB = os.getenv("TMDB_CACHE_DB", os.path.join(os.path.dirname(DB_PATH), "tmdb_cache.db"))
+TMDB_CACHE_SIZE = int(os.getenv("TMDB_CACHE_SIZE", "4096"))
+TMDB_CACHE_PRUNE_EVERY = 1000   # записей в L2 между чистками протухших строк
+
+DAY = 86400
+# (путь, fresh сек, stale сек): свежий ответ отдаём как есть; устаревший, но в окне stale — отдаём сразу
+# и обновляем в фоне; ещё старше — ждём TMDB. fresh=0 -> не кэшируем
+TTL_RULES = [
+    (re.compile(r"/changes$"), 0, 0),
+    (re.compile(r"^/genre/"), 7 * DAY, 30 * DAY),
+    (re.compile(r"^/configuration"), DAY, 7 * DAY),
+    (re.compile(r"^/search/"), DAY, 7 * DAY),
+    (re.compile(r"^/(movie|tv)/\d+/external_ids$"), 30 * DAY, 180 * DAY),
+    (re.compile(r"^/(movie|tv)/\d+"), DAY, 7 * DAY),
+    (re.compile(r"^/discover/"), 3600, DAY),
+]
+DEFAULT_TTL = (600, 3600)
+
+log = logging.getLogger("tmdb_cache")
+
+Entry = Tuple[str, int, int]   # (json, fresh_until_ms, stale_until_ms)
+
+def ttl_for(path: str) -> Tuple[int, int]:
+    for rx, fresh, stale in TTL_RULES:
+        if rx.search(path):
+            return fresh, stale
+    return DEFAULT_TTL
+
+def cache_key(path: str, params: Dict[str, Any] | None) -> str:
+    # api_key в ключ не попадает; порядок параметров не важен
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if k != "api_key")
+    return f"{path}?{urlencode(items)}"
+
+class TmdbCache:
+    def __init__(self, path: str = TMDB_CACHE_DB, maxsize: int = TMDB_CACHE_SIZE):
+        self.l1 = TTLCache(maxsize, ttl=max(stale for _, _, stale in TTL_RULES))
+        self.pool = ConnectionPool(4, readonly=False, path=path, label="tmdb_cache")
+        self.counters = {"l1_hits": 0, "l2_hits": 0, "stale_hits": 0, "misses": 0,
+                         "coalesced": 0, "revalidations": 0, "stale_on_error": 0, "bypass": 0}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._schema_ready = False
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    # --- L2 (вызывается из потоков)
+
+    def _ensure_schema(self, con) -> None:
+        if self._schema_ready:
+            return
+        con.execute("""CREATE TABLE IF NOT EXISTS tmdb_cache (
+            key TEXT PRIMARY KEY,
+            body TEXT NOT NULL,
+            fresh_until INTEGER NOT NULL,
+            stale_until INTEGER NOT NULL
+        ) WITHOUT ROWID""")
+        self._schema_ready = True
+
+    def _l2_get(self, key: str) -> Optional[Entry]:
+        with self.pool.connection() as con:
+            self._ensure_schema(con)
+            row = con.execute("SELECT body, fresh_until, stale_until FROM tmdb_cache WHERE key=?", (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def _l2_set(self, key: str, entry: Entry) -> None:
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % TMDB_CACHE_PRUNE_EVERY == 0
+        with self.pool.connection() as con:
+            self._ensure_schema(con)
+            con.execute("INSERT OR REPLACE INTO tmdb_cache(key, body, fresh_until, stale_until) VALUES(?,?,?,?)",
+                        (key, *entry))
+            if prune:
+                con.execute("DELETE FROM tmdb_cache WHERE stale_until < ?", (now_ms(),))
+
+    # --- чтение через кэш
+
+    def _count(self, name: str) -> None:
+        self.counters[name] += 1
+        metrics.TMDB_CACHE.labels(name).inc()
+
+    async def get(self, path: str, params: Dict[str, Any] | None,
+                  fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        fresh, stale = ttl_for(path)
+        if not TMDB_CACHE or not fresh:
+            self._count("bypass")
+            return await fetch()
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._inflight, self._loop = {}, loop
+        key = cache_key(path, params)
+
+        entry = self.l1.get(key)
+        tier = "l1_hits"
+        if entry is None:
+            try:
+                entry = await asyncio.to_thread(self._l2_get, key)
+            except Exception:
+                log.exception("tmdb cache L2 read failed")
+            tier = "l2_hits"
+            if entry is not None:
+                self.l1.set(key, entry)
+
+        now = now_ms()
+        if entry is not None and now < entry[1]:
+            self._count(tier)
+            return json.loads(entry[0])
+        if entry is not None and now < entry[2]:
+            self._count("stale_hits")
+            if key not in self._inflight:
+                self._count("revalidations")
+                self._flight(key, fetch, fresh, stale)
+            return json.loads(entry[0])
+
+        self._count("misses")
+        try:
+            return json.loads(await asyncio.shield(self._flight(key, fetch, fresh, stale)))
+        except HTTPException as e:
+            # stale-if-error: TMDB лежит/режет по лимиту, а у нас есть хоть какой-то ответ
+            if entry is not None and (e.status_code == 429 or e.status_code >= 500):
+                self._count("stale_on_error")
+                return json.loads(entry[0])
+            raise
+
+    def _flight(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]],
+                fresh: int, stale: int) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count("coalesced")
+            return task
+        task = asyncio.ensure_future(self._fetch_store(key, fetch, fresh, stale))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            log.debug("tmdb fetch failed for %s: %r", key, task.exception())
+
+    async def _fetch_store(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]],
+                           fresh: int, stale: int) -> str:
+        body = json.dumps(await fetch(), ensure_ascii=False, separators=(",", ":"))
+        now = now_ms()
+        entry = (body, now + fresh * 1000, now + stale * 1000)
+        self.l1.set(key, entry)
+        try:
+            await asyncio.to_thread(self._l2_set, key, entry)
+        except Exception:
+            log.exception("tmdb cache L2 write failed")
+        return body
+
+    def stats(self) -> Dict[str, Any]:
+        c = dict(self.counters)
+        hits = c["l1_hits"] + c["l2_hits"] + c["stale_hits"]
+        total = hits + c["misses"]
+        return {**c, "l1_size": self.l1.stats()["size"], "hit_ratio": round(hits / total, 4) if total else None}
+
+    def clear(self) -> None:
+        self.l1.clear()
+        with self.pool.connection() as con:
+            self._ensure_schema(con)
+            con.execute("DELETE FROM tmdb_cache")
+
+    def close(self) -> None:
+        self.pool.close()
+
+cache = TmdbCache()
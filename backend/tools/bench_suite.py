@@ -0,0 +1,243 @@
+# Воспроизводимый бенчмарк API на синтетической БД и заглушке TMDB:
+#   1) БД нужного масштаба (gen_bench_db.py, кэшируется по --titles/--seed) копируется во временный каталог;
+#   2) поднимаются tmdb_stub.py (--tmdb-latency-ms) и uvicorn server:app (--workers);
+#   3) --concurrency клиентов гоняют смесь /catalog/search, /discover, /lobby/swipe, /lobby/{code}/info
+#      (веса --mix, запросы детерминированы по --seed), после --warmup секунд прогрева — --seconds замера;
+#   4) p50/p95/p99 и req/s по сценариям пишутся в JSON (--out); с --baseline сравниваем и выходим с кодом 1,
+#      если p50/p95/p99 выросли или req/s упали больше чем на --threshold (доля, по умолчанию 0.15).
+#   python tools/bench_suite.py --titles 200000 --out bench.json
+#   python tools/bench_suite.py --titles 200000 --baseline bench_baseline.json            # проверка
+#   python tools/bench_suite.py --titles 200000 --baseline bench_baseline.json --update-baseline
+import argparse, asyncio, json, os, platform, random, shutil, subprocess, sys, tempfile, time
+from typing import Dict, List
+
+import httpx
+
+from bench_swipes import BACKEND, wait_ready
+from gen_bench_db import WORDS, generate
+from tmdb_stub import MOVIE_GENRES, TV_GENRES, person_name
+
+DEFAULT_MIX = "catalog_search=50,discover=15,lobby_swipe=20,lobby_info=15"
+LOBBIES = 20
+LOBBY_MEMBERS = 4
+SWIPE_ITEMS = 500          # свайпы по первым тайтлам — как по колоде лобби
+PERCENTILES = ("p50_ms", "p95_ms", "p99_ms")
+GENRE_NAMES = sorted({n for _, n in MOVIE_GENRES + TV_GENRES})
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {k.strip(): float(v) for k, v in (part.split("=") for part in spec.split(",") if part.strip())}
+    unknown = set(mix) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios in --mix: {sorted(unknown)}")
+    return mix
+
+# ---------- запросы
+
+def catalog_body(rnd: random.Random) -> dict:
+    body = {"page": rnd.choice((1, 1, 1, 2, 3, 5)), "page_size": rnd.choice((20, 20, 50, 100)),
+            "sort_by": rnd.choice(("imdb", "imdb", "tmdb", "year", "title")), "with_total": rnd.random() < 0.7}
+    kind = rnd.random()
+    if kind < 0.3:
+        body["title"] = rnd.choice(WORDS)[:rnd.randint(3, 6)]
+    elif kind < 0.5:
+        body["genres"] = rnd.sample(GENRE_NAMES, rnd.randint(1, 2))
+        body["genres_mode"] = rnd.choice(("any", "all"))
+    elif kind < 0.65:
+        y = rnd.randint(1960, 2020)
+        body.update(year_from=y, year_to=y + rnd.randint(0, 10), imdb_min=rnd.choice((None, 6.0, 7.0)))
+    elif kind < 0.75:
+        body[rnd.choice(("director", "actor"))] = person_name(1000 + rnd.randint(0, 5000))
+    elif kind < 0.85:
+        body["type"] = "tv"
+    return body
+
+def discover_body(rnd: random.Random) -> dict:
+    body = {"page": rnd.randint(1, 20)}
+    if rnd.random() < 0.5:
+        body["genre_ids"] = [g for g, _ in rnd.sample(MOVIE_GENRES, rnd.randint(1, 2))]
+    if rnd.random() < 0.3:
+        body["year_from"] = rnd.randint(1980, 2015)
+    if rnd.random() < 0.1:
+        body["people"] = [person_name(1000 + rnd.randint(0, 5000))]
+    return body
+
+async def catalog_search(c: httpx.AsyncClient, rnd: random.Random, ctx: dict) -> httpx.Response:
+    return await c.post("/catalog/search", json=catalog_body(rnd))
+
+async def discover(c: httpx.AsyncClient, rnd: random.Random, ctx: dict) -> httpx.Response:
+    return await c.post("/discover", json=discover_body(rnd))
+
+async def lobby_swipe(c: httpx.AsyncClient, rnd: random.Random, ctx: dict) -> httpx.Response:
+    code = rnd.choice(ctx["lobbies"])
+    return await c.post("/lobby/swipe", json={
+        "lobby_id": code, "user_id": f"u{rnd.randrange(LOBBY_MEMBERS)}",
+        "item_id": rnd.randint(1, min(SWIPE_ITEMS, ctx["titles"])),
+        "decision": "like" if rnd.random() < 0.6 else "skip"})
+
+async def lobby_info(c: httpx.AsyncClient, rnd: random.Random, ctx: dict) -> httpx.Response:
+    return await c.get(f"/lobby/{rnd.choice(ctx['lobbies'])}/info")
+
+SCENARIOS = {"catalog_search": catalog_search, "discover": discover, "lobby_swipe": lobby_swipe,
+             "lobby_info": lobby_info}
+
+# ---------- прогон
+
+async def setup_lobbies(c: httpx.AsyncClient) -> List[str]:
+    codes = []
+    for _ in range(LOBBIES):
+        code = (await c.post("/lobby/create", json={"user_id": "u0"})).json()["code"]
+        for m in range(1, LOBBY_MEMBERS):
+            await c.post("/lobby/join", json={"code": code, "user_id": f"u{m}"})
+        codes.append(code)
+    return codes
+
+def summarize(lat: List[float], errors: int, seconds: float) -> dict:
+    lat = sorted(lat)
+    pct = lambda p: round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 2) if lat else None
+    return {"requests": len(lat), "errors": errors, "rps": round(len(lat) / seconds, 1),
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+
+async def run_load(base: str, args, mix: Dict[str, float]) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as c:
+        ctx = {"lobbies": await setup_lobbies(c), "titles": args.titles}
+        names, weights = list(mix), list(mix.values())
+        lat: Dict[str, List[float]] = {n: [] for n in names}
+        errors = {n: 0 for n in names}
+        t_start = time.monotonic() + args.warmup
+        t_stop = t_start + args.seconds
+
+        async def client(i: int):
+            rnd = random.Random(args.seed * 1000 + i)
+            while (now := time.monotonic()) < t_stop:
+                name = rnd.choices(names, weights)[0]
+                t = time.perf_counter()
+                try:
+                    r = await SCENARIOS[name](c, rnd, ctx)
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if now < t_start:
+                    continue   # прогрев
+                if ok:
+                    lat[name].append(time.perf_counter() - t)
+                else:
+                    errors[name] += 1
+
+        await asyncio.gather(*(client(i) for i in range(args.concurrency)))
+    scenarios = {n: summarize(lat[n], errors[n], args.seconds) for n in names}
+    total = summarize([x for n in names for x in lat[n]], sum(errors.values()), args.seconds)
+    return {"scenarios": scenarios, "total": total}
+
+def bench_db(args) -> str:
+    path = args.db or os.path.join(tempfile.gettempdir(), f"movie_vibe_bench_{args.titles}_{args.seed}.db")
+    if not os.path.exists(path) or args.regenerate:
+        print("generating", generate(path, args.titles, args.seed))
+    return path
+
+def start(cmd: List[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *cmd], cwd=BACKEND, env=env)
+
+def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    src = bench_db(args)
+    procs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "imdb.db")
+        shutil.copyfile(src, db)   # свайпы пишут в БД — каждый прогон с одного и того же состояния
+        env = {k: v for k, v in os.environ.items() if k != "PROMETHEUS_MULTIPROC_DIR"}
+        env.update(DB_PATH=db, TMDB_API=f"http://127.0.0.1:{args.stub_port}/3", TMDB_BEARER="bench",
+                   PYTHONPATH=BACKEND)
+        try:
+            procs.append(start(["tools/tmdb_stub.py", "--port", str(args.stub_port),
+                                "--latency-ms", str(args.tmdb_latency_ms)], env))
+            procs.append(start(["-m", "uvicorn", "server:app", "--port", str(args.port),
+                                "--workers", str(args.workers), "--log-level", "warning"], env))
+            base = f"http://127.0.0.1:{args.port}"
+            asyncio.run(wait_ready(base, timeout=120))
+            result = asyncio.run(run_load(base, args, mix))
+        finally:
+            for p in procs:
+                p.terminate()
+            for p in procs:
+                p.wait(10)
+    result["meta"] = {"titles": args.titles, "seed": args.seed, "workers": args.workers,
+                      "concurrency": args.concurrency, "seconds": args.seconds, "mix": mix,
+                      "tmdb_latency_ms": args.tmdb_latency_ms, "python": platform.python_version(),
+                      "cpus": os.cpu_count(), "git": git_rev(), "ts": int(time.time())}
+    return result
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+# ---------- сравнение с baseline
+
+COMPARABLE = ("titles", "seed", "workers", "concurrency", "mix", "tmdb_latency_ms")
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    diff = [k for k in COMPARABLE if result["meta"].get(k) != baseline["meta"].get(k)]
+    if diff:
+        raise SystemExit(f"baseline was recorded with different settings: {diff}")
+    regressions = []
+    for name, base in baseline["scenarios"].items():
+        cur = result["scenarios"].get(name)
+        if cur is None:
+            continue
+        for key in PERCENTILES:
+            if base[key] and cur[key] and cur[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name} {key}: {base[key]} -> {cur[key]}")
+        if base["rps"] and cur["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{name} rps: {base['rps']} -> {cur['rps']}")
+    return regressions
+
+def print_table(result: dict, baseline: dict | None) -> None:
+    print(f"{'scenario':16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    rows = {**result["scenarios"], "total": result["total"]}
+    for name, r in rows.items():
+        line = f"{name:16} {r['rps']:8.1f} {r['p50_ms'] or 0:8.1f} {r['p95_ms'] or 0:8.1f} {r['p99_ms'] or 0:8.1f} {r['errors']:7d}"
+        b = (baseline or {}).get("scenarios", {}).get(name) if name != "total" else (baseline or {}).get("total")
+        if b and b.get("p95_ms") and r["p95_ms"]:
+            line += f"   p95 {100 * (r['p95_ms'] / b['p95_ms'] - 1):+.0f}% vs baseline"
+        print(line)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark the API on a synthetic catalog with a TMDB stub")
+    ap.add_argument("--titles", type=int, default=100_000, help="catalog size, 10k .. 2M")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--db", help="use/create the synthetic DB at this path (default: cached in the temp dir)")
+    ap.add_argument("--regenerate", action="store_true", help="regenerate the synthetic DB")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--warmup", type=float, default=5)
+    ap.add_argument("--seconds", type=float, default=30)
+    ap.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights, default: {DEFAULT_MIX}")
+    ap.add_argument("--tmdb-latency-ms", type=float, default=80)
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--stub-port", type=int, default=8766)
+    ap.add_argument("--out", help="write the result JSON here")
+    ap.add_argument("--baseline", help="baseline JSON to compare against")
+    ap.add_argument("--update-baseline", action="store_true", help="write the result to --baseline")
+    ap.add_argument("--threshold", type=float, default=0.15, help="allowed regression, fraction")
+    args = ap.parse_args()
+
+    result = run(args)
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(result, baseline)
+    for path in filter(None, (args.out, args.baseline if args.update_baseline else None)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    if baseline:
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"REGRESSION (> {args.threshold:.0%}):")
+            for r in regressions:
+                print("  " + r)
+            sys.exit(1)
+        print(f"OK: within {args.threshold:.0%} of baseline")
@@ -0,0 +1,97 @@
+# Бенчмарк /lobby/swipe: обычный режим (commit на свайп) против group commit (LOBBY_GROUP_COMMIT=1).
+# Для каждого режима поднимает uvicorn на чистой временной БД, создаёт лобби и гоняет свайпы
+# с заданной параллельностью; печатает swipes/s, p50/p99 и ошибки.
+#   python tools/bench_swipes.py --workers 2 --concurrency 64 --seconds 10
+#   python tools/bench_swipes.py --modes sync,group,group-normal
+import argparse, asyncio, os, random, statistics, subprocess, sys, tempfile, time
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {
+    "sync": {"LOBBY_GROUP_COMMIT": "0"},
+    "group": {"LOBBY_GROUP_COMMIT": "1", "GROUP_COMMIT_SYNC": "FULL"},
+    "group-normal": {"LOBBY_GROUP_COMMIT": "1", "GROUP_COMMIT_SYNC": "NORMAL"},
+}
+
+def start_server(mode: str, port: int, workers: int, db: str) -> subprocess.Popen:
+    env = {**os.environ, **MODES[mode], "DB_PATH": db, "PEOPLE_INDEX": "0", "PYTHONPATH": BACKEND}
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--port", str(port),
+                             "--workers", str(workers), "--log-level", "warning"],
+                            cwd=BACKEND, env=env)
+
+async def wait_ready(base: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as c:
+        while time.monotonic() < deadline:
+            try:
+                if (await c.get(base + "/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+async def run_load(base: str, concurrency: int, seconds: float, members: int, items: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as c:
+        code = (await c.post("/lobby/create", json={"user_id": "u0"})).json()["code"]
+        users = [f"u{i}" for i in range(members)]
+        for u in users[1:]:
+            await c.post("/lobby/join", json={"code": code, "user_id": u})
+
+        lat, errors, matched = [], 0, 0
+        stop = time.monotonic() + seconds
+
+        async def worker(seed: int):
+            nonlocal errors, matched
+            rnd = random.Random(seed)
+            while time.monotonic() < stop:
+                body = {"lobby_id": code, "user_id": rnd.choice(users), "item_id": rnd.randint(1, items),
+                        "decision": rnd.choice(("like", "like", "skip"))}
+                t = time.perf_counter()
+                try:
+                    r = await c.post("/lobby/swipe", json=body)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if r.status_code != 200:
+                    errors += 1
+                    continue
+                lat.append(time.perf_counter() - t)
+                matched += r.json()["matched"]
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    lat.sort()
+    pct = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))] * 1000 if lat else float("nan")
+    return {"swipes": len(lat), "swipes_per_s": len(lat) / elapsed, "p50_ms": pct(0.50), "p99_ms": pct(0.99),
+            "mean_ms": statistics.fmean(lat) * 1000 if lat else float("nan"), "errors": errors, "matched": matched}
+
+def bench(mode: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = start_server(mode, args.port, args.workers, os.path.join(tmp, "bench.db"))
+        base = f"http://127.0.0.1:{args.port}"
+        try:
+            asyncio.run(wait_ready(base))
+            return asyncio.run(run_load(base, args.concurrency, args.seconds, args.members, args.items))
+        finally:
+            proc.terminate()
+            proc.wait(10)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark /lobby/swipe with and without group commit")
+    ap.add_argument("--modes", default="sync,group", help=f"comma-separated: {', '.join(MODES)}")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--members", type=int, default=20)
+    ap.add_argument("--items", type=int, default=500)
+    ap.add_argument("--port", type=int, default=8799)
+    args = ap.parse_args()
+    print(f"{'mode':14} {'swipes/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode in args.modes.split(","):
+        r = bench(mode.strip(), args)
+        print(f"{mode:14} {r['swipes_per_s']:9.0f} {r['p50_ms']:8.1f} {r['p99_ms']:8.1f} {r['errors']:7d}")
@@ -0,0 +1,145 @@
+# Синтетическая imdb.db для бенчмарков: реальная схема (sql/create_schema.sql + колонки, которые в проде
+# добавляли руками: runtime_minutes, media_type, episodes_count), распределения "как в проде":
+#   - 1–3 жанра на тайтл, частоты жанров неравномерные (драм и комедий больше всего);
+#   - 5–20 актёров и 1–2 режиссёра на тайтл, популярность людей по Zipf — звёзды встречаются в сотнях тайтлов;
+#   - ~15% сериалов, ~90% тайтлов с imdb_id и рейтингом IMDb, голоса — логнормальные.
+# Потом полная сборка unified_catalog (sql/build_unified_catalog.sql). Детерминировано по --seed.
+#   python tools/gen_bench_db.py --titles 100000 --out /tmp/bench.db
+import argparse, os, sqlite3, sys, time
+
+import numpy as np
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from build_catalog import full_rebuild
+from tmdb_stub import MOVIE_GENRES, TV_GENRES, person_name
+
+SCHEMA_PATH = os.path.join(BACKEND, "sql", "create_schema.sql")
+EXTRA_COLUMNS = ("runtime_minutes INTEGER", "media_type TEXT", "episodes_count INTEGER")
+BATCH = 100_000
+TV_SHARE = 0.15
+WORDS = ("night love last dark city war star dead house girl man world blood king black road secret lost "
+         "time dream heart fire river summer game story home moon shadow wild ghost silent golden iron "
+         "winter island empire queen storm devil angel garden hunter ocean paradise brother sister").split()
+
+def title_words(rng: np.random.Generator, n: int) -> list:
+    # 1–4 слова из словаря — поиск по префиксу находит осмысленное число тайтлов
+    lens = rng.integers(1, 5, n)
+    idx = rng.integers(0, len(WORDS), int(lens.sum()))
+    out, pos = [], 0
+    for k in lens.tolist():
+        out.append(" ".join(WORDS[i] for i in idx[pos:pos + k]).title())
+        pos += k
+    return out
+
+def zipf_choice(rng: np.random.Generator, n_items: int, size: int, a: float = 0.5, shift: int = 10) -> np.ndarray:
+    # Zipf–Mandelbrot: shift сглаживает голову — звезда в сотнях тайтлов, а не в каждом третьем
+    p = 1.0 / (np.arange(1, n_items + 1) + shift) ** a
+    return rng.choice(n_items, size=size, p=p / p.sum())
+
+def insert(con: sqlite3.Connection, sql: str, rows) -> None:
+    buf = []
+    for row in rows:
+        buf.append(row)
+        if len(buf) >= BATCH:
+            con.executemany(sql, buf)
+            buf.clear()
+    if buf:
+        con.executemany(sql, buf)
+
+def generate(path: str, titles: int, seed: int = 42, people: int = 0) -> dict:
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    people = people or max(2000, int(titles * 0.8))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    con = sqlite3.connect(path, isolation_level=None)
+    # одноразовый файл: без журнала быстрее в разы
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+    con.executescript(open(SCHEMA_PATH, encoding="utf-8").read())
+    for col in EXTRA_COLUMNS:
+        con.execute(f"ALTER TABLE tmdb_movies ADD COLUMN {col}")
+    con.execute("CREATE TABLE IF NOT EXISTS title_ratings (tconst TEXT PRIMARY KEY, averageRating REAL, numVotes INTEGER)")
+    con.execute("BEGIN")
+
+    genres = {g: n for g, n in MOVIE_GENRES + TV_GENRES}
+    insert(con, "INSERT INTO tmdb_genres(id, name) VALUES(?,?)", genres.items())
+    # id людей — как в tmdb_stub (1000 + n): имена совпадают с тем, что отдаёт заглушка
+    insert(con, "INSERT INTO tmdb_people(id, name) VALUES(?,?)",
+           ((1000 + i, f"{person_name(1000 + i)} {i}") for i in range(people)))
+
+    ids = np.arange(1, titles + 1)
+    is_tv = rng.random(titles) < TV_SHARE
+    has_imdb = rng.random(titles) < 0.9
+    years = np.clip(rng.normal(2005, 15, titles).astype(int), 1920, 2025)
+    months, days = rng.integers(1, 13, titles), rng.integers(1, 29, titles)
+    tmdb_vote = np.round(np.clip(rng.normal(6.3, 1.1, titles), 1, 10), 1)
+    runtime = np.clip(rng.normal(105, 20, titles).astype(int), 60, 240)
+    episodes = rng.integers(6, 200, titles)
+    names = title_words(rng, titles)
+    insert(con, """INSERT INTO tmdb_movies(id, imdb_id, title, release_date, vote_average, poster_path,
+                                           runtime_minutes, media_type, episodes_count) VALUES(?,?,?,?,?,?,?,?,?)""",
+           ((i, f"tt{i:08d}" if imdb else None, name, f"{y}-{m:02d}-{d:02d}", v, f"/p{i}.jpg",
+             None if tv else rt, "tv" if tv else "movie", ep if tv else None)
+            for i, imdb, name, y, m, d, v, rt, tv, ep in zip(
+                ids.tolist(), has_imdb.tolist(), names, years.tolist(), months.tolist(), days.tolist(),
+                tmdb_vote.tolist(), runtime.tolist(), is_tv.tolist(), episodes.tolist())))
+
+    rated = ids[has_imdb]
+    imdb_rating = np.round(np.clip(tmdb_vote[has_imdb] + rng.normal(0.2, 0.6, len(rated)), 1, 10), 1)
+    votes = rng.lognormal(6, 2, len(rated)).astype(int) + 5
+    for table in ("imdb_ratings", "title_ratings"):
+        insert(con, f"INSERT INTO {table}(tconst, averageRating, numVotes) VALUES(?,?,?)",
+               zip((f"tt{i:08d}" for i in rated.tolist()), imdb_rating.tolist(), votes.tolist()))
+
+    # жанры: неравномерно, 1–3 разных на тайтл
+    movie_g, tv_g = [g for g, _ in MOVIE_GENRES], [g for g, _ in TV_GENRES]
+    pm = 1.0 / np.arange(1, len(movie_g) + 1) ** 0.7
+    pm = pm[rng.permutation(len(movie_g))]
+    pm /= pm.sum()
+    n_genres = rng.integers(1, 4, titles)
+
+    def genre_rows():
+        for i, tv, k in zip(ids.tolist(), is_tv.tolist(), n_genres.tolist()):
+            if tv:
+                chosen = rng.choice(tv_g, size=k, replace=False)
+            else:
+                chosen = rng.choice(movie_g, size=k, replace=False, p=pm)
+            for g in chosen.tolist():
+                yield i, g
+    insert(con, "INSERT INTO tmdb_movie_genres(movie_id, genre_id) VALUES(?,?)", genre_rows())
+
+    # каст: 5–20 на тайтл, люди по Zipf; режиссёры — из другой части пула (обычно не актёры)
+    n_cast = rng.integers(5, 21, titles)
+    cast_people = zipf_choice(rng, people, int(n_cast.sum())) + 1000
+    movie_of = np.repeat(ids, n_cast)
+    order = np.arange(len(movie_of)) - np.repeat(np.cumsum(n_cast) - n_cast, n_cast)
+    insert(con, "INSERT INTO tmdb_movie_cast(movie_id, person_id, character, cast_order) VALUES(?,?,?,?)",
+           ((m, p, f"Role {o}", o) for m, p, o in zip(movie_of.tolist(), cast_people.tolist(), order.tolist())))
+    n_dir = np.where(is_tv, 0, 1 + (rng.random(titles) < 0.1))
+    directors = people - 1 - zipf_choice(rng, people // 4, int(n_dir.sum())) + 1000
+    insert(con, "INSERT INTO tmdb_movie_crew(movie_id, person_id, job) VALUES(?,?,'Director')",
+           zip(np.repeat(ids, n_dir).tolist(), directors.tolist()))
+    con.execute("COMMIT")
+    t_data = time.perf_counter() - t0
+
+    full_rebuild(con)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("ANALYZE")
+    con.close()
+    return {"path": path, "titles": titles, "people": people, "cast_rows": int(n_cast.sum()),
+            "data_s": round(t_data, 1), "total_s": round(time.perf_counter() - t0, 1),
+            "size_mb": round(os.path.getsize(path) / 2**20, 1)}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate a synthetic imdb.db for benchmarks")
+    ap.add_argument("--titles", type=int, default=100_000, help="10k .. 2M")
+    ap.add_argument("--people", type=int, default=0, help="people pool size (default: 0.8 * titles)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default="/tmp/bench.db")
+    args = ap.parse_args()
+    print(generate(args.out, args.titles, args.seed, args.people))
@@ -0,0 +1,94 @@
+# Инкрементальная синхронизация с TMDB по /movie/changes и /tv/changes:
+#   1) читает id, изменённые с водяной отметки tmdb_sync_watermark (окнами по 14 дней — лимит TMDB);
+#   2) известные нам тайтлы помечает в enrichment_state как pending — в той же транзакции, что и сдвиг отметки;
+#   3) прогоняет фетчер деталей (tmdb_fetcher.py) по очереди: перекачиваются только изменённые тайтлы,
+#      а триггеры catalog_dirty ставят их в инкрементальную сборку каталога.
+# Повторный запуск безопасен: последний (неполный) день всегда перечитывается, повторная пометка ничего не ломает,
+# а недокачанное после падения остаётся pending и добирается следующим запуском.
+#   python tools/sync_changes.py                       # movie + tv, с отметки (первый раз — за вчера)
+#   python tools/sync_changes.py --since 2025-01-01 --no-fetch
+#   TMDB_API=http://127.0.0.1:8765/3 python tools/sync_changes.py   # против tmdb_stub.py
+import argparse, asyncio, json, os, sqlite3, time
+from datetime import date, timedelta
+from typing import List, Optional, Set
+
+import tmdb_fetcher   # он же добавляет backend/ в sys.path
+from tmdb_fetcher import FETCH_RPS, JOBS
+
+import enrichment
+from common import DB_PATH, conn, now_ms
+from tmdb import TmdbClient, TokenBucket
+
+SYNC_INITIAL_DAYS = int(os.getenv("SYNC_INITIAL_DAYS", "1"))
+CHANGES_WINDOW_DAYS = 14
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tmdb_sync_watermark (
+    kind       TEXT PRIMARY KEY,   -- 'movie' | 'tv'
+    synced_to  TEXT NOT NULL,      -- YYYY-MM-DD: изменения по этот день (включительно) уже в очереди
+    updated_ms INTEGER NOT NULL
+)"""
+
+def get_watermark(con: sqlite3.Connection, kind: str) -> Optional[date]:
+    row = con.execute("SELECT synced_to FROM tmdb_sync_watermark WHERE kind=?", (kind,)).fetchone()
+    return date.fromisoformat(row[0]) if row else None
+
+async def changed_ids(client: TmdbClient, kind: str, start: date, end: date) -> Set[int]:
+    params = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+    first = await client.get(f"/{kind}/changes", {**params, "page": 1})
+    pages = [first] + await asyncio.gather(*(client.get(f"/{kind}/changes", {**params, "page": p})
+                                             for p in range(2, (first.get("total_pages") or 1) + 1)))
+    return {r["id"] for page in pages for r in page.get("results") or [] if r.get("id")}
+
+async def sync_kind(con: sqlite3.Connection, client: TmdbClient, kind: str, since: Optional[date]) -> dict:
+    today = date.today()
+    start = since or get_watermark(con, kind) or today - timedelta(days=SYNC_INITIAL_DAYS)
+    report = {"from": start.isoformat(), "changed": 0, "queued": 0}
+    while start <= today:
+        end = min(today, start + timedelta(days=CHANGES_WINDOW_DAYS - 1))
+        ids = await changed_ids(client, kind, start, end)
+        with con:
+            report["queued"] += enrichment.mark_due(con, kind, sorted(ids))
+            # сегодняшний день ещё не закончился — следующий запуск начнёт с него же
+            con.execute("""INSERT INTO tmdb_sync_watermark(kind, synced_to, updated_ms) VALUES(?,?,?)
+                           ON CONFLICT(kind) DO UPDATE SET synced_to=excluded.synced_to,
+                             updated_ms=excluded.updated_ms""", (kind, end.isoformat(), now_ms()))
+        report["changed"] += len(ids)
+        start = end + timedelta(days=1)
+    return report
+
+async def sync(kinds: List[str], since: Optional[date] = None, fetch: bool = True, rps: float = FETCH_RPS) -> dict:
+    con = conn()
+    try:
+        enrichment.ensure_schema(con)
+        con.execute(SCHEMA)
+        client = TmdbClient(os.getenv("TMDB_API", "https://api.themoviedb.org/3"),
+                            bearer=os.getenv("TMDB_BEARER", "").strip() or None, api_key=os.getenv("TMDB_API_KEY"),
+                            limiter=TokenBucket(rps))
+        try:
+            report = {kind: await sync_kind(con, client, kind, since) for kind in kinds}
+        finally:
+            await client.aclose()
+    finally:
+        con.close()
+    if fetch:
+        for kind in kinds:
+            report[kind]["fetch"] = await tmdb_fetcher.run(JOBS[kind], rps=rps)
+    return report
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Queue and re-fetch titles changed on TMDB since the last sync")
+    ap.add_argument("--kinds", default="movie,tv", help="comma-separated: movie, tv")
+    ap.add_argument("--since", type=date.fromisoformat, help="YYYY-MM-DD, overrides the stored watermark")
+    ap.add_argument("--no-fetch", action="store_true", help="only queue changed titles, do not fetch them")
+    ap.add_argument("--rps", type=float, default=FETCH_RPS)
+    args = ap.parse_args()
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    bad = [k for k in kinds if k not in JOBS]
+    if bad:
+        ap.error(f"unknown kinds: {bad}")
+    print(f"DB: {DB_PATH}")
+    t0 = time.perf_counter()
+    report = asyncio.run(sync(kinds, args.since, not args.no_fetch, args.rps))
+    report["seconds"] = round(time.perf_counter() - t0, 1)
+    print(json.dumps(report))
@@ -0,0 +1,226 @@
+# Общий движок фетчеров деталей TMDB (fetch_tmdb_details.py, fetch_tv_details.py):
+#   - N корутин поверх tmdb.TmdbClient: keep-alive пул, ретраи с backoff на 429/5xx (Retry-After);
+#   - token bucket на все запросы, включая ретраи (FETCH_RPS, по умолчанию 40/с — у TMDB ~50/с на IP);
+#   - результаты пишутся пачками: одна транзакция на FETCH_BATCH тайтлов, executemany по таблицам;
+#   - работа берётся из очереди enrichment_state (enrichment.py), статус тайтла коммитится в той же
+#     транзакции, что и его данные: после падения/Ctrl-C следующий запуск продолжает с незаписанных;
+#   - соединение с базой живёт в одном потоке (DB executor): чтения очереди и записи пачек идут по очереди
+#     и не блокируют event loop.
+#   TMDB_API=http://127.0.0.1:8765/3 python tools/fetch_tmdb_details.py --concurrency 32   # против tmdb_stub.py
+import argparse, asyncio, json, os, statistics, sqlite3, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from fastapi import HTTPException
+
+import enrichment
+from common import DB_PATH, conn, now_ms
+from tmdb import TmdbClient, TokenBucket
+
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "16"))
+FETCH_RPS = float(os.getenv("FETCH_RPS", "40"))
+FETCH_BATCH = int(os.getenv("FETCH_BATCH", "100"))
+FETCH_RETRIES = 5
+FLUSH_S = 1.0          # пачка пишется не реже раза в секунду, даже неполная
+SELECT_PAGE = 1000     # id за один запрос к очереди
+CAST_LIMIT = 20
+
+@dataclass
+class Title:
+    id: int
+    update: tuple                                               # параметры job.update_sql
+    genres: List[Tuple[int, str]] = field(default_factory=list)
+    cast: List[Tuple[int, str, Optional[str], int]] = field(default_factory=list)   # person_id, name, character, order
+    crew: List[Tuple[int, str, str]] = field(default_factory=list)                  # person_id, name, job
+
+@dataclass
+class Job:
+    name: str
+    kind: str                           # enrichment_state.kind
+    path: str                           # "/movie/{id}"
+    update_sql: str
+    parse: Callable[[int, dict], Title]
+    replace_crew: bool = True
+    params: dict = field(default_factory=lambda: {"append_to_response": "external_ids,credits", "language": "en-US"})
+
+def _imdb_id(j: dict) -> Optional[str]:
+    return (j.get("external_ids") or {}).get("imdb_id") or None
+
+def _genres(j: dict) -> List[Tuple[int, str]]:
+    return [(g["id"], g["name"]) for g in j.get("genres") or []]
+
+def _cast(j: dict) -> List[Tuple[int, str, Optional[str], int]]:
+    return [(c["id"], c["name"], c.get("character"), c.get("order", 9999))
+            for c in ((j.get("credits") or {}).get("cast") or [])[:CAST_LIMIT]]
+
+def parse_movie(mid: int, j: dict) -> Title:
+    crew = [(w["id"], w["name"], "Director") for w in (j.get("credits") or {}).get("crew") or []
+            if w.get("job") == "Director"]
+    return Title(mid, (j.get("title"), j.get("release_date") or None, j.get("vote_average"), j.get("poster_path"),
+                       _imdb_id(j), j.get("runtime"), mid), _genres(j), _cast(j), crew)
+
+def parse_tv(tid: int, j: dict) -> Title:
+    run_arr = j.get("episode_run_time") or []
+    runtime_minutes = int(statistics.mean(run_arr)) if run_arr else None
+    # у TV режиссёры поэпизодные — crew не трогаем
+    return Title(tid, (j.get("name"), j.get("first_air_date") or None, j.get("vote_average"), j.get("poster_path"),
+                       _imdb_id(j), j.get("number_of_episodes"), runtime_minutes, tid), _genres(j), _cast(j))
+
+# поля из discover тоже обновляем: после /changes тайтл перекачивается целиком
+SUMMARY_SET = ("title=COALESCE(?, title), release_date=COALESCE(?, release_date), "
+               "vote_average=COALESCE(?, vote_average), poster_path=COALESCE(?, poster_path)")
+
+MOVIE_JOB = Job(
+    name="movie_details",
+    kind="movie",
+    path="/movie/{id}",
+    update_sql=f"""UPDATE tmdb_movies SET {SUMMARY_SET}, imdb_id=?, runtime_minutes=?,
+                   media_type=COALESCE(media_type,'movie') WHERE id=?""",
+    parse=parse_movie,
+)
+
+TV_JOB = Job(
+    name="tv_details",
+    kind="tv",
+    path="/tv/{id}",
+    update_sql=f"""UPDATE tmdb_movies SET {SUMMARY_SET}, imdb_id=?, episodes_count=?, runtime_minutes=?,
+                   media_type='tv' WHERE id=?""",
+    parse=parse_tv,
+    replace_crew=False,
+)
+
+JOBS = {job.kind: job for job in (MOVIE_JOB, TV_JOB)}
+
+def write_batch(con: sqlite3.Connection, job: Job, titles: List[Title], failed: List[int], gone: List[int]) -> None:
+    # одна транзакция на пачку: данные тайтлов + их статус в очереди
+    ids = [(t.id,) for t in titles]
+    with con:
+        if titles:
+            # имена обновляются только если изменились: переименование метит тайтлы в catalog_dirty
+            con.executemany("""INSERT INTO tmdb_genres(id, name) VALUES(?,?)
+                               ON CONFLICT(id) DO UPDATE SET name=excluded.name WHERE name IS NOT excluded.name""",
+                            {g for t in titles for g in t.genres})
+            con.executemany("""INSERT INTO tmdb_people(id, name) VALUES(?,?)
+                               ON CONFLICT(id) DO UPDATE SET name=excluded.name WHERE name IS NOT excluded.name""",
+                            {(p[0], p[1]) for t in titles for p in (*t.cast, *t.crew)})
+            con.executemany(job.update_sql, [t.update for t in titles])
+            con.executemany("DELETE FROM tmdb_movie_genres WHERE movie_id=?", ids)
+            con.executemany("INSERT INTO tmdb_movie_genres(movie_id, genre_id) VALUES(?,?)",
+                            [(t.id, g[0]) for t in titles for g in t.genres])
+            con.executemany("DELETE FROM tmdb_movie_cast WHERE movie_id=?", ids)
+            con.executemany("INSERT INTO tmdb_movie_cast(movie_id, person_id, character, cast_order) VALUES(?,?,?,?)",
+                            [(t.id, c[0], c[2], c[3]) for t in titles for c in t.cast])
+            if job.replace_crew:
+                con.executemany("DELETE FROM tmdb_movie_crew WHERE movie_id=?", ids)
+                con.executemany("INSERT INTO tmdb_movie_crew(movie_id, person_id, job) VALUES(?,?,?)",
+                                [(t.id, w[0], w[2]) for t in titles for w in t.crew])
+            enrichment.mark_done(con, job.kind, [t.id for t in titles])
+        enrichment.mark_failed(con, job.kind, failed)
+        enrichment.mark_gone(con, job.kind, gone)
+
+async def run(job: Job, concurrency: int = FETCH_CONCURRENCY, rps: float = FETCH_RPS, batch: int = FETCH_BATCH,
+              limit: int = 0) -> dict:
+    con = conn()
+    enrichment.ensure_schema(con)
+    now = now_ms()     # что "созреет" во время прогона — уже следующему запуску
+    client = TmdbClient(os.getenv("TMDB_API", "https://api.themoviedb.org/3"),
+                        bearer=os.getenv("TMDB_BEARER", "").strip() or None, api_key=os.getenv("TMDB_API_KEY"),
+                        max_concurrency=concurrency, retries=FETCH_RETRIES, limiter=TokenBucket(rps))
+    todo: "asyncio.Queue[Optional[int]]" = asyncio.Queue(concurrency * 2)
+    results: "asyncio.Queue[Tuple[int, Optional[Title], bool]]" = asyncio.Queue()   # id, данные, 404
+    stats = {"job": job.name, "due": enrichment.due_count(con, job.kind, now), "titles": 0, "failed": 0, "gone": 0}
+    # con используется только из этого потока: чтение очереди не попадает в чужую транзакцию пачки
+    db = ThreadPoolExecutor(1, thread_name_prefix="fetcher-db")
+    loop = asyncio.get_running_loop()
+
+    async def produce():
+        after, left = (-1, 0), limit or float("inf")
+        try:
+            while left > 0:
+                rows = await loop.run_in_executor(db, enrichment.due, con, job.kind, after,
+                                                  int(min(SELECT_PAGE, left)), now)
+                if not rows:
+                    break
+                for row in rows:
+                    await todo.put(row[1])
+                after, left = tuple(rows[-1]), left - len(rows)
+        finally:
+            # и при ошибке чтения очереди: воркеры не должны ждать todo.get() вечно
+            for _ in range(concurrency):
+                await todo.put(None)
+
+    async def work():
+        while (tid := await todo.get()) is not None:
+            try:
+                body = await client.get(job.path.format(id=tid), job.params)
+                await results.put((tid, job.parse(tid, body), False))
+            except HTTPException as e:
+                if e.status_code != 404:
+                    print(f"[ERR] {job.name} {tid}: {e.status_code} {str(e.detail)[:100]}", file=sys.stderr)
+                await results.put((tid, None, e.status_code == 404))
+            except Exception as e:
+                print(f"[ERR] {job.name} {tid}: {e!r}", file=sys.stderr)
+                await results.put((tid, None, False))
+
+    async def flush(items: List[Tuple[int, Optional[Title], bool]]) -> None:
+        titles = [t for _, t, _ in items if t is not None]
+        gone = [tid for tid, t, g in items if t is None and g]
+        failed = [tid for tid, t, g in items if t is None and not g]
+        await loop.run_in_executor(db, write_batch, con, job, titles, failed, gone)
+        stats["titles"] += len(titles)
+        stats["failed"] += len(failed)
+        stats["gone"] += len(gone)
+
+    t0 = time.perf_counter()
+    workers = [asyncio.create_task(work()) for _ in range(concurrency)]
+    producer = asyncio.create_task(produce())
+    pending: List[Tuple[int, Optional[Title], bool]] = []
+    next_flush = time.monotonic() + FLUSH_S
+    next_report = time.monotonic() + 30
+    try:
+        while True:
+            if producer.done() and producer.exception():
+                break      # очередь не читается — дальше работы не будет, ошибка поднимется ниже
+            all_done = producer.done() and all(w.done() for w in workers) and results.empty()
+            if all_done:
+                break
+            try:
+                pending.append(await asyncio.wait_for(results.get(), timeout=max(0.01, next_flush - time.monotonic())))
+            except asyncio.TimeoutError:
+                pass
+            if len(pending) >= batch or (pending and time.monotonic() >= next_flush):
+                await flush(pending)
+                pending = []
+                next_flush = time.monotonic() + FLUSH_S
+            if time.monotonic() >= next_report:
+                elapsed = time.perf_counter() - t0
+                print(f"{job.name}: {stats['titles']} titles, {stats['failed']} failed, "
+                      f"{stats['titles'] / elapsed * 60:.0f} titles/min")
+                next_report = time.monotonic() + 30
+        producer.result()
+        await flush(pending)
+    finally:
+        producer.cancel()
+        for w in workers:
+            w.cancel()
+        await client.aclose()
+        db.shutdown(wait=True)
+        con.close()
+    elapsed = time.perf_counter() - t0
+    stats.update(seconds=round(elapsed, 1), titles_per_min=round(stats["titles"] / elapsed * 60) if elapsed else 0)
+    return stats
+
+def main(job: Job) -> None:
+    ap = argparse.ArgumentParser(description=f"Fetch TMDB details ({job.name}) from the enrichment queue")
+    ap.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY)
+    ap.add_argument("--rps", type=float, default=FETCH_RPS, help="requests per second, retries included")
+    ap.add_argument("--batch", type=int, default=FETCH_BATCH, help="titles per write transaction")
+    ap.add_argument("--limit", type=int, default=0, help="stop after N titles (0 = whole queue)")
+    args = ap.parse_args()
+    print(f"DB: {DB_PATH}")
+    stats = asyncio.run(run(job, args.concurrency, args.rps, args.batch, args.limit))
+    print(json.dumps(stats))
@@ -0,0 +1,170 @@
+# Локальная заглушка TMDB API для проверки клиентов/фетчеров/бенчмарков без сети и лимитов.
+#   python tools/tmdb_stub.py --port 8765 --latency-ms 80 --error-rate 0.05
+#   TMDB_API=http://127.0.0.1:8765/3 uvicorn server:app ...
+# Данные детерминированы по id, так что повторные прогоны дают одинаковые ответы.
+import argparse, json, random, threading, time, zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MOVIE_GENRES = [(28, "Action"), (12, "Adventure"), (16, "Animation"), (35, "Comedy"), (80, "Crime"),
+                (99, "Documentary"), (18, "Drama"), (10751, "Family"), (14, "Fantasy"), (36, "History"),
+                (27, "Horror"), (10402, "Music"), (9648, "Mystery"), (10749, "Romance"),
+                (878, "Science Fiction"), (10770, "TV Movie"), (53, "Thriller"), (10752, "War"), (37, "Western")]
+TV_GENRES = [(10759, "Action & Adventure"), (16, "Animation"), (35, "Comedy"), (80, "Crime"), (18, "Drama"),
+             (10765, "Sci-Fi & Fantasy"), (9648, "Mystery"), (10768, "War & Politics")]
+PAGE_SIZE = 20
+TOTAL_PAGES = 500
+
+def _rnd(*key) -> random.Random:
+    return random.Random(zlib.crc32(repr(key).encode()))
+
+def movie_summary(mid: int, tv: bool = False) -> dict:
+    r = _rnd("m", mid)
+    genres = [g for g, _ in r.sample(TV_GENRES if tv else MOVIE_GENRES, r.randint(1, 3))]
+    d = f"{r.randint(1950, 2025)}-{r.randint(1, 12):02d}-{r.randint(1, 28):02d}"
+    base = {"id": mid, "genre_ids": genres, "vote_average": round(r.uniform(3, 9), 1),
+            "poster_path": f"/p{mid}.jpg", "overview": f"Overview {mid}", "popularity": r.random() * 100}
+    if tv:
+        base.update(name=f"Show {mid}", original_name=f"Show {mid}", first_air_date=d)
+    else:
+        base.update(title=f"Movie {mid}", original_title=f"Movie {mid}", release_date=d)
+    return base
+
+def person_name(pid: int) -> str:
+    r = _rnd("p", pid)
+    first = ["Anna", "Boris", "Chloé", "Diego", "Emma", "Farid", "Greta", "Hugo", "Inès", "Jonas"]
+    last = ["Nolan", "Almodóvar", "Kravitz", "Reeves", "Tautou", "Cruz", "Hardy", "Jeunet", "Ōta", "Smith"]
+    return f"{r.choice(first)} {r.choice(last)}"
+
+def details(mid: int, tv: bool) -> dict:
+    r = _rnd("d", mid)
+    genres = TV_GENRES if tv else MOVIE_GENRES
+    body = movie_summary(mid, tv)
+    body["genres"] = [{"id": g, "name": n} for g, n in genres if g in body["genre_ids"]]
+    body["external_ids"] = {"imdb_id": f"tt{mid:07d}" if mid % 10 else None}
+    cast = [{"id": 1000 + r.randint(0, 5000), "name": None, "character": f"Role {i}", "order": i}
+            for i in range(r.randint(3, 25))]
+    for c in cast:
+        c["name"] = person_name(c["id"])
+    crew = [{"id": 1000 + r.randint(0, 5000), "job": "Director"}]
+    crew += [{"id": 1000 + r.randint(0, 5000), "job": r.choice(["Writer", "Producer"])} for _ in range(3)]
+    for c in crew:
+        c["name"] = person_name(c["id"])
+    body["credits"] = {"cast": cast, "crew": crew}
+    if tv:
+        body["number_of_episodes"] = r.randint(6, 200)
+        body["episode_run_time"] = [r.choice([22, 30, 45, 60])]
+    else:
+        body["runtime"] = r.randint(75, 190)
+    return body
+
+def changes(kind: str, start: str, end: str, page: int) -> dict:
+    # ~ 30 изменённых id в день, по 10 на страницу
+    ids = []
+    d0, d1 = date.fromisoformat(start), date.fromisoformat(end)
+    day = d0
+    while day <= d1:
+        r = _rnd("c", kind, day.isoformat())
+        ids += [r.randint(1, TOTAL_PAGES * PAGE_SIZE) for _ in range(30)]
+        day += timedelta(days=1)
+    per = 10
+    pages = max(1, (len(ids) + per - 1) // per)
+    chunk = ids[(page - 1) * per: page * per]
+    return {"results": [{"id": i, "adult": False} for i in chunk], "page": page,
+            "total_pages": pages, "total_results": len(ids)}
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, как у настоящего TMDB
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict | None = None):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        srv = self.server
+        with srv.lock:
+            srv.requests += 1
+            scripted = srv.script.pop(0) if srv.script else None
+        if srv.latency:
+            time.sleep(srv.latency)
+        if scripted:
+            return self._send(scripted[0], {"status_message": "scripted"}, scripted[1])
+        if srv.error_rate and random.random() < srv.error_rate:
+            if random.random() < 0.5:
+                return self._send(429, {"status_message": "rate limited"}, {"Retry-After": "1"})
+            return self._send(503, {"status_message": "unavailable"})
+        u = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(u.query).items()}
+        parts = [p for p in u.path.split("/") if p]
+        if parts and parts[0] == "3":
+            parts = parts[1:]
+        page = int(q.get("page", 1))
+        match parts:
+            case ["genre", "movie", "list"]:
+                return self._send(200, {"genres": [{"id": g, "name": n} for g, n in MOVIE_GENRES]})
+            case ["genre", "tv", "list"]:
+                return self._send(200, {"genres": [{"id": g, "name": n} for g, n in TV_GENRES]})
+            case ["search", "person"]:
+                name = q.get("query", "").strip()
+                res = [{"id": 1000 + zlib.crc32(name.lower().encode()) % 5000, "name": name}] if name else []
+                return self._send(200, {"page": 1, "results": res, "total_pages": 1})
+            case ["discover", kind] if kind in ("movie", "tv"):
+                start = (page - 1) * PAGE_SIZE + 1
+                res = [movie_summary(i, kind == "tv") for i in range(start, start + PAGE_SIZE)]
+                return self._send(200, {"page": page, "results": res, "total_pages": TOTAL_PAGES,
+                                        "total_results": TOTAL_PAGES * PAGE_SIZE})
+            case [kind, "changes"] if kind in ("movie", "tv"):
+                today = date.today().isoformat()
+                return self._send(200, changes(kind, q.get("start_date", today), q.get("end_date", today), page))
+            case [kind, mid, "external_ids"] if kind in ("movie", "tv") and mid.isdigit():
+                return self._send(200, {"id": int(mid), **details(int(mid), kind == "tv")["external_ids"]})
+            case [kind, mid] if kind in ("movie", "tv") and mid.isdigit():
+                return self._send(200, details(int(mid), kind == "tv"))
+        self._send(404, {"status_message": "not found"})
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256   # иначе пачка одновременных коннектов упирается в backlog=5 и ждёт SYN-ретрай
+
+    def __init__(self, address, latency: float = 0.0, error_rate: float = 0.0):
+        super().__init__(address, Handler)
+        self.lock = threading.Lock()
+        self.reset(latency, error_rate)
+
+    def reset(self, latency: float = 0.0, error_rate: float = 0.0) -> None:
+        # состояние на сервере, а не на классе Handler: тесты сбрасывают его между собой
+        with self.lock:
+            self.latency = latency
+            self.error_rate = error_rate
+            self.script = []    # [(status, headers)] — ответы на следующие запросы по порядку (тесты ретраев)
+            self.requests = 0
+
+def serve(port: int = 8765, latency_ms: float = 0, error_rate: float = 0) -> StubServer:
+    srv = StubServer(("127.0.0.1", port), latency_ms / 1000, error_rate)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local TMDB API stub")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    ap.add_argument("--error-rate", type=float, default=0)
+    args = ap.parse_args()
+    srv = serve(args.port, args.latency_ms, args.error_rate)
+    print(f"TMDB stub on http://127.0.0.1:{args.port}/3")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()